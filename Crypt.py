@@ -1,16 +1,1409 @@
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, Response, abort, g, request, jsonify, send_file, stream_with_context
+from werkzeug.wsgi import LimitedStream, get_input_stream
+from werkzeug.utils import secure_filename
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import os
 import json
 import base64
+import binascii
+import bisect
 import secrets
 from pathlib import Path
 import io
+import struct
+import itertools
+import contextlib
+import mmap
+import argparse
+import re
+from collections import OrderedDict, deque
+from urllib.parse import parse_qsl
+import functools
+import time
+import gzip
+import hashlib
+import threading
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
+ENVELOPE_VERSION = 1
+ENVELOPE_NONCE_SIZE = 12
+ENVELOPE_TAG_SIZE = 16
+ENVELOPE_HEADER_SIZE = 1 + ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE
+ENVELOPE_HEADER = bytes((ENVELOPE_VERSION,))
+ENVELOPE_VERSION_KEY_ID = 2
+ENVELOPE_FLAG_KEY_VERSION = 0x01
+ENVELOPE_FLAG_COMPRESSED = 0x02
+ENVELOPE_FLAGS = ENVELOPE_FLAG_KEY_VERSION | ENVELOPE_FLAG_COMPRESSED
+ENVELOPE_KEY_VERSION = struct.Struct('>I')
+LEGACY_ENVELOPE_PREFIX = 'eyJ'
+MAX_BATCH_SIZE = 10000
+NDJSON_MAX_LINE = 16 * 1024 * 1024
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_NAMES = {CODEC_NONE: 'none', CODEC_ZLIB: 'zlib', CODEC_LZMA: 'lzma'}
+COMPRESS_MIN_SIZE = 256
+COMPRESS_SAMPLE_SIZE = 4096
+COMPRESS_MAX_RATIO = 0.9
+COMPRESS_LZMA_RATIO = 0.25
+COMPRESS_LZMA_MIN_SIZE = 16 * 1024
+COMPRESS_FAST_SIZE = 1024 * 1024
+COMPRESS_ZLIB_LEVEL = 6
+COMPRESS_FAST_LEVEL = 1
+COMPRESS_LZMA_FILTERS = ({'id': 0x21, 'preset': 1},)
+DECOMPRESS_LIMIT = 256 * 1024 * 1024
+
+STREAM_MAGIC = b'CRYS'
+STREAM_VERSION = 1
+STREAM_CHUNK_SIZE = 64 * 1024
+BINARY_BUFFER_KEEP = 1024 * 1024
+STREAM_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+STREAM_NONCE_PREFIX_SIZE = 7
+STREAM_HEADER = struct.Struct('>4sBI7s')
+STREAM_NONCE_SUFFIX = struct.Struct('>IB')
+
+CONTAINER_MAGIC = b'CRYC'
+CONTAINER_VERSION = 1
+CONTAINER_CHUNK_SIZE = 1024 * 1024
+CONTAINER_NONCE_PREFIX_SIZE = 8
+CONTAINER_HEADER = struct.Struct('>4sBIQI8s')
+CONTAINER_OFFSET = struct.Struct('>Q')
+CONTAINER_NONCE_SUFFIX = struct.Struct('>I')
+CONTAINER_WORKERS = os.cpu_count() or 1
+
+BLOB_CHUNK_MIN_SIZE = 16 * 1024
+BLOB_CHUNK_MAX_SIZE = 256 * 1024
+BLOB_CHUNK_MASK_BITS = 16
+BLOB_CHUNK_WINDOW = 64
+BLOB_CHUNK_SHIFTS = (1, 3, 7, 13, 23, 37, 51)
+BLOB_SCAN_SIZE = 64 * 1024
+BLOB_ID_SIZE = 32
+BLOB_CLAIM_BATCH = 16
+BLOB_CLAIM_TTL = 3600
+
+KEY_RELOAD_INTERVAL = 1.0
+KEY_DB_TIMEOUT = 30.0
+KEY_DB_CACHED_STATEMENTS = 256
+KEY_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_keys (
+    version INTEGER PRIMARY KEY,
+    wrapped_key TEXT NOT NULL,
+    created INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tenants (
+    key_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    created INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tenants_created ON tenants (created);
+CREATE TABLE IF NOT EXISTS tenant_key_versions (
+    key_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    wrapped_key TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    PRIMARY KEY (key_id, version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tenant_key_versions_created ON tenant_key_versions (created);
+CREATE TABLE IF NOT EXISTS blobs (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    created INTEGER NOT NULL,
+    key_version INTEGER
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blobs_created ON blobs (created);
+CREATE TABLE IF NOT EXISTS blob_chunks (
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    chunk_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (name, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blob_chunks_chunk_id ON blob_chunks (chunk_id);
+CREATE TABLE IF NOT EXISTS blob_claims (
+    chunk_id TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    PRIMARY KEY (chunk_id, owner)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blob_claims_owner ON blob_claims (owner);
+CREATE TABLE IF NOT EXISTS archive_tenants (
+    key_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    created INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS archive_tenant_key_versions (
+    key_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    wrapped_key TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    PRIMARY KEY (key_id, version)
+) WITHOUT ROWID;
+"""
+KEY_ARCHIVE_FORMAT = 'crypt-key-archive'
+KEY_ARCHIVE_VERSION = 1
+KEY_ARCHIVE_BATCH_SIZE = 500
+KEY_ARCHIVE_MAX_LINE = 1024 * 1024
+KEY_ARCHIVE_FLUSH_SIZE = 64 * 1024
+TENANT_KEY_CACHE_SIZE = 1024
+TENANT_KEY_TTL = 300.0
+TENANT_KEY_ID_PATTERN = re.compile(r'[A-Za-z0-9_.-]{1,64}')
+
+REENCRYPT_BATCH_SIZE = 500
+REENCRYPT_STOP_TIMEOUT = 30.0
+SERVE_BIND = '127.0.0.1:5000'
+SERVE_WORKERS = 2 * (os.cpu_count() or 1) + 1
+SERVE_THREADS = 4
+SERVE_KEEP_ALIVE = 5
+SERVE_BACKLOG = 2048
+
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+PAGE_CACHE_CONTROL = 'no-cache'
+KEYLESS_ENDPOINTS = frozenset({'index', 'static', 'static_asset', 'metrics_endpoint', 'debug_profile'})
+
+METRICS_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRICS_KEY_LOAD_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_FLUSH_SIZE = 256
+
+PROFILE_MODES = ('timers', 'cprofile', 'tracemalloc')
+PROFILE_SAMPLE_EVERY = 16
+PROFILE_CAPTURE_EVERY = 100
+PROFILE_TOP = 30
+PROFILED_METHODS = (
+    'encrypt_message', 'decrypt_message', 'encrypt_bytes', 'decrypt_bytes',
+    'encrypt_with_master_key', 'decrypt_with_master_key',
+)
+
+ASYNC_MAX_WORKERS = os.cpu_count() or 1
+ASYNC_INLINE_THRESHOLD = 64 * 1024
+ASGI_MAX_BODY = 1024 * 1024
+
 HARDCODED_KEY = b'\xa3\x5e\x1f\x8c\x92\x47\xda\x0b\x34\xe7\x8a\x90\xbc\xfe\x01\x28\x9d\x76\x12\xab\x5c\xcf\x66\x2d\xf0\x11\xb9\x3e\x87\x64\x09\xaa'
+HARDCODED_AEAD = AESGCM(HARDCODED_KEY)
+
+def envelope_to_text(envelope: bytes) -> str:
+    return base64.urlsafe_b64encode(envelope).rstrip(b'=').decode('ascii')
+
+def text_to_envelope(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def read_full(reader, buffer) -> int:
+    view = memoryview(buffer)
+    total = 0
+    while total < len(view):
+        count = reader.readinto(view[total:])
+        if not count:
+            break
+        total += count
+    return total
+
+def stream_nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    if index > 0xFFFFFFFF:
+        raise ValueError("Превышено число блоков в потоке")
+    return prefix + STREAM_NONCE_SUFFIX.pack(index, last)
+
+def seal_tag_first(aead: AESGCM, nonce, data, associated_data=None, header: bytes = b'') -> bytes:
+    sealed = memoryview(aead.encrypt(nonce, data, associated_data))
+    return b''.join((header, nonce, sealed[-ENVELOPE_TAG_SIZE:], sealed[:-ENVELOPE_TAG_SIZE]))
+
+def open_tag_first(aead: AESGCM, data, associated_data=None) -> bytes:
+    data = memoryview(data)
+    if len(data) < ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE:
+        raise ValueError("Слишком короткие данные")
+    nonce = data[:ENVELOPE_NONCE_SIZE]
+    tag = data[ENVELOPE_NONCE_SIZE:ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE]
+    ciphertext = data[ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE:]
+    try:
+        return aead.decrypt(nonce, b''.join((ciphertext, tag)), associated_data)
+    except InvalidTag:
+        raise ValueError("Неверный ключ или поврежденные данные")
+
+def key_id_header(key_id: str, version: int = None, codec: int = CODEC_NONE) -> bytes:
+    kid = key_id.encode('ascii')
+    flags = (ENVELOPE_FLAG_KEY_VERSION if version else 0) | (ENVELOPE_FLAG_COMPRESSED if codec else 0)
+    header = bytes((ENVELOPE_VERSION_KEY_ID, flags, len(kid))) + kid
+    if version:
+        header += ENVELOPE_KEY_VERSION.pack(version)
+    if codec:
+        header += bytes((codec,))
+    return header
+
+def parse_key_id_envelope(envelope) -> tuple:
+    if len(envelope) < 3:
+        raise ValueError("Слишком короткий конверт")
+    flags = envelope[1]
+    if flags & ~ENVELOPE_FLAGS:
+        raise ValueError(f"Неподдерживаемые флаги конверта: {flags}")
+    header_size = 3 + envelope[2]
+    if flags & ENVELOPE_FLAG_KEY_VERSION:
+        header_size += ENVELOPE_KEY_VERSION.size
+    if flags & ENVELOPE_FLAG_COMPRESSED:
+        header_size += 1
+    if len(envelope) < header_size + ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE:
+        raise ValueError("Слишком короткий конверт")
+    header = bytes(envelope[:header_size])
+    key_id = header[3:3 + envelope[2]].decode('ascii')
+    version = ENVELOPE_KEY_VERSION.unpack_from(header, 3 + envelope[2])[0] if flags & ENVELOPE_FLAG_KEY_VERSION else 1
+    codec = header[-1] if flags & ENVELOPE_FLAG_COMPRESSED else CODEC_NONE
+    if codec not in CODEC_NAMES:
+        raise ValueError(f"Неизвестный алгоритм сжатия: {codec}")
+    return header, key_id, version, codec, memoryview(envelope)[header_size:]
+
+def envelope_key(envelope) -> tuple:
+    if envelope and envelope[0] == ENVELOPE_VERSION_KEY_ID:
+        _, key_id, version, _, _ = parse_key_id_envelope(envelope)
+        return key_id or None, version
+    return None, 1
+
+def message_key_id(encrypted_message) -> str:
+    if not isinstance(encrypted_message, str):
+        return None
+    text = encrypted_message.strip()
+    if text.startswith(LEGACY_ENVELOPE_PREFIX):
+        return None
+    try:
+        head = text_to_envelope(text[:4])
+        if len(head) < 3 or head[0] != ENVELOPE_VERSION_KEY_ID:
+            return None
+        size = 3 + head[2]
+        return text_to_envelope(text[:-(-size // 3) * 4])[3:size].decode('ascii') or None
+    except ValueError:
+        return None
+
+def envelope_codec(envelope) -> int:
+    if envelope and envelope[0] == ENVELOPE_VERSION_KEY_ID:
+        return parse_key_id_envelope(envelope)[3]
+    return CODEC_NONE
+
+def sample_compression_ratio(data) -> float:
+    if len(data) <= COMPRESS_SAMPLE_SIZE:
+        sample = bytes(data)
+    else:
+        half = COMPRESS_SAMPLE_SIZE // 2
+        middle = len(data) // 2
+        sample = bytes(data[:half]) + bytes(data[middle:middle + half])
+    return len(zlib.compress(sample, COMPRESS_FAST_LEVEL)) / len(sample)
+
+def choose_codec(data) -> tuple:
+    if len(data) < COMPRESS_MIN_SIZE:
+        return CODEC_NONE, None
+    ratio = sample_compression_ratio(data)
+    if ratio > COMPRESS_MAX_RATIO:
+        return CODEC_NONE, None
+    if len(data) >= COMPRESS_FAST_SIZE:
+        return CODEC_ZLIB, COMPRESS_FAST_LEVEL
+    if ratio < COMPRESS_LZMA_RATIO and len(data) >= COMPRESS_LZMA_MIN_SIZE:
+        return CODEC_LZMA, None
+    return CODEC_ZLIB, COMPRESS_ZLIB_LEVEL
+
+def compress_payload(data) -> tuple:
+    codec, level = choose_codec(data)
+    if codec == CODEC_ZLIB:
+        compressed = zlib.compress(data, level)
+    elif codec == CODEC_LZMA:
+        import lzma
+        
+        compressed = lzma.compress(data, format=lzma.FORMAT_RAW, filters=COMPRESS_LZMA_FILTERS)
+    else:
+        return CODEC_NONE, data
+    if len(compressed) >= len(data):
+        return CODEC_NONE, data
+    return codec, compressed
+
+def decompress_payload(codec: int, data: bytes, limit: int = DECOMPRESS_LIMIT) -> bytes:
+    if codec == CODEC_NONE:
+        return data
+    if codec == CODEC_ZLIB:
+        decompressor = zlib.decompressobj()
+        try:
+            result = decompressor.decompress(data, limit)
+        except zlib.error as e:
+            raise ValueError(f"Ошибка распаковки: {e}")
+        if decompressor.unconsumed_tail:
+            raise ValueError("Распакованные данные превышают допустимый размер")
+        if not decompressor.eof:
+            raise ValueError("Сжатые данные обрезаны")
+        return result
+    import lzma
+    
+    decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=COMPRESS_LZMA_FILTERS)
+    try:
+        result = decompressor.decompress(data, limit)
+    except lzma.LZMAError as e:
+        raise ValueError(f"Ошибка распаковки: {e}")
+    if not decompressor.eof:
+        raise ValueError("Распакованные данные превышают допустимый размер" if len(result) >= limit else "Сжатые данные обрезаны")
+    return result
+
+def container_size(length: int, chunk_size: int) -> int:
+    count = max(1, -(-length // chunk_size))
+    return CONTAINER_HEADER.size + count * (CONTAINER_OFFSET.size + ENVELOPE_TAG_SIZE) + length
+
+def map_file(f, length: int, access: int):
+    if length == 0:
+        return contextlib.nullcontext(bytearray())
+    return mmap.mmap(f.fileno(), length, access=access)
+
+def run_on_mapping(func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        return str(e)
+    return None
+
+def container_nonce(prefix: bytes, index: int) -> bytes:
+    return prefix + CONTAINER_NONCE_SUFFIX.pack(index)
+
+def seal_chunk_into(key: bytes, header: bytes, nonce: bytes, source, target):
+    encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).encryptor()
+    encryptor.authenticate_additional_data(header)
+    encryptor.update_into(source, target)
+    encryptor.finalize()
+    target[len(source):len(source) + ENVELOPE_TAG_SIZE] = encryptor.tag
+
+def open_chunk_into(key: bytes, header: bytes, nonce: bytes, sealed, target, index: int):
+    size = len(sealed) - ENVELOPE_TAG_SIZE
+    decryptor = Cipher(algorithms.AES(key), modes.GCM(nonce, bytes(sealed[size:]))).decryptor()
+    decryptor.authenticate_additional_data(header)
+    try:
+        if len(target) >= size + 15:
+            decryptor.update_into(sealed[:size], target)
+        else:
+            target[:size] = decryptor.update(sealed[:size])
+        decryptor.finalize()
+    except InvalidTag:
+        raise ValueError(f"Ошибка аутентификации блока {index}: контейнер поврежден")
+
+def parse_container_header(data) -> tuple:
+    if len(data) < CONTAINER_HEADER.size:
+        raise ValueError("Контейнер слишком короткий")
+    magic, version, chunk_size, length, count, prefix = CONTAINER_HEADER.unpack_from(data)
+    if magic != CONTAINER_MAGIC:
+        raise ValueError("Неверный формат контейнера")
+    if version != CONTAINER_VERSION:
+        raise ValueError(f"Неподдерживаемая версия контейнера: {version}")
+    if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+        raise ValueError(f"Недопустимый размер блока: {chunk_size}")
+    if count != max(1, -(-length // chunk_size)):
+        raise ValueError("Число блоков не соответствует длине контейнера")
+    return chunk_size, length, count, prefix
+
+def classify_failure(error: BaseException) -> str:
+    while error is not None:
+        if isinstance(error, InvalidTag):
+            return 'auth_tag'
+        if isinstance(error, binascii.Error):
+            return 'base64'
+        if isinstance(error, (json.JSONDecodeError, BadRequest)):
+            return 'json'
+        if isinstance(error, UnicodeDecodeError):
+            return 'encoding'
+        error = error.__cause__ or error.__context__
+    return 'other'
+
+def metric_labels(names: tuple, values: tuple) -> str:
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+class Histogram:
+    
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+    
+    def render(self, name: str, labels: str) -> list:
+        prefix = f'{labels},' if labels else ''
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {total}')
+        return lines
+
+class Metrics:
+    
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.latency = {}
+            self.bytes_in = {}
+            self.bytes_out = {}
+            self.route_errors = {}
+            self.failures = {}
+            self.key_cache = {'hit': 0, 'miss': 0}
+            self.key_loads = {}
+            self._pending = deque()
+    
+    def observe_request(self, route: str, method: str, status: int, duration: float, bytes_in: int, bytes_out: int):
+        if not self.enabled:
+            return
+        pending = self._pending
+        pending.append((route, method, status, duration, bytes_in, bytes_out))
+        if len(pending) >= METRICS_FLUSH_SIZE:
+            self.flush()
+    
+    def flush(self):
+        pending = self._pending
+        with self._lock:
+            while pending:
+                route, method, status, duration, bytes_in, bytes_out = pending.popleft()
+                key = (route, method, status)
+                self.requests[key] = self.requests.get(key, 0) + 1
+                histogram = self.latency.get(route)
+                if histogram is None:
+                    histogram = self.latency[route] = Histogram(METRICS_LATENCY_BUCKETS)
+                histogram.observe(duration)
+                self.bytes_in[route] = self.bytes_in.get(route, 0) + bytes_in
+                self.bytes_out[route] = self.bytes_out.get(route, 0) + bytes_out
+    
+    def add_bytes_out(self, route: str, count: int):
+        if self.enabled:
+            with self._lock:
+                self.bytes_out[route] = self.bytes_out.get(route, 0) + count
+    
+    def record_route_error(self, route: str, error: BaseException):
+        if self.enabled:
+            key = (route, classify_failure(error))
+            with self._lock:
+                self.route_errors[key] = self.route_errors.get(key, 0) + 1
+    
+    def record_failure(self, operation: str, error: BaseException):
+        if self.enabled:
+            key = (operation, classify_failure(error))
+            with self._lock:
+                self.failures[key] = self.failures.get(key, 0) + 1
+    
+    def record_key_cache(self, hit: bool):
+        if self.enabled:
+            with self._lock:
+                self.key_cache['hit' if hit else 'miss'] += 1
+    
+    def observe_key_load(self, kind: str, duration: float):
+        if self.enabled:
+            with self._lock:
+                histogram = self.key_loads.get(kind)
+                if histogram is None:
+                    histogram = self.key_loads[kind] = Histogram(METRICS_KEY_LOAD_BUCKETS)
+                histogram.observe(duration)
+    
+    def render(self) -> str:
+        lines = []
+        
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+        
+        def samples(name: str, label_names: tuple, values: dict):
+            for key, value in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f'{name}{{{metric_labels(label_names, key)}}} {value}')
+        
+        self.flush()
+        with self._lock:
+            family('crypt_requests_total', 'counter', 'Число HTTP-запросов')
+            samples('crypt_requests_total', ('route', 'method', 'status'), self.requests)
+            family('crypt_request_duration_seconds', 'histogram', 'Время обработки запроса')
+            for route, histogram in sorted(self.latency.items()):
+                lines.extend(histogram.render('crypt_request_duration_seconds', metric_labels(('route',), (route,))))
+            family('crypt_request_bytes_total', 'counter', 'Байт получено в телах запросов')
+            samples('crypt_request_bytes_total', ('route',), self.bytes_in)
+            family('crypt_response_bytes_total', 'counter', 'Байт отправлено в телах ответов')
+            samples('crypt_response_bytes_total', ('route',), self.bytes_out)
+            family('crypt_route_errors_total', 'counter', 'Ошибки маршрутов по причинам')
+            samples('crypt_route_errors_total', ('route', 'cause'), self.route_errors)
+            family('crypt_failures_total', 'counter', 'Ошибки шифрования и дешифрования по причинам')
+            samples('crypt_failures_total', ('operation', 'cause'), self.failures)
+            family('crypt_key_cache_requests_total', 'counter', 'Обращения к кэшу ключей арендаторов')
+            samples('crypt_key_cache_requests_total', ('result',), self.key_cache)
+            lookups = self.key_cache['hit'] + self.key_cache['miss']
+            family('crypt_key_cache_hit_ratio', 'gauge', 'Доля попаданий в кэш ключей арендаторов')
+            lines.append(f'crypt_key_cache_hit_ratio {self.key_cache["hit"] / lookups if lookups else 0.0}')
+            family('crypt_key_load_seconds', 'histogram', 'Время загрузки и расшифровки ключей')
+            for kind, histogram in sorted(self.key_loads.items()):
+                lines.extend(histogram.render('crypt_key_load_seconds', metric_labels(('kind',), (kind,))))
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics(os.environ.get('CRYPT_METRICS', '1') != '0')
+
+class SampledTimer:
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.calls = itertools.count(1)
+        self.sampled = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, duration: float):
+        self.sampled += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+    
+    def summary(self, sample_every: int) -> dict:
+        calls = next(self.calls) - 1
+        self.calls = itertools.count(calls + 1)
+        return {
+            'calls': calls,
+            'sampled': self.sampled,
+            'mean_us': self.total / self.sampled * 1e6 if self.sampled else 0.0,
+            'max_us': self.max * 1e6,
+            'estimated_total_s': self.total * sample_every,
+        }
+
+class Profiler:
+    
+    def __init__(self):
+        self.mode = None
+        self.sample_every = PROFILE_SAMPLE_EVERY
+        self.capture_every = PROFILE_CAPTURE_EVERY
+        self.timers = {}
+        self._requests = itertools.count(1)
+        self._capture_lock = threading.Lock()
+        self._stats = None
+        self._captures = 0
+        self._snapshot = None
+        self._previous_snapshot = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None
+    
+    def configure(self, mode: str = None, sample_every: int = PROFILE_SAMPLE_EVERY,
+                  capture_every: int = PROFILE_CAPTURE_EVERY):
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        if sample_every <= 0 or capture_every <= 0:
+            raise ValueError("Периоды профилирования должны быть положительными")
+        self.mode = mode
+        self.sample_every = sample_every
+        self.capture_every = capture_every
+        if mode == 'tracemalloc':
+            import tracemalloc
+            
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+    
+    def configure_from_env(self):
+        mode = os.environ.get('CRYPT_PROFILE') or None
+        if mode == '1':
+            mode = 'timers'
+        self.configure(
+            mode,
+            int(os.environ.get('CRYPT_PROFILE_SAMPLE', PROFILE_SAMPLE_EVERY)),
+            int(os.environ.get('CRYPT_PROFILE_EVERY', PROFILE_CAPTURE_EVERY))
+        )
+    
+    def wrap(self, name: str, func):
+        timer = self.timers.setdefault(name, SampledTimer())
+        sample_every = self.sample_every
+        
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            if next(timer.calls) % sample_every:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.observe(time.perf_counter() - started)
+        return timed
+    
+    def install(self, manager):
+        if not self.enabled:
+            return
+        for name in PROFILED_METHODS:
+            setattr(manager, name, self.wrap(name, getattr(manager, name)))
+    
+    def start_request(self):
+        if self.mode not in ('cprofile', 'tracemalloc') or next(self._requests) % self.capture_every:
+            return None
+        if self.mode == 'tracemalloc':
+            self.take_snapshot()
+            return None
+        if not self._capture_lock.acquire(blocking=False):
+            return None
+        import cProfile
+        
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+    
+    def finish_request(self, profile):
+        profile.disable()
+        try:
+            import pstats
+            
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self._captures += 1
+        finally:
+            self._capture_lock.release()
+    
+    def take_snapshot(self):
+        import tracemalloc
+        
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+        self._previous_snapshot, self._snapshot = self._snapshot, snapshot
+    
+    def report(self, sort: str = 'cumulative', limit: int = PROFILE_TOP) -> dict:
+        result = {
+            'mode': self.mode,
+            'sample_every': self.sample_every,
+            'capture_every': self.capture_every,
+            'timers': {name: timer.summary(self.sample_every) for name, timer in sorted(self.timers.items())},
+        }
+        if self._stats is not None:
+            output = io.StringIO()
+            self._stats.stream = output
+            self._stats.sort_stats(sort).print_stats(limit)
+            result['cprofile'] = {'captures': self._captures, 'stats': output.getvalue()}
+        if self._snapshot is not None:
+            result['tracemalloc'] = {
+                'top': [str(stat) for stat in self._snapshot.statistics('lineno')[:limit]],
+                'growth': [
+                    str(stat) for stat in self._snapshot.compare_to(self._previous_snapshot, 'lineno')[:limit]
+                ] if self._previous_snapshot is not None else [],
+            }
+        return result
+    
+    def reset(self):
+        with self._capture_lock:
+            for timer in self.timers.values():
+                timer.reset()
+            self._stats = None
+            self._captures = 0
+            self._snapshot = None
+            self._previous_snapshot = None
+
+profiler = Profiler()
+profiler.configure_from_env()
+
+def fsync_directory(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_file_atomic(path: Path, content: bytes, sync: bool = True):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(content)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    if sync:
+        fsync_directory(path.parent)
+
+@contextlib.contextmanager
+def atomic_output(path):
+    path = Path(path)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temporary, 'w+b') as f:
+            yield f
+        os.replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+
+def check_distinct_files(input_path, output_path):
+    if os.path.exists(output_path) and os.path.samefile(input_path, output_path):
+        raise ValueError("Входной и выходной файлы совпадают")
+
+def json_bytes(data) -> bytes:
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+def json_line(record: dict) -> bytes:
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+def archive_mac_key(master_key: bytes) -> bytes:
+    return hashlib.blake2b(b'key-archive', key=master_key).digest()
+
+def archive_chain(mac_key: bytes, previous: bytes, line: bytes) -> bytes:
+    return hashlib.blake2b(previous + line, key=mac_key, digest_size=32).digest()
+
+def iter_ndjson_lines(reader, limit: int = None):
+    limit = limit or NDJSON_MAX_LINE
+    buffered = isinstance(reader, LimitedStream)
+    if buffered:
+        reader = io.BufferedReader(reader, STREAM_CHUNK_SIZE)
+    try:
+        while True:
+            line = reader.readline(limit + 1)
+            if not line:
+                return
+            if len(line) > limit and not line.endswith(b'\n'):
+                while line and not line.endswith(b'\n'):
+                    line = reader.readline(limit)
+                yield None
+            elif line.strip():
+                yield line
+    finally:
+        if buffered:
+            reader.detach()
+
+def coalesce_chunks(pieces, size: int):
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+def user_key_records(key_data: dict) -> dict:
+    wrapped_keys = {int(version): wrapped for version, wrapped in key_data.get('previous_versions', {}).items()}
+    wrapped_keys[int(key_data.get('version', 1))] = key_data['user_key']
+    return wrapped_keys
+
+def user_key_data(wrapped_keys: dict) -> dict:
+    version = max(wrapped_keys)
+    key_data = {'user_key': wrapped_keys[version]}
+    if len(wrapped_keys) > 1 or version != 1:
+        key_data['version'] = version
+        key_data['previous_versions'] = {
+            str(previous): wrapped for previous, wrapped in sorted(wrapped_keys.items()) if previous != version
+        }
+    return key_data
+
+def recover_key_journal(journal_file: Path) -> bool:
+    try:
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+    except FileNotFoundError:
+        return False
+    for path, content in journal.items():
+        path = Path(path)
+        if content is None:
+            path.unlink(missing_ok=True)
+        else:
+            write_file_atomic(path, base64.b64decode(content))
+    journal_file.unlink()
+    fsync_directory(journal_file.parent)
+    return True
+
+class KeyDatabase:
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+    
+    def connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                timeout=KEY_DB_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=KEY_DB_CACHED_STATEMENTS
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            local.pid = os.getpid()
+            local.connection = connection
+            local.depth = 0
+        return local.connection
+    
+    def initialize(self):
+        self.connection().executescript(KEY_DB_SCHEMA)
+        with self.transaction():
+            columns = {row[1] for row in self.execute("PRAGMA table_info(blobs)")}
+            if 'key_version' not in columns:
+                self.execute("ALTER TABLE blobs ADD COLUMN key_version INTEGER")
+    
+    @contextlib.contextmanager
+    def transaction(self):
+        connection = self.connection()
+        local = self._local
+        if local.depth:
+            local.depth += 1
+            try:
+                yield connection
+            finally:
+                local.depth -= 1
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        local.depth = 1
+        try:
+            yield connection
+        except BaseException:
+            local.depth = 0
+            connection.execute("ROLLBACK")
+            raise
+        local.depth = 0
+        connection.execute("COMMIT")
+    
+    @contextlib.contextmanager
+    def snapshot(self):
+        connection = sqlite3.connect(self.path, timeout=KEY_DB_TIMEOUT, isolation_level=None)
+        try:
+            connection.execute("BEGIN")
+            yield connection
+        finally:
+            connection.close()
+    
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, parameters)
+    
+    def executemany(self, sql: str, rows) -> sqlite3.Cursor:
+        return self.connection().executemany(sql, rows)
+    
+    def get_meta(self, name: str):
+        row = self.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+    
+    def set_meta(self, name: str, value):
+        self.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            (name, value)
+        )
+    
+    def delete_meta(self, name: str):
+        self.execute("DELETE FROM meta WHERE name = ?", (name,))
+    
+    def bump_generation(self):
+        self.execute(
+            "INSERT INTO meta (name, value) VALUES ('generation', 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+        )
+
+@dataclass(frozen=True)
+class KeyState:
+    master_key: bytes = None
+    user_keys: dict = None
+    user_version: int = 0
+    master_aead: AESGCM = None
+    user_aeads: dict = None
+    
+    @property
+    def user_key(self) -> bytes:
+        return self.user_keys[self.user_version] if self.user_keys else None
+    
+    @property
+    def user_aead(self) -> AESGCM:
+        return self.user_aeads[self.user_version] if self.user_aeads else None
+    
+    def user_aead_version(self, version: int = None) -> AESGCM:
+        if version is None:
+            version = self.user_version
+        aead = (self.user_aeads or {}).get(version)
+        if aead is None:
+            raise ValueError(f"Версия {version} пользовательского ключа не найдена")
+        return aead
+    
+    def find_user_key_version(self, nonce: bytes, sealed, associated_data) -> int:
+        if not self.user_aeads:
+            raise ValueError("Пользовательский ключ не загружен")
+        if len(self.user_aeads) == 1:
+            return self.user_version
+        for version in sorted(self.user_aeads, reverse=True):
+            try:
+                self.user_aeads[version].decrypt(nonce, sealed, associated_data)
+                return version
+            except InvalidTag:
+                continue
+        raise ValueError("Данные не соответствуют ни одной версии пользовательского ключа")
+    
+    @classmethod
+    def build(cls, master_key: bytes, user_keys: dict) -> 'KeyState':
+        return cls(
+            master_key,
+            user_keys,
+            max(user_keys) if user_keys else 0,
+            AESGCM(master_key) if master_key else None,
+            {version: AESGCM(key) for version, key in user_keys.items()} if user_keys else None
+        )
+
+class TenantKeyStore:
+    
+    def __init__(self, manager: 'CryptManager', directory: Path,
+                 cache_size: int = TENANT_KEY_CACHE_SIZE, ttl: float = TENANT_KEY_TTL):
+        self.manager = manager
+        self.directory = directory
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    def validate_key_id(self, key_id: str) -> str:
+        if not isinstance(key_id, str) or not TENANT_KEY_ID_PATTERN.fullmatch(key_id):
+            raise ValueError("Недопустимый идентификатор ключа")
+        return key_id
+    
+    def list_keys(self) -> list:
+        rows = self.manager.key_db.execute("SELECT key_id, created, version FROM tenants ORDER BY key_id")
+        return [{'key_id': key_id, 'created': created, 'version': version} for key_id, created, version in rows]
+    
+    def _wrap_new_key(self) -> str:
+        return base64.b64encode(self.manager.encrypt_with_master_key(os.urandom(32))).decode()
+    
+    def _insert_key(self, key_id: str, version: int, wrapped_keys: dict, created: int):
+        db = self.manager.key_db
+        db.execute("INSERT INTO tenants (key_id, version, created) VALUES (?, ?, ?)", (key_id, version, created))
+        db.executemany(
+            "INSERT INTO tenant_key_versions (key_id, version, wrapped_key, created) VALUES (?, ?, ?, ?)",
+            ((key_id, int(number), wrapped, created) for number, wrapped in wrapped_keys.items())
+        )
+    
+    def create_key(self, key_id: str) -> dict:
+        self.validate_key_id(key_id)
+        db = self.manager.key_db
+        with self.manager._write_lock, db.transaction():
+            self.manager.refresh_keys_signature()
+            if db.execute("SELECT 1 FROM tenants WHERE key_id = ?", (key_id,)).fetchone():
+                raise ValueError(f"Ключ {key_id} уже существует")
+            created = int(time.time())
+            self._insert_key(key_id, 1, {1: self._wrap_new_key()}, created)
+            db.bump_generation()
+            self.manager._keys_signature = self.manager.keys_signature()
+            return {'key_id': key_id, 'created': created, 'version': 1}
+    
+    def create_keys(self, key_ids: list) -> list:
+        if not isinstance(key_ids, list) or not key_ids:
+            raise ValueError("Ожидается непустой список идентификаторов ключей")
+        if len(key_ids) > MAX_BATCH_SIZE:
+            raise ValueError(f"Слишком много ключей: максимум {MAX_BATCH_SIZE}")
+        with self.manager._write_lock, self.manager.key_db.transaction():
+            return [self.create_key(key_id) for key_id in key_ids]
+    
+    def rotate_key(self, key_id: str) -> int:
+        self.validate_key_id(key_id)
+        db = self.manager.key_db
+        with self.manager._write_lock, db.transaction():
+            self.manager.refresh_keys_signature()
+            row = db.execute("SELECT version FROM tenants WHERE key_id = ?", (key_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Ключ {key_id} не найден")
+            version = row[0] + 1
+            db.execute(
+                "INSERT INTO tenant_key_versions (key_id, version, wrapped_key, created) VALUES (?, ?, ?, ?)",
+                (key_id, version, self._wrap_new_key(), int(time.time()))
+            )
+            db.execute("UPDATE tenants SET version = ? WHERE key_id = ?", (version, key_id))
+            db.bump_generation()
+            self.manager._keys_signature = self.manager.keys_signature()
+        with self._cache_lock:
+            self._cache.pop(key_id, None)
+        return version
+    
+    def delete_key(self, key_id: str):
+        self.validate_key_id(key_id)
+        db = self.manager.key_db
+        with self.manager._write_lock, db.transaction():
+            if not db.execute("DELETE FROM tenants WHERE key_id = ?", (key_id,)).rowcount:
+                raise ValueError(f"Ключ {key_id} не найден")
+            db.execute("DELETE FROM tenant_key_versions WHERE key_id = ?", (key_id,))
+            db.bump_generation()
+        with self._cache_lock:
+            self._cache.pop(key_id, None)
+    
+    def rewrap(self, old_master_key: bytes, new_master_key: bytes) -> int:
+        db = self.manager.key_db
+        with self.manager._write_lock, db.transaction():
+            rows = db.execute("SELECT key_id, version, wrapped_key FROM tenant_key_versions").fetchall()
+            db.executemany(
+                "UPDATE tenant_key_versions SET wrapped_key = ? WHERE key_id = ? AND version = ?",
+                (
+                    (
+                        base64.b64encode(self.manager.encrypt_with_master_key(
+                            self.manager.decrypt_with_master_key(base64.b64decode(wrapped), old_master_key),
+                            new_master_key
+                        )).decode(),
+                        key_id,
+                        version
+                    )
+                    for key_id, version, wrapped in rows
+                )
+            )
+            self.clear_cache()
+        return len(rows)
+    
+    def delete_all(self):
+        db = self.manager.key_db
+        with self.manager._write_lock, db.transaction():
+            db.execute("DELETE FROM tenant_key_versions")
+            db.execute("DELETE FROM tenants")
+            self.clear_cache()
+    
+    def iter_archive_records(self, connection: sqlite3.Connection):
+        rows = connection.execute(
+            "SELECT key_id, tenants.version, tenants.created, tenant_key_versions.version, wrapped_key "
+            "FROM tenants JOIN tenant_key_versions USING (key_id) ORDER BY key_id, tenant_key_versions.version"
+        )
+        for key_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+            group = list(group)
+            yield {
+                'type': 'tenant',
+                'key_id': key_id,
+                'version': group[0][1],
+                'created': group[0][2],
+                'wrapped_keys': {str(version): wrapped for _, _, _, version, wrapped in group}
+            }
+    
+    def migrate_json(self) -> int:
+        count = 0
+        for path in sorted(self.directory.glob('*/*.json')):
+            with open(path, 'r', encoding='utf-8') as f:
+                key_data = json.load(f)
+            if 'wrapped_key' in key_data:
+                key_data['wrapped_keys'] = {'1': key_data.pop('wrapped_key')}
+                key_data['version'] = 1
+            self._insert_key(
+                self.validate_key_id(key_data.get('key_id', path.stem)),
+                key_data['version'],
+                key_data['wrapped_keys'],
+                key_data.get('created') or int(time.time())
+            )
+            count += 1
+        return count
+    
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def _versions(self, key_id: str) -> tuple:
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._cache.get(key_id)
+            if cached is not None and cached[2] > now:
+                self._cache.move_to_end(key_id)
+                metrics.record_key_cache(True)
+                return cached[0], cached[1]
+        metrics.record_key_cache(False)
+        self.validate_key_id(key_id)
+        rows = self.manager.key_db.execute(
+            "SELECT tenants.version, tenant_key_versions.version, tenant_key_versions.wrapped_key "
+            "FROM tenants JOIN tenant_key_versions USING (key_id) WHERE key_id = ?",
+            (key_id,)
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"Ключ {key_id} не найден")
+        versions = {
+            version: AESGCM(self.manager.decrypt_with_master_key(base64.b64decode(wrapped)))
+            for _, version, wrapped in rows
+        }
+        current = rows[0][0]
+        metrics.observe_key_load('tenant', time.monotonic() - now)
+        with self._cache_lock:
+            self._cache[key_id] = (versions, current, now + self.ttl)
+            self._cache.move_to_end(key_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return versions, current
+    
+    def cached(self, key_ids) -> bool:
+        now = time.monotonic()
+        with self._cache_lock:
+            for key_id in key_ids:
+                entry = self._cache.get(key_id)
+                if entry is None or entry[2] <= now:
+                    return False
+        return True
+    
+    def current(self, key_id: str) -> tuple:
+        versions, current = self._versions(key_id)
+        return current, versions[current]
+    
+    def aead(self, key_id: str, version: int = None) -> AESGCM:
+        versions, current = self._versions(key_id)
+        aead = versions.get(version or current)
+        if aead is None:
+            raise ValueError(f"Версия {version} ключа {key_id} не найдена")
+        return aead
+
+class BlobChunker:
+    
+    def __init__(self, key: bytes):
+        order = sorted(range(256), key=lambda value: hashlib.blake2b(bytes((value,)), key=key).digest())
+        ones = set(order[:128])
+        self.table = bytes(value in ones for value in range(256))
+        self.needle = bytes(byte & 1 for byte in hashlib.blake2b(b'needle', key=key, digest_size=BLOB_CHUNK_MASK_BITS).digest())
+    
+    def boundary(self, data, start: int, end: int) -> int:
+        position = start + BLOB_CHUNK_MIN_SIZE
+        overlap = BLOB_CHUNK_WINDOW + len(self.needle)
+        while position < end:
+            stop = min(position + BLOB_SCAN_SIZE, end)
+            low = position - overlap
+            segment = bytes(data[low:stop])
+            value = int.from_bytes(segment, 'little')
+            mixed = value
+            for shift in BLOB_CHUNK_SHIFTS:
+                mixed ^= value << (8 * shift)
+            window = mixed.to_bytes(len(segment) + BLOB_CHUNK_WINDOW, 'little')[BLOB_CHUNK_WINDOW:len(segment)]
+            found = window.translate(self.table).find(self.needle)
+            if found >= 0:
+                return low + BLOB_CHUNK_WINDOW + found + len(self.needle)
+            position = stop
+        return end
+
+class BlobStore:
+    
+    def __init__(self, manager: 'CryptManager', directory: Path):
+        self.manager = manager
+        self.directory = directory
+        self.chunks_dir = directory / "chunks"
+        self.objects_dir = directory / "objects"
+        self._keys = {}
+    
+    def _derived_keys(self, version: int = None) -> tuple:
+        user_keys = self.manager.user_keys
+        if version is None:
+            version = min(user_keys)
+        base = user_keys.get(version)
+        if base is None:
+            raise ValueError(f"Версия {version} пользовательского ключа не найдена")
+        keys = self._keys.get(version)
+        if keys is None or keys[0] is not base:
+            keys = (
+                base,
+                hashlib.blake2b(b'blob-id', key=base).digest(),
+                BlobChunker(hashlib.blake2b(b'blob-chunker', key=base).digest())
+            )
+            self._keys[version] = keys
+        return keys
+    
+    def chunk_id(self, chunk, id_key: bytes = None) -> str:
+        id_key = id_key or self._derived_keys()[1]
+        return hashlib.blake2b(chunk, key=id_key, digest_size=BLOB_ID_SIZE).hexdigest()
+    
+    def chunk_path(self, chunk_id: str) -> Path:
+        return self.chunks_dir / chunk_id[:2] / chunk_id[2:4] / chunk_id
+    
+    def validate_name(self, name: str) -> str:
+        filename = secure_filename(name or '')
+        if not filename:
+            raise ValueError("Недопустимое имя объекта")
+        return filename
+    
+    def _chunk_ids(self, name: str) -> set:
+        rows = self.manager.key_db.execute("SELECT chunk_id FROM blob_chunks WHERE name = ?", (name,))
+        return {chunk_id for chunk_id, in rows}
+    
+    def _write_manifest(self, name: str, size: int, chunks: list, created: int, key_version: int = None):
+        db = self.manager.key_db
+        db.execute("DELETE FROM blob_chunks WHERE name = ?", (name,))
+        db.execute(
+            "INSERT OR REPLACE INTO blobs (name, size, chunk_count, created, key_version) VALUES (?, ?, ?, ?, ?)",
+            (name, size, len(chunks), created, key_version)
+        )
+        db.executemany(
+            "INSERT INTO blob_chunks (name, position, chunk_id, size) VALUES (?, ?, ?, ?)",
+            ((name, position, chunk_id, chunk_size) for position, (chunk_id, chunk_size) in enumerate(chunks))
+        )
+    
+    def iter_chunks(self, reader, chunker: 'BlobChunker' = None):
+        chunker = chunker or self._derived_keys()[2]
+        buffer = bytearray()
+        eof = False
+        while True:
+            while not eof and len(buffer) < BLOB_CHUNK_MAX_SIZE:
+                piece = reader.read(BLOB_CHUNK_MAX_SIZE - len(buffer))
+                if piece:
+                    buffer += piece
+                else:
+                    eof = True
+            if not buffer:
+                return
+            cut = chunker.boundary(buffer, 0, len(buffer))
+            yield bytes(buffer[:cut])
+            del buffer[:cut]
+    
+    def _claim(self, owner: str, chunk_ids: list) -> set:
+        db = self.manager.key_db
+        now = int(time.time())
+        with db.transaction():
+            db.executemany(
+                "INSERT OR REPLACE INTO blob_claims (chunk_id, owner, created) VALUES (?, ?, ?)",
+                ((chunk_id, owner, now) for chunk_id in chunk_ids)
+            )
+            db.execute("UPDATE blob_claims SET created = ? WHERE owner = ?", (now, owner))
+            return {chunk_id for chunk_id in chunk_ids if not self.chunk_path(chunk_id).exists()}
+    
+    def _release(self, owner: str) -> set:
+        db = self.manager.key_db
+        with db.transaction():
+            claimed = {chunk_id for chunk_id, in db.execute("SELECT chunk_id FROM blob_claims WHERE owner = ?", (owner,))}
+            db.execute("DELETE FROM blob_claims WHERE owner = ?", (owner,))
+        return claimed
+    
+    def _store_batch(self, owner: str, batch: list, id_key: bytes, compress: bool) -> list:
+        chunk_ids = [self.chunk_id(chunk, id_key) for chunk in batch]
+        missing = self._claim(owner, chunk_ids)
+        stored = []
+        for chunk, chunk_id in zip(batch, chunk_ids):
+            written = None
+            if chunk_id in missing:
+                missing.discard(chunk_id)
+                envelope = self.manager.encrypt_bytes(chunk, compress=compress)
+                write_file_atomic(self.chunk_path(chunk_id), envelope, sync=False)
+                written = len(envelope)
+            stored.append((chunk_id, len(chunk), written))
+        return stored
+    
+    def put(self, name: str, data, compress: bool = None) -> dict:
+        name = self.validate_name(name)
+        reader = io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        version = self.manager.state.user_version
+        _, id_key, chunker = self._derived_keys(version)
+        owner = secrets.token_hex(16)
+        db = self.manager.key_db
+        completed = False
+        try:
+            stored = []
+            batch = []
+            for chunk in self.iter_chunks(reader, chunker):
+                batch.append(chunk)
+                if len(batch) == BLOB_CLAIM_BATCH:
+                    stored += self._store_batch(owner, batch, id_key, compress)
+                    batch = []
+            if batch:
+                stored += self._store_batch(owner, batch, id_key, compress)
+            written = [self.chunk_path(chunk_id) for chunk_id, _, envelope_size in stored if envelope_size is not None]
+            for chunk_path in written:
+                with open(chunk_path, 'rb') as f:
+                    os.fsync(f.fileno())
+            for directory in {chunk_path.parent for chunk_path in written}:
+                fsync_directory(directory)
+            chunks = [[chunk_id, chunk_size] for chunk_id, chunk_size, _ in stored]
+            size = sum(chunk_size for _, chunk_size, _ in stored)
+            with db.transaction():
+                previous = self._chunk_ids(name)
+                self._write_manifest(name, size, chunks, int(time.time()), version)
+                db.execute("DELETE FROM blob_claims WHERE owner = ?", (owner,))
+            completed = True
+        finally:
+            if not completed:
+                self.collect(self._release(owner))
+        if previous:
+            self.collect(previous)
+        return {
+            'name': name,
+            'size': size,
+            'chunks': len(chunks),
+            'new_chunks': len(written),
+            'stored_bytes': sum(envelope_size for _, _, envelope_size in stored if envelope_size is not None)
+        }
+    
+    def iter_blob(self, name: str):
+        name = self.validate_name(name)
+        db = self.manager.key_db
+        row = db.execute("SELECT key_version FROM blobs WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise ValueError(f"Объект {name} не найден")
+        chunks = db.execute("SELECT chunk_id, size FROM blob_chunks WHERE name = ? ORDER BY position", (name,)).fetchall()
+        _, id_key, _ = self._derived_keys(row[0])
+        for chunk_id, size in chunks:
+            try:
+                envelope = self.chunk_path(chunk_id).read_bytes()
+            except FileNotFoundError:
+                raise ValueError(f"Блок {chunk_id} объекта {name} отсутствует")
+            chunk = self.manager.decrypt_bytes(envelope)
+            if len(chunk) != size or not secrets.compare_digest(self.chunk_id(chunk, id_key), chunk_id):
+                raise ValueError(f"Блок {chunk_id} объекта {name} поврежден")
+            yield chunk
+    
+    def get(self, name: str) -> bytes:
+        return b''.join(self.iter_blob(name))
+    
+    def list_blobs(self) -> list:
+        rows = self.manager.key_db.execute("SELECT name, size, chunk_count, created FROM blobs ORDER BY name")
+        return [
+            {'name': name, 'size': size, 'chunks': chunk_count, 'created': created}
+            for name, size, chunk_count, created in rows
+        ]
+    
+    def delete(self, name: str):
+        name = self.validate_name(name)
+        db = self.manager.key_db
+        with db.transaction():
+            if not db.execute("DELETE FROM blobs WHERE name = ?", (name,)).rowcount:
+                raise ValueError(f"Объект {name} не найден")
+            chunk_ids = self._chunk_ids(name)
+            db.execute("DELETE FROM blob_chunks WHERE name = ?", (name,))
+        self.collect(chunk_ids)
+    
+    def collect(self, candidates: set = None) -> int:
+        db = self.manager.key_db
+        removed = 0
+        if candidates is None:
+            candidates = {path.name for path in self.chunks_dir.glob('*/*/*')}
+        with db.transaction():
+            db.execute("DELETE FROM blob_claims WHERE created < ?", (int(time.time()) - BLOB_CLAIM_TTL,))
+            for chunk_id in candidates:
+                if db.execute("SELECT 1 FROM blob_chunks WHERE chunk_id = ? LIMIT 1", (chunk_id,)).fetchone():
+                    continue
+                if db.execute("SELECT 1 FROM blob_claims WHERE chunk_id = ? LIMIT 1", (chunk_id,)).fetchone():
+                    continue
+                path = self.chunk_path(chunk_id)
+                if path.exists():
+                    path.unlink()
+                    removed += 1
+        return removed
+    
+    def migrate_json(self) -> int:
+        count = 0
+        for path in sorted(self.objects_dir.glob('*/*.json')):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self._write_manifest(manifest['name'], manifest['size'], manifest['chunks'], manifest['created'])
+            count += 1
+        return count
 
 class CryptManager:
     
@@ -18,773 +1411,2324 @@ class CryptManager:
         self.keys_dir = Path("keys")
         self.master_key_file = self.keys_dir / "master_key.json"
         self.user_keys_file = self.keys_dir / "user_keys.json"
+        self.containers_dir = Path("containers")
+        self.records_dir = Path("records")
+        self.reencryption_job = None
+        self.compression = os.environ.get('CRYPT_COMPRESSION', '0') == '1'
         self.keys_dir.mkdir(exist_ok=True)
-        self.master_key = None
-        self.user_key = None
-        self.load_or_generate_master_key()
-        self.load_or_generate_user_key()
+        self._state = KeyState()
+        self._write_lock = threading.RLock()
+        self.key_db = KeyDatabase(self.keys_dir / "keys.db")
+        self.tenant_keys = TenantKeyStore(self, self.keys_dir / "tenants")
+        self.blobs = BlobStore(self, Path("blobs"))
+        self._keys_signature = None
+        self._next_key_check = 0.0
+        with self._write_lock:
+            started = time.perf_counter()
+            self.key_db.initialize()
+            self.migrate_json_keys()
+            with self.key_db.transaction():
+                master_key = self.load_or_generate_master_key()
+                self._publish_written(master_key, self.load_or_generate_user_key(master_key))
+            metrics.observe_key_load('user', time.perf_counter() - started)
+        profiler.install(self)
+    
+    @property
+    def state(self) -> KeyState:
+        return self._state
+    
+    @property
+    def master_key(self) -> bytes:
+        return self._state.master_key
+    
+    @property
+    def user_key(self) -> bytes:
+        return self._state.user_key
+    
+    @property
+    def user_keys(self) -> dict:
+        return self._state.user_keys
+    
+    def _publish(self, master_key: bytes, user_keys: dict):
+        self._state = KeyState.build(master_key, user_keys)
+    
+    def keys_signature(self) -> int:
+        return self.key_db.get_meta('generation')
+    
+    def _publish_written(self, master_key: bytes, user_keys: dict):
+        self._publish(master_key, user_keys)
+        self._keys_signature = self.keys_signature()
+    
+    def refresh_keys_signature(self) -> bool:
+        with self._write_lock, self.key_db.transaction():
+            signature = self.keys_signature()
+            if signature == self._keys_signature:
+                return False
+            started = time.perf_counter()
+            master_key = self.read_master_key()
+            user_keys = self.read_user_keys(master_key) if master_key else None
+            if master_key is None or user_keys is None:
+                raise ValueError("Не удалось перечитать ключи из базы")
+            metrics.observe_key_load('user', time.perf_counter() - started)
+            self._publish(master_key, user_keys)
+            self._keys_signature = signature
+            self.tenant_keys.clear_cache()
+            return True
+    
+    def migrate_json_keys(self) -> bool:
+        recover_key_journal(self.keys_dir / "journal.json")
+        legacy = [
+            path for path in (self.master_key_file, self.user_keys_file, self.tenant_keys.directory, self.blobs.objects_dir)
+            if path.exists()
+        ]
+        if not legacy:
+            return False
+        with self.key_db.transaction():
+            migrated = self.key_db.get_meta('master_key') is None
+            if migrated:
+                if self.master_key_file.exists():
+                    with open(self.master_key_file, 'r', encoding='utf-8') as f:
+                        self.key_db.set_meta('master_key', json.load(f)['master_key'])
+                if self.user_keys_file.exists():
+                    with open(self.user_keys_file, 'r', encoding='utf-8') as f:
+                        self.write_user_key_records(user_key_records(json.load(f)))
+                tenants = self.tenant_keys.migrate_json()
+                blobs = self.blobs.migrate_json()
+                self.key_db.bump_generation()
+        if migrated:
+            print(f"Ключи перенесены в {self.key_db.path} (ключей арендаторов: {tenants}, объектов: {blobs})")
+        for path in legacy:
+            target = path.with_name(f"{path.name}.migrated")
+            if target.exists():
+                target = path.with_name(f"{path.name}.migrated-{int(time.time())}")
+            try:
+                path.rename(target)
+            except FileNotFoundError:
+                continue
+            fsync_directory(path.parent)
+        return True
+    
+    def key_check_due(self) -> bool:
+        return time.monotonic() >= self._next_key_check
+    
+    def reload_keys_if_changed(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now < self._next_key_check:
+            return False
+        self._next_key_check = now + KEY_RELOAD_INTERVAL
+        if not self._write_lock.acquire(blocking=False):
+            return False
+        try:
+            signature = self.keys_signature()
+            if signature is None or signature == self._keys_signature:
+                return False
+            started = time.perf_counter()
+            master_key = self.read_master_key()
+            user_keys = self.read_user_keys(master_key) if master_key else None
+            if master_key is None or user_keys is None:
+                return False
+            metrics.observe_key_load('user', time.perf_counter() - started)
+            self._publish(master_key, user_keys)
+            self._keys_signature = signature
+            self.tenant_keys.clear_cache()
+            return True
+        finally:
+            self._write_lock.release()
     
     def encrypt_with_hardcoded_key(self, data: bytes) -> bytes:
-        nonce = os.urandom(12)
-        cipher = Cipher(algorithms.AES(HARDCODED_KEY), modes.GCM(nonce))
-        encryptor = cipher.encryptor()
-        ciphertext = encryptor.update(data) + encryptor.finalize()
-        return nonce + encryptor.tag + ciphertext
+        return seal_tag_first(HARDCODED_AEAD, os.urandom(ENVELOPE_NONCE_SIZE), data)
     
     def decrypt_with_hardcoded_key(self, encrypted_data: bytes) -> bytes:
         try:
-            nonce = encrypted_data[:12]
-            tag = encrypted_data[12:28]
-            ciphertext = encrypted_data[28:]
-            cipher = Cipher(algorithms.AES(HARDCODED_KEY), modes.GCM(nonce, tag))
-            decryptor = cipher.decryptor()
-            return decryptor.update(ciphertext) + decryptor.finalize()
+            return open_tag_first(HARDCODED_AEAD, encrypted_data)
         except Exception as e:
             raise ValueError(f"Ошибка при дешифровании мастер-ключа: {str(e)}")
     
-    def load_or_generate_master_key(self):
-        if not self.master_key_file.exists():
-            print("Генерируется новый мастер-ключ...")
-            self.master_key = os.urandom(32)
-            self.save_master_key()
-        else:
-            self.load_master_key()
+    def load_or_generate_master_key(self) -> bytes:
+        with self.key_db.transaction():
+            if self.key_db.get_meta('master_key') is None:
+                print("Генерируется новый мастер-ключ...")
+                master_key = os.urandom(32)
+                self.save_master_key(master_key)
+                return master_key
+            master_key = self.read_master_key()
+        if master_key is None:
+            raise ValueError("Файл мастер-ключа поврежден")
+        return master_key
     
-    def save_master_key(self):
-        encrypted_master_key = self.encrypt_with_hardcoded_key(self.master_key)
-        key_data = {
-            'master_key': base64.b64encode(encrypted_master_key).decode(),
-        }
-        with open(self.master_key_file, 'w', encoding='utf-8') as f:
-            json.dump(key_data, f, indent=2, ensure_ascii=False)
+    def save_master_key(self, master_key: bytes = None):
+        encrypted_master_key = self.encrypt_with_hardcoded_key(master_key or self.master_key)
+        with self.key_db.transaction():
+            self.key_db.set_meta('master_key', base64.b64encode(encrypted_master_key).decode())
+            self.key_db.bump_generation()
+    
+    def unwrap_master_key(self, key_data: dict) -> bytes:
+        return self.decrypt_with_hardcoded_key(base64.b64decode(key_data['master_key']))
     
-    def load_master_key(self):
+    def read_master_key(self) -> bytes:
         try:
-            with open(self.master_key_file, 'r', encoding='utf-8') as f:
-                key_data = json.load(f)
-            encrypted_master_key = base64.b64decode(key_data['master_key'])
-            self.master_key = self.decrypt_with_hardcoded_key(encrypted_master_key)
+            return self.unwrap_master_key({'master_key': self.key_db.get_meta('master_key')})
         except Exception as e:
             print(f"Ошибка при загрузке мастер-ключа: {e}")
-            self.master_key = None
+            return None
     
-    def encrypt_with_master_key(self, data: bytes) -> bytes:
-        nonce = os.urandom(12)
-        cipher = Cipher(algorithms.AES(self.master_key), modes.GCM(nonce))
-        encryptor = cipher.encryptor()
-        ciphertext = encryptor.update(data) + encryptor.finalize()
-        return nonce + encryptor.tag + ciphertext
+    def encrypt_with_master_key(self, data: bytes, master_key: bytes = None) -> bytes:
+        aead = AESGCM(master_key) if master_key else self._state.master_aead
+        return seal_tag_first(aead, os.urandom(ENVELOPE_NONCE_SIZE), data)
     
-    def decrypt_with_master_key(self, encrypted_data: bytes) -> bytes:
+    def decrypt_with_master_key(self, encrypted_data: bytes, master_key: bytes = None) -> bytes:
         try:
-            nonce = encrypted_data[:12]
-            tag = encrypted_data[12:28]
-            ciphertext = encrypted_data[28:]
-            cipher = Cipher(algorithms.AES(self.master_key), modes.GCM(nonce, tag))
-            decryptor = cipher.decryptor()
-            return decryptor.update(ciphertext) + decryptor.finalize()
+            aead = AESGCM(master_key) if master_key else self._state.master_aead
+            return open_tag_first(aead, encrypted_data)
         except Exception as e:
             raise ValueError(f"Ошибка при дешифровании пользовательского ключа: {str(e)}")
     
-    def load_or_generate_user_key(self):
-        if self.master_key is None:
+    def load_or_generate_user_key(self, master_key: bytes = None) -> dict:
+        master_key = master_key or self.master_key
+        if master_key is None:
             raise ValueError("Мастер-ключ не загружен")
-        if not self.user_keys_file.exists():
-            print("Генерируется новый пользовательский ключ...")
-            self.user_key = os.urandom(32)
-            self.save_user_key()
-        else:
-            self.load_user_key()
+        with self.key_db.transaction():
+            if self.key_db.execute("SELECT 1 FROM user_keys LIMIT 1").fetchone() is None:
+                print("Генерируется новый пользовательский ключ...")
+                user_keys = {1: os.urandom(32)}
+                self.save_user_key(user_keys, master_key)
+                return user_keys
+            return self.read_user_keys(master_key)
+    
+    def save_user_key(self, user_keys: dict = None, master_key: bytes = None):
+        user_keys = user_keys or self.user_keys
+        self.write_user_key_records({
+            version: base64.b64encode(self.encrypt_with_master_key(key, master_key)).decode()
+            for version, key in user_keys.items()
+        })
+    
+    def write_user_key_records(self, wrapped_keys: dict):
+        db = self.key_db
+        with db.transaction():
+            db.execute(
+                f"DELETE FROM user_keys WHERE version NOT IN ({', '.join('?' * len(wrapped_keys))})",
+                tuple(wrapped_keys)
+            )
+            db.executemany(
+                "INSERT INTO user_keys (version, wrapped_key, created) VALUES (?, ?, ?) "
+                "ON CONFLICT (version) DO UPDATE SET wrapped_key = excluded.wrapped_key",
+                ((version, wrapped, int(time.time())) for version, wrapped in wrapped_keys.items())
+            )
+            db.bump_generation()
     
-    def save_user_key(self):
-        encrypted_user_key = self.encrypt_with_master_key(self.user_key)
-        key_data = {
-            'user_key': base64.b64encode(encrypted_user_key).decode(),
+    def read_user_key_records(self) -> dict:
+        return dict(self.key_db.execute("SELECT version, wrapped_key FROM user_keys ORDER BY version"))
+    
+    def unwrap_user_keys(self, wrapped_keys: dict, master_key: bytes = None) -> dict:
+        if not wrapped_keys:
+            raise ValueError("Пользовательский ключ не найден")
+        return {
+            version: self.decrypt_with_master_key(base64.b64decode(wrapped), master_key)
+            for version, wrapped in wrapped_keys.items()
         }
-        with open(self.user_keys_file, 'w', encoding='utf-8') as f:
-            json.dump(key_data, f, indent=2, ensure_ascii=False)
     
-    def load_user_key(self):
+    def read_user_keys(self, master_key: bytes = None) -> dict:
         try:
-            with open(self.user_keys_file, 'r', encoding='utf-8') as f:
-                key_data = json.load(f)
-            encrypted_user_key = base64.b64decode(key_data['user_key'])
-            self.user_key = self.decrypt_with_master_key(encrypted_user_key)
+            return self.unwrap_user_keys(self.read_user_key_records(), master_key)
         except Exception as e:
             print(f"Ошибка при загрузке пользовательского ключа: {e}")
-            self.user_key = None
+            return None
+    
+    def rotate_user_key(self) -> int:
+        with self._write_lock, self.key_db.transaction():
+            self.refresh_keys_signature()
+            user_keys = dict(self.user_keys)
+            version = max(user_keys) + 1
+            user_keys[version] = os.urandom(32)
+            self.save_user_key(user_keys)
+            self._publish_written(self.master_key, user_keys)
+            return version
+    
+    def encrypt_bytes(self, data: bytes, nonce: bytes = None, key_id: str = None, compress: bool = None) -> bytes:
+        if nonce is None:
+            nonce = os.urandom(ENVELOPE_NONCE_SIZE)
+        codec = CODEC_NONE
+        if self.compression if compress is None else compress:
+            codec, data = compress_payload(data)
+        if key_id is None:
+            state = self._state
+            if state.user_version == 1 and codec == CODEC_NONE:
+                header = ENVELOPE_HEADER
+            else:
+                header = key_id_header('', state.user_version if state.user_version > 1 else None, codec)
+            return seal_tag_first(state.user_aead, nonce, data, header, header)
+        version, aead = self.tenant_keys.current(key_id)
+        header = key_id_header(key_id, version if version > 1 else None, codec)
+        return seal_tag_first(aead, nonce, data, header, header)
+    
+    def decrypt_bytes(self, envelope: bytes) -> bytes:
+        if not envelope:
+            raise ValueError("Слишком короткий конверт")
+        if envelope[0] == ENVELOPE_VERSION_KEY_ID:
+            header, key_id, version, codec, body = parse_key_id_envelope(envelope)
+            if key_id:
+                aead = self.tenant_keys.aead(key_id, version)
+            else:
+                aead = self._state.user_aead_version(version)
+            return decompress_payload(codec, open_tag_first(aead, body, header))
+        if len(envelope) < ENVELOPE_HEADER_SIZE:
+            raise ValueError("Слишком короткий конверт")
+        if envelope[0] != ENVELOPE_VERSION:
+            raise ValueError(f"Неподдерживаемая версия конверта: {envelope[0]}")
+        return open_tag_first(self._state.user_aead_version(1), memoryview(envelope)[1:], ENVELOPE_HEADER)
+    
+    def encrypt_bytes_into(self, data, output) -> int:
+        state = self._state
+        header = ENVELOPE_HEADER if state.user_version == 1 else key_id_header('', state.user_version)
+        source = memoryview(data).cast('B')
+        body_offset = len(header) + ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE
+        size = body_offset + len(source)
+        target = memoryview(output)
+        if len(target) < size + 15:
+            raise ValueError("Недостаточный размер выходного буфера")
+        nonce = os.urandom(ENVELOPE_NONCE_SIZE)
+        target[:len(header)] = header
+        target[len(header):len(header) + ENVELOPE_NONCE_SIZE] = nonce
+        encryptor = Cipher(algorithms.AES(state.user_key), modes.GCM(nonce)).encryptor()
+        encryptor.authenticate_additional_data(header)
+        encryptor.update_into(source, target[body_offset:])
+        encryptor.finalize()
+        target[body_offset - ENVELOPE_TAG_SIZE:body_offset] = encryptor.tag
+        return size
+    
+    def decrypt_bytes_into(self, envelope, output) -> int:
+        envelope = memoryview(envelope).cast('B')
+        if not envelope:
+            raise ValueError("Слишком короткий конверт")
+        if envelope[0] == ENVELOPE_VERSION_KEY_ID:
+            header, key_id, version, codec, body = parse_key_id_envelope(envelope)
+            if key_id:
+                raise ValueError("Конверт зашифрован ключом арендатора")
+            if codec:
+                raise ValueError("Конверт содержит сжатые данные")
+        elif envelope[0] == ENVELOPE_VERSION:
+            header, version, body = ENVELOPE_HEADER, 1, envelope[1:]
+        else:
+            raise ValueError(f"Неподдерживаемая версия конверта: {envelope[0]}")
+        if len(body) < ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE:
+            raise ValueError("Слишком короткий конверт")
+        key = self._state.user_keys.get(version)
+        if key is None:
+            raise ValueError(f"Версия {version} пользовательского ключа не найдена")
+        ciphertext = body[ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE:]
+        if len(output) < len(ciphertext) + 15:
+            raise ValueError("Недостаточный размер выходного буфера")
+        nonce = bytes(body[:ENVELOPE_NONCE_SIZE])
+        tag = bytes(body[ENVELOPE_NONCE_SIZE:ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE])
+        decryptor = Cipher(algorithms.AES(key), modes.GCM(nonce, tag)).decryptor()
+        decryptor.authenticate_additional_data(header)
+        try:
+            decryptor.update_into(ciphertext, output)
+            decryptor.finalize()
+        except InvalidTag:
+            raise ValueError("Неверный ключ или поврежденные данные")
+        return len(ciphertext)
     
-    def encrypt_message(self, message: str) -> str:
+    def encrypt_message(self, message: str, key_id: str = None, compress: bool = None) -> str:
         if not message:
             return ""
         try:
-            message_bytes = message.encode('utf-8')
-            nonce = os.urandom(12)
-            cipher = Cipher(algorithms.AES(self.user_key), modes.GCM(nonce))
-            encryptor = cipher.encryptor()
-            ciphertext = encryptor.update(message_bytes) + encryptor.finalize()
-            encrypted_data = {
-                'nonce': base64.b64encode(nonce).decode(),
-                'ciphertext': base64.b64encode(ciphertext).decode(),
-                'tag': base64.b64encode(encryptor.tag).decode()
-            }
-            return base64.b64encode(json.dumps(encrypted_data).encode()).decode()
+            return envelope_to_text(self.encrypt_bytes(message.encode('utf-8'), key_id=key_id, compress=compress))
         except Exception as e:
+            metrics.record_failure('encrypt', e)
             return f"Ошибка шифрования: {str(e)}"
     
     def decrypt_message(self, encrypted_message: str) -> str:
         if not encrypted_message:
             return ""
         try:
-            encrypted_data = json.loads(base64.b64decode(encrypted_message).decode())
-            nonce = base64.b64decode(encrypted_data['nonce'])
-            ciphertext = base64.b64decode(encrypted_data['ciphertext'])
-            tag = base64.b64decode(encrypted_data['tag'])
-            cipher = Cipher(algorithms.AES(self.user_key), modes.GCM(nonce, tag))
-            decryptor = cipher.decryptor()
-            plaintext = decryptor.update(ciphertext) + decryptor.finalize()
-            return plaintext.decode('utf-8')
+            encrypted_message = encrypted_message.strip()
+            if encrypted_message.startswith(LEGACY_ENVELOPE_PREFIX):
+                return self.decrypt_legacy_message(encrypted_message)
+            return self.decrypt_bytes(text_to_envelope(encrypted_message)).decode('utf-8')
         except Exception as e:
+            metrics.record_failure('decrypt', e)
             return f"Ошибка дешифрования: {str(e)}"
     
+    def encrypt_record(self, message: str, key_id: str = None, compress: bool = None, nonce: bytes = None) -> dict:
+        try:
+            if not isinstance(message, str):
+                raise ValueError("Сообщение должно быть строкой")
+            if not message:
+                return {'success': True, 'encrypted': ''}
+            envelope = self.encrypt_bytes(message.encode('utf-8'), nonce, key_id, compress)
+            return {'success': True, 'encrypted': envelope_to_text(envelope)}
+        except Exception as e:
+            metrics.record_failure('encrypt', e)
+            return {'success': False, 'error': f"Ошибка шифрования: {str(e)}"}
+    
+    def decrypt_record(self, encrypted_message: str) -> dict:
+        try:
+            if not isinstance(encrypted_message, str):
+                raise ValueError("Шифртекст должен быть строкой")
+            encrypted_message = encrypted_message.strip()
+            if not encrypted_message:
+                return {'success': True, 'decrypted': ''}
+            if encrypted_message.startswith(LEGACY_ENVELOPE_PREFIX):
+                return {'success': True, 'decrypted': self.decrypt_legacy_message(encrypted_message)}
+            plaintext = self.decrypt_bytes(text_to_envelope(encrypted_message))
+            return {'success': True, 'decrypted': plaintext.decode('utf-8')}
+        except Exception as e:
+            metrics.record_failure('decrypt', e)
+            return {'success': False, 'error': f"Ошибка дешифрования: {str(e)}"}
+    
+    def encrypt_many(self, messages: list, key_id: str = None, compress: bool = None) -> list:
+        nonces = memoryview(os.urandom(ENVELOPE_NONCE_SIZE * len(messages)))
+        return [
+            self.encrypt_record(message, key_id, compress, nonces[i * ENVELOPE_NONCE_SIZE:(i + 1) * ENVELOPE_NONCE_SIZE])
+            for i, message in enumerate(messages)
+        ]
+    
+    def reencrypt_message(self, encrypted_message: str) -> str:
+        encrypted_message = encrypted_message.strip()
+        if encrypted_message.startswith(LEGACY_ENVELOPE_PREFIX):
+            plaintext = self.decrypt_legacy_message(encrypted_message).encode('utf-8')
+            return envelope_to_text(self.encrypt_bytes(plaintext))
+        envelope = text_to_envelope(encrypted_message)
+        key_id, version = envelope_key(envelope)
+        current = self._state.user_version if key_id is None else self.tenant_keys.current(key_id)[0]
+        if version == current:
+            return None
+        plaintext = self.decrypt_bytes(envelope)
+        return envelope_to_text(self.encrypt_bytes(plaintext, key_id=key_id, compress=envelope_codec(envelope) != CODEC_NONE))
+    
+    def decrypt_many(self, encrypted_messages: list) -> list:
+        return [self.decrypt_record(encrypted_message) for encrypted_message in encrypted_messages]
+    
+    def _iter_ndjson(self, reader, field: str, process):
+        for line in iter_ndjson_lines(reader):
+            if line is None:
+                result = {'success': False, 'error': f"Запись длиннее {NDJSON_MAX_LINE} байт"}
+            else:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    result = {'success': False, 'error': "Неверная запись NDJSON"}
+                else:
+                    if isinstance(record, dict):
+                        fields = {name: value for name, value in record.items() if name != field}
+                        result = {**fields, **process(record.get(field), record)}
+                    else:
+                        result = process(record, {})
+            yield json_line(result)
+    
+    def iter_encrypt_ndjson(self, reader, key_id: str = None, compress: bool = None):
+        return self._iter_ndjson(
+            reader, 'message',
+            lambda message, record: self.encrypt_record(message, record.get('key_id', key_id), compress)
+        )
+    
+    def iter_decrypt_ndjson(self, reader):
+        return self._iter_ndjson(reader, 'encrypted', lambda encrypted, record: self.decrypt_record(encrypted))
+    
+    def iter_encrypt_stream(self, reader, chunk_size: int = STREAM_CHUNK_SIZE):
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError(f"Недопустимый размер блока: {chunk_size}")
+        aead = self._state.user_aead
+        prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+        header = STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION, chunk_size, prefix)
+        yield header
+        current = bytearray(chunk_size)
+        following = bytearray(chunk_size)
+        size = read_full(reader, current)
+        index = 0
+        while True:
+            next_size = read_full(reader, following) if size == chunk_size else 0
+            last = next_size == 0
+            yield aead.encrypt(stream_nonce(prefix, index, last), memoryview(current)[:size], header)
+            if last:
+                return
+            current, following = following, current
+            size = next_size
+            index += 1
+    
+    def iter_decrypt_stream(self, reader):
+        header = bytearray(STREAM_HEADER.size)
+        if read_full(reader, header) != STREAM_HEADER.size:
+            raise ValueError("Поток слишком короткий")
+        header = bytes(header)
+        magic, version, chunk_size, prefix = STREAM_HEADER.unpack(header)
+        if magic != STREAM_MAGIC:
+            raise ValueError("Неверный формат потока")
+        if version != STREAM_VERSION:
+            raise ValueError(f"Неподдерживаемая версия потока: {version}")
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError(f"Недопустимый размер блока: {chunk_size}")
+        state = self._state
+        aead = None
+        sealed_size = chunk_size + ENVELOPE_TAG_SIZE
+        current = bytearray(sealed_size)
+        following = bytearray(sealed_size)
+        size = read_full(reader, current)
+        index = 0
+        while True:
+            next_size = read_full(reader, following) if size == sealed_size else 0
+            last = next_size == 0
+            if size < ENVELOPE_TAG_SIZE:
+                raise ValueError("Поток обрезан")
+            if aead is None:
+                nonce = stream_nonce(prefix, index, last)
+                aead = state.user_aead_version(state.find_user_key_version(nonce, memoryview(current)[:size], header))
+            try:
+                yield aead.decrypt(stream_nonce(prefix, index, last), memoryview(current)[:size], header)
+            except InvalidTag:
+                raise ValueError(f"Ошибка аутентификации блока {index}: поток поврежден или обрезан")
+            if last:
+                return
+            current, following = following, current
+            size = next_size
+            index += 1
+    
+    def encrypt_stream(self, reader, writer, chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+        written = 0
+        for piece in self.iter_encrypt_stream(reader, chunk_size):
+            writer.write(piece)
+            written += len(piece)
+        return written
+    
+    def decrypt_stream(self, reader, writer) -> int:
+        written = 0
+        for piece in self.iter_decrypt_stream(reader):
+            writer.write(piece)
+            written += len(piece)
+        return written
+    
+    def encrypt_chunked(self, data, chunk_size: int = CONTAINER_CHUNK_SIZE, workers: int = None) -> bytearray:
+        output = bytearray(container_size(len(memoryview(data).cast('B')), chunk_size))
+        self.encrypt_chunked_into(data, output, chunk_size, workers)
+        return output
+    
+    def encrypt_chunked_into(self, data, output, chunk_size: int = CONTAINER_CHUNK_SIZE, workers: int = None):
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError(f"Недопустимый размер блока: {chunk_size}")
+        key = self.user_key
+        source = memoryview(data).cast('B')
+        length = len(source)
+        count = max(1, -(-length // chunk_size))
+        if len(output) != container_size(length, chunk_size):
+            raise ValueError("Размер выходного буфера не соответствует контейнеру")
+        prefix = os.urandom(CONTAINER_NONCE_PREFIX_SIZE)
+        header = CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, chunk_size, length, count, prefix)
+        data_offset = len(header) + count * CONTAINER_OFFSET.size
+        target = memoryview(output)
+        target[:len(header)] = header
+        for index in range(count):
+            CONTAINER_OFFSET.pack_into(target, len(header) + index * CONTAINER_OFFSET.size,
+                                       data_offset + index * (chunk_size + ENVELOPE_TAG_SIZE))
+        
+        def seal(index):
+            start = index * chunk_size
+            chunk = source[start:start + chunk_size]
+            offset = data_offset + index * (chunk_size + ENVELOPE_TAG_SIZE)
+            seal_chunk_into(key, header, container_nonce(prefix, index), chunk,
+                            target[offset:offset + len(chunk) + ENVELOPE_TAG_SIZE])
+        
+        self._run_chunks(seal, count, workers)
+    
+    def decrypt_chunked(self, container, workers: int = None) -> bytearray:
+        _, length, _, _ = parse_container_header(memoryview(container).cast('B'))
+        output = bytearray(length)
+        self.decrypt_chunked_into(container, output, workers)
+        return output
+    
+    def decrypt_chunked_into(self, container, output, workers: int = None):
+        state = self._state
+        source = memoryview(container).cast('B')
+        chunk_size, length, count, prefix = parse_container_header(source)
+        header = bytes(source[:CONTAINER_HEADER.size])
+        offsets = self._read_container_offsets(source, count)
+        if len(source) != offsets[0] + length + count * ENVELOPE_TAG_SIZE:
+            raise ValueError("Размер контейнера не соответствует заголовку: данные обрезаны или дополнены")
+        if len(output) != length:
+            raise ValueError("Размер выходного буфера не соответствует контейнеру")
+        first = source[offsets[0]:offsets[0] + min(chunk_size, length) + ENVELOPE_TAG_SIZE]
+        key = state.user_keys[state.find_user_key_version(container_nonce(prefix, 0), first, header)]
+        target = memoryview(output)
+        
+        def open_chunk(index):
+            start = index * chunk_size
+            size = min(chunk_size, length - start)
+            offset = offsets[index]
+            sealed = source[offset:offset + size + ENVELOPE_TAG_SIZE]
+            if len(sealed) != size + ENVELOPE_TAG_SIZE:
+                raise ValueError(f"Блок {index} выходит за границы контейнера")
+            open_chunk_into(key, header, container_nonce(prefix, index), sealed, target[start:], index)
+        
+        self._run_chunks(open_chunk, count, workers)
+    
+    def encrypt_file(self, input_path, output_path, chunk_size: int = CONTAINER_CHUNK_SIZE, workers: int = None) -> int:
+        check_distinct_files(input_path, output_path)
+        with open(input_path, 'rb') as src, atomic_output(output_path) as dst:
+            length = os.fstat(src.fileno()).st_size
+            size = container_size(length, chunk_size)
+            dst.truncate(size)
+            with map_file(src, length, mmap.ACCESS_READ) as source, map_file(dst, size, mmap.ACCESS_WRITE) as target:
+                error = run_on_mapping(self.encrypt_chunked_into, source, target, chunk_size, workers)
+            if error:
+                raise ValueError(error)
+        return size
+    
+    def decrypt_file(self, input_path, output_path, workers: int = None) -> int:
+        check_distinct_files(input_path, output_path)
+        with open(input_path, 'rb') as src, atomic_output(output_path) as dst:
+            size = os.fstat(src.fileno()).st_size
+            with map_file(src, size, mmap.ACCESS_READ) as source:
+                _, length, _, _ = parse_container_header(source)
+                dst.truncate(length)
+                with map_file(dst, length, mmap.ACCESS_WRITE) as target:
+                    error = run_on_mapping(self.decrypt_chunked_into, source, target, workers)
+            if error:
+                raise ValueError(error)
+        return length
+    
+    def container_path(self, name: str) -> Path:
+        filename = secure_filename(name)
+        if not filename:
+            raise ValueError("Недопустимое имя контейнера")
+        return self.containers_dir / filename
+    
+    def store_container(self, name: str, data) -> Path:
+        path = self.container_path(name)
+        self.containers_dir.mkdir(exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(self.encrypt_chunked(data))
+        return path
+    
+    def container_info(self, source) -> tuple:
+        source.seek(0)
+        return parse_container_header(source.read(CONTAINER_HEADER.size))
+    
+    def decrypt_range(self, source, offset: int, length: int) -> bytes:
+        if isinstance(source, (str, Path)):
+            with open(source, 'rb') as f:
+                return self.decrypt_range(f, offset, length)
+        if offset < 0 or length < 0:
+            raise ValueError("Недопустимый диапазон")
+        chunk_size, total, count, prefix = self.container_info(source)
+        end = min(offset + length, total)
+        if offset >= end:
+            return b''
+        source.seek(0)
+        header = source.read(CONTAINER_HEADER.size)
+        first = offset // chunk_size
+        last = (end - 1) // chunk_size
+        source.seek(CONTAINER_HEADER.size + first * CONTAINER_OFFSET.size)
+        index_data = source.read((last - first + 1) * CONTAINER_OFFSET.size)
+        if len(index_data) != (last - first + 1) * CONTAINER_OFFSET.size:
+            raise ValueError("Индекс контейнера обрезан")
+        state = self._state
+        aead = None
+        output = bytearray()
+        for index, (chunk_offset,) in enumerate(CONTAINER_OFFSET.iter_unpack(index_data), first):
+            start = index * chunk_size
+            size = min(chunk_size, total - start)
+            source.seek(chunk_offset)
+            sealed = source.read(size + ENVELOPE_TAG_SIZE)
+            if len(sealed) != size + ENVELOPE_TAG_SIZE:
+                raise ValueError(f"Блок {index} выходит за границы контейнера")
+            if aead is None:
+                nonce = container_nonce(prefix, index)
+                aead = state.user_aead_version(state.find_user_key_version(nonce, sealed, header))
+            try:
+                plaintext = aead.decrypt(container_nonce(prefix, index), sealed, header)
+            except InvalidTag:
+                raise ValueError(f"Ошибка аутентификации блока {index}: контейнер поврежден")
+            output += memoryview(plaintext)[max(offset - start, 0):end - start]
+        return bytes(output)
+    
+    def _read_container_offsets(self, source, count: int) -> list:
+        end = CONTAINER_HEADER.size + count * CONTAINER_OFFSET.size
+        if len(source) < end:
+            raise ValueError("Индекс контейнера обрезан")
+        return [offset for offset, in CONTAINER_OFFSET.iter_unpack(source[CONTAINER_HEADER.size:end])]
+    
+    def _run_chunks(self, task, count: int, workers: int = None):
+        workers = min(workers or CONTAINER_WORKERS, count)
+        if workers <= 1:
+            for index in range(count):
+                task(index)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(task, range(count)):
+                pass
+    
+    def decrypt_legacy_message(self, encrypted_message: str) -> str:
+        encrypted_data = json.loads(base64.b64decode(encrypted_message).decode())
+        nonce = base64.b64decode(encrypted_data['nonce'])
+        ciphertext = base64.b64decode(encrypted_data['ciphertext'])
+        tag = base64.b64decode(encrypted_data['tag'])
+        try:
+            plaintext = self._state.user_aead_version(1).decrypt(nonce, ciphertext + tag, None)
+        except InvalidTag:
+            raise ValueError("Неверный ключ или поврежденные данные")
+        return plaintext.decode('utf-8')
+    
+    def rotate_master_key(self) -> int:
+        with self._write_lock, self.key_db.transaction():
+            self.refresh_keys_signature()
+            old_master_key, user_keys = self.master_key, self.user_keys
+            new_master_key = os.urandom(32)
+            count = self.tenant_keys.rewrap(old_master_key, new_master_key)
+            self.save_user_key(user_keys, new_master_key)
+            self.save_master_key(new_master_key)
+            self._publish_written(new_master_key, user_keys)
+            return count + len(user_keys)
+    
     def delete_master_key(self):
-        if self.master_key_file.exists():
-            self.master_key_file.unlink()
-        if self.user_keys_file.exists():
-            self.user_keys_file.unlink()
-        self.master_key = None
-        self.user_key = None
-        self.load_or_generate_master_key()
-        self.load_or_generate_user_key()
+        with self._write_lock, self.key_db.transaction():
+            self.key_db.delete_meta('master_key')
+            self.key_db.execute("DELETE FROM user_keys")
+            self.tenant_keys.delete_all()
+            master_key = self.load_or_generate_master_key()
+            user_keys = self.load_or_generate_user_key(master_key)
+            self._publish_written(master_key, user_keys)
     
     def delete_user_key(self):
-        if self.user_keys_file.exists():
-            self.user_keys_file.unlink()
-        self.user_key = None
-        self.load_or_generate_user_key()
+        with self._write_lock, self.key_db.transaction():
+            self.refresh_keys_signature()
+            self.key_db.execute("DELETE FROM user_keys")
+            user_keys = self.load_or_generate_user_key()
+            self._publish_written(self.master_key, user_keys)
+    
+    def export_keys(self, master: bool = True, user: bool = True) -> str:
+        export_data = {}
+        if master:
+            export_data['master_key'] = self.key_db.get_meta('master_key')
+        if user:
+            export_data.update(user_key_data(self.read_user_key_records()))
+        return json.dumps(export_data, indent=2, ensure_ascii=False)
+    
+    def import_keys(self, key_data: dict):
+        if 'master_key' not in key_data and 'user_key' not in key_data:
+            raise ValueError("Неверный формат файла ключей")
+        with self._write_lock, self.key_db.transaction():
+            self.refresh_keys_signature()
+            master_key, user_keys = self.master_key, self.user_keys
+            if 'master_key' in key_data:
+                try:
+                    master_key = self.unwrap_master_key(key_data)
+                except Exception:
+                    raise ValueError("Ошибка загрузки мастер-ключа")
+            if 'user_key' in key_data:
+                try:
+                    wrapped_keys = user_key_records(key_data)
+                    user_keys = self.unwrap_user_keys(wrapped_keys, master_key)
+                except Exception:
+                    raise ValueError("Ошибка загрузки пользовательского ключа")
+            if 'master_key' in key_data:
+                self.key_db.set_meta('master_key', key_data['master_key'])
+                self.key_db.bump_generation()
+            if 'user_key' in key_data:
+                self.write_user_key_records(wrapped_keys)
+            if 'master_key' in key_data:
+                self.tenant_keys.clear_cache()
+            self._publish_written(master_key, user_keys)
     
     def delete_both_keys(self):
         self.delete_master_key()
+    
+    def iter_key_archive(self):
+        with self.key_db.snapshot() as connection:
+            wrapped_master_key = connection.execute("SELECT value FROM meta WHERE name = 'master_key'").fetchone()[0]
+            mac_key = archive_mac_key(self.unwrap_master_key({'master_key': wrapped_master_key}))
+            header = json_line({
+                'type': 'header',
+                'format': KEY_ARCHIVE_FORMAT,
+                'version': KEY_ARCHIVE_VERSION,
+                'archive_id': secrets.token_hex(16),
+                'created': int(time.time())
+            })
+            chain = archive_chain(mac_key, b'', header)
+            yield header
+            records = itertools.chain(
+                ({'type': 'master_key', 'master_key': wrapped_master_key},),
+                (
+                    {'type': 'user_key', 'version': version, 'wrapped_key': wrapped}
+                    for version, wrapped in connection.execute("SELECT version, wrapped_key FROM user_keys ORDER BY version")
+                ),
+                self.tenant_keys.iter_archive_records(connection)
+            )
+            count = 0
+            for count, record in enumerate(records, 1):
+                line = json_line({'n': count, **record})
+                chain = archive_chain(mac_key, chain, line)
+                yield line
+            yield json_line({'type': 'end', 'records': count, 'mac': chain.hex()})
+    
+    def export_key_archive(self, output) -> int:
+        size = 0
+        for piece in coalesce_chunks(self.iter_key_archive(), KEY_ARCHIVE_FLUSH_SIZE):
+            output.write(piece)
+            size += len(piece)
+        return size
+    
+    def import_key_archive(self, reader, batch_size: int = KEY_ARCHIVE_BATCH_SIZE) -> dict:
+        return KeyArchiveImport(self, batch_size).run(reader)
+    
+    def key_archive_status(self) -> dict:
+        return KeyArchiveImport(self).status()
+    
+    def records_path(self, name: str) -> Path:
+        filename = secure_filename(name)
+        if not filename:
+            raise ValueError("Недопустимое имя файла записей")
+        return self.records_dir / filename
+    
+    def start_reencryption(self, source: str, target: str, batch_size: int = REENCRYPT_BATCH_SIZE,
+                           max_rate: float = None) -> dict:
+        with self._write_lock:
+            if self.reencryption_job is not None and self.reencryption_job.running:
+                raise ValueError("Перешифрование уже выполняется")
+            source_path = self.records_path(source)
+            if not source_path.exists():
+                raise ValueError(f"Файл записей {source} не найден")
+            job = ReencryptionJob(self, source_path, self.records_path(target), batch_size, max_rate)
+            job.start()
+            self.reencryption_job = job
+            self.key_db.set_meta('reencryption', json.dumps({'source': str(job.source), 'target': str(job.target)}))
+            return job.status()
+    
+    def _current_reencryption(self) -> 'ReencryptionJob':
+        job = self.reencryption_job
+        active = self.key_db.get_meta('reencryption')
+        if active is None:
+            return job
+        active = json.loads(active)
+        if job is None or str(job.target) != active['target']:
+            job = ReencryptionJob(self, Path(active['source']), Path(active['target']))
+        return job
+    
+    def reencryption_status(self) -> dict:
+        job = self._current_reencryption()
+        if job is None:
+            return {'running': False}
+        return job.status()
+    
+    def stop_reencryption(self) -> dict:
+        job = self._current_reencryption()
+        if job is None:
+            raise ValueError("Перешифрование не запущено")
+        if job.running:
+            job.stop()
+        return job.status()
 
-crypt_manager = CryptManager()
-
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html lang="ru">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Crypt | Современное криптографическое приложение</title>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-    <style>
-        :root {
-            --primary-bg: linear-gradient(135deg, #0a0a2a, #1a1a5f, #0d0d33);
-            --card-bg: rgba(255, 255, 255, 0.08);
-            --card-border: rgba(255, 255, 255, 0.15);
-            --text-primary: #ffffff;
-            --text-secondary: rgba(255, 255, 255, 0.7);
-            --accent-encrypt: #2a5ee0;
-            --accent-decrypt: #4287f5;
-            --accent-hover: #3a75f0;
-            --success: #10b981;
-            --error: #ef4444;
-            --shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
+class KeyArchiveImport:
+    
+    _lock = threading.Lock()
+    
+    def __init__(self, manager: CryptManager, batch_size: int = KEY_ARCHIVE_BATCH_SIZE):
+        self.manager = manager
+        self.db = manager.key_db
+        self.batch_size = max(1, batch_size)
+        self.progress = None
+        self.saved_records = 0
+        self.staged = []
+    
+    def load_progress(self) -> dict:
+        progress = self.db.get_meta('archive_import')
+        return json.loads(progress) if progress else None
+    
+    def status(self) -> dict:
+        progress = self.load_progress()
+        if progress is None:
+            return {'in_progress': False}
+        return {
+            'in_progress': True,
+            'archive_id': progress['archive_id'],
+            'records': progress['records'],
+            'started': progress['started']
         }
-
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: 'Segoe UI', system-ui, -apple-system, sans-serif;
+    
+    def _readline(self, reader) -> bytes:
+        line = reader.readline(KEY_ARCHIVE_MAX_LINE + 1)
+        if len(line) > KEY_ARCHIVE_MAX_LINE:
+            raise ValueError("Слишком длинная запись в архиве ключей")
+        return line
+    
+    def _parse(self, line: bytes) -> dict:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError("Поврежденная запись в архиве ключей")
+        if not isinstance(record, dict):
+            raise ValueError("Поврежденная запись в архиве ключей")
+        return record
+    
+    def _start(self, archive_id: str):
+        progress = self.load_progress()
+        if progress is None or progress['archive_id'] != archive_id:
+            progress = {
+                'archive_id': archive_id,
+                'records': 0,
+                'chain': None,
+                'master_key': None,
+                'user_keys': {},
+                'started': int(time.time())
+            }
+            with self.db.transaction():
+                self.db.execute("DELETE FROM archive_tenant_key_versions")
+                self.db.execute("DELETE FROM archive_tenants")
+                self.db.set_meta('archive_import', json.dumps(progress))
+        self.progress = progress
+        self.saved_records = progress['records']
+    
+    def abort(self):
+        with self.db.transaction():
+            self.db.execute("DELETE FROM archive_tenant_key_versions")
+            self.db.execute("DELETE FROM archive_tenants")
+            self.db.delete_meta('archive_import')
+    
+    def run(self, reader) -> dict:
+        if not self._lock.acquire(blocking=False):
+            raise ValueError("Импорт архива ключей уже выполняется")
+        try:
+            return self._run(reader)
+        finally:
+            self._lock.release()
+    
+    def _run(self, reader) -> dict:
+        header_line = self._readline(reader)
+        header = self._parse(header_line)
+        if header.get('type') != 'header' or header.get('format') != KEY_ARCHIVE_FORMAT:
+            raise ValueError("Неверный формат архива ключей")
+        if header.get('version') != KEY_ARCHIVE_VERSION:
+            raise ValueError(f"Неподдерживаемая версия архива ключей: {header.get('version')}")
+        self._start(str(header.get('archive_id')))
+        progress = self.progress
+        mac_key = None
+        if progress['master_key']:
+            mac_key = archive_mac_key(self.manager.unwrap_master_key(progress))
+        chain = None
+        expected = None
+        while True:
+            line = self._readline(reader)
+            if not line:
+                self.flush()
+                raise ValueError(
+                    f"Архив ключей обрезан: сохранено записей {progress['records']}, повторите импорт для продолжения"
+                )
+            record = self._parse(line)
+            if record.get('type') == 'end':
+                if chain is None or self._readline(reader).strip():
+                    raise ValueError("Неверное завершение архива ключей")
+                return self.finish(record, chain)
+            number = record.get('n')
+            if chain is None:
+                if number == 1:
+                    if record.get('type') != 'master_key':
+                        raise ValueError("Первая запись архива должна содержать мастер-ключ")
+                    mac_key = archive_mac_key(self._unwrap_master_key(record['master_key']))
+                    chain = archive_chain(mac_key, b'', header_line)
+                elif number == progress['records'] + 1 and progress['chain']:
+                    chain = bytes.fromhex(progress['chain'])
+                else:
+                    raise ValueError(f"Архив начинается с записи {number}, ожидалась запись {progress['records'] + 1}")
+                expected = number
+            if number != expected:
+                raise ValueError(f"Нарушен порядок записей архива: получена {number}, ожидалась {expected}")
+            chain = archive_chain(mac_key, chain, line)
+            expected += 1
+            if number <= progress['records']:
+                if number == progress['records'] and chain.hex() != progress['chain']:
+                    raise ValueError("Архив не совпадает с прерванным импортом")
+                continue
+            self.apply(record)
+            progress['records'] = number
+            progress['chain'] = chain.hex()
+            if len(self.staged) >= self.batch_size:
+                self.flush()
+    
+    def _unwrap_master_key(self, wrapped: str) -> bytes:
+        try:
+            return self.manager.unwrap_master_key({'master_key': wrapped})
+        except Exception:
+            raise ValueError("Ошибка загрузки мастер-ключа из архива")
+    
+    def apply(self, record: dict):
+        progress = self.progress
+        kind = record.get('type')
+        if kind == 'master_key':
+            if record['n'] != 1:
+                raise ValueError("Мастер-ключ должен быть первой записью архива")
+            self._unwrap_master_key(record['master_key'])
+            progress['master_key'] = record['master_key']
+        elif kind == 'user_key':
+            version = int(record['version'])
+            master_key = self._unwrap_master_key(progress['master_key'])
+            try:
+                self.manager.decrypt_with_master_key(base64.b64decode(record['wrapped_key']), master_key)
+            except Exception:
+                raise ValueError(f"Ошибка загрузки версии {version} пользовательского ключа из архива")
+            progress['user_keys'][str(version)] = record['wrapped_key']
+        elif kind == 'tenant':
+            self.manager.tenant_keys.validate_key_id(record.get('key_id'))
+            wrapped_keys = record.get('wrapped_keys')
+            if not isinstance(wrapped_keys, dict) or str(record.get('version')) not in wrapped_keys:
+                raise ValueError(f"Неверная запись ключа {record.get('key_id')} в архиве")
+            self.staged.append(record)
+        else:
+            raise ValueError(f"Неизвестный тип записи архива: {kind}")
+    
+    def flush(self):
+        progress = self.progress
+        if progress['records'] == self.saved_records:
+            return
+        with self.db.transaction():
+            saved = self.load_progress()
+            if saved is None or saved['archive_id'] != progress['archive_id'] or saved['records'] != self.saved_records:
+                raise ValueError("Импорт архива ключей изменен другим процессом")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO archive_tenants (key_id, version, created) VALUES (?, ?, ?)",
+                ((record['key_id'], int(record['version']), int(record.get('created') or time.time())) for record in self.staged)
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO archive_tenant_key_versions (key_id, version, wrapped_key, created) VALUES (?, ?, ?, ?)",
+                (
+                    (record['key_id'], int(version), wrapped, int(record.get('created') or time.time()))
+                    for record in self.staged
+                    for version, wrapped in record['wrapped_keys'].items()
+                )
+            )
+            self.db.set_meta('archive_import', json.dumps(progress))
+        self.staged.clear()
+        self.saved_records = progress['records']
+    
+    def finish(self, trailer: dict, chain: bytes) -> dict:
+        progress = self.progress
+        if trailer.get('records') != progress['records'] or not secrets.compare_digest(str(trailer.get('mac')), chain.hex()):
+            self.staged.clear()
+            self.abort()
+            raise ValueError("Контрольная сумма архива ключей не совпадает, импорт отменен")
+        if not progress['master_key'] or not progress['user_keys']:
+            raise ValueError("В архиве нет мастер-ключа или пользовательского ключа")
+        manager = self.manager
+        master_key = self._unwrap_master_key(progress['master_key'])
+        wrapped_user_keys = {int(version): wrapped for version, wrapped in progress['user_keys'].items()}
+        user_keys = manager.unwrap_user_keys(wrapped_user_keys, master_key)
+        with manager._write_lock, self.db.transaction():
+            self.flush()
+            self.db.execute("DELETE FROM tenant_key_versions")
+            self.db.execute("DELETE FROM tenants")
+            self.db.execute("INSERT INTO tenants SELECT key_id, version, created FROM archive_tenants")
+            self.db.execute(
+                "INSERT INTO tenant_key_versions SELECT key_id, version, wrapped_key, created FROM archive_tenant_key_versions"
+            )
+            tenants = self.db.execute("SELECT COUNT(*) FROM tenants").fetchone()[0]
+            self.db.execute("DELETE FROM archive_tenant_key_versions")
+            self.db.execute("DELETE FROM archive_tenants")
+            self.db.set_meta('master_key', progress['master_key'])
+            manager.write_user_key_records(wrapped_user_keys)
+            self.db.delete_meta('archive_import')
+            manager._publish_written(master_key, user_keys)
+            manager.tenant_keys.clear_cache()
+        return {
+            'archive_id': progress['archive_id'],
+            'records': progress['records'],
+            'tenants': tenants,
+            'user_key_versions': len(user_keys)
         }
 
-        body {
-            background: var(--primary-bg);
-            color: var(--text-primary);
-            line-height: 1.6;
-            min-height: 100vh;
-            padding: 20px;
-            overflow-x: hidden;
-            background-size: 400% 400%;
-            animation: gradientBG 15s ease infinite;
-        }
+class ReencryptionJob:
+    
+    def __init__(self, manager: CryptManager, source: Path, target: Path,
+                 batch_size: int = REENCRYPT_BATCH_SIZE, max_rate: float = None):
+        if batch_size <= 0:
+            raise ValueError(f"Недопустимый размер пакета: {batch_size}")
+        if source.resolve() == target.resolve():
+            raise ValueError("Исходный и целевой файлы должны различаться")
+        self.manager = manager
+        self.source = source
+        self.target = target
+        self.checkpoint_file = target.with_name(target.name + '.checkpoint')
+        self.lock_file = target.with_name(target.name + '.lock')
+        self.stop_file = target.with_name(target.name + '.stop')
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.error = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = None
+        self.progress = self._load_checkpoint()
+    
+    @property
+    def running(self) -> bool:
+        if self._thread is not None:
+            return self._thread.is_alive()
+        return self.target_locked()
+    
+    def _lock_target(self):
+        self.target.parent.mkdir(parents=True, exist_ok=True)
+        lock = open(self.lock_file, 'a+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                raise ValueError(f"Файл {self.target.name} уже перешифровывается другим процессом")
+        return lock
+    
+    def _unlock_target(self):
+        lock, self._lock = self._lock, None
+        if lock is not None:
+            lock.close()
+    
+    def target_locked(self) -> bool:
+        if fcntl is None or not self.lock_file.exists():
+            return False
+        try:
+            self._lock_target().close()
+        except ValueError:
+            return True
+        return False
+    
+    def _new_progress(self) -> dict:
+        return {'source': str(self.source), 'key_versions': {}, 'source_offset': 0, 'target_offset': 0,
+                'processed': 0, 'reencrypted': 0, 'failed': 0, 'done': False}
+    
+    def _versions_current(self, versions) -> bool:
+        if not isinstance(versions, dict):
+            return False
+        try:
+            for key_id, version in versions.items():
+                current = self.manager.state.user_version if not key_id else self.manager.tenant_keys.current(key_id)[0]
+                if current != version:
+                    return False
+        except ValueError:
+            return False
+        return True
+    
+    def _load_checkpoint(self) -> dict:
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+            if progress.get('source') == str(self.source) and self._versions_current(progress.get('key_versions')):
+                return progress
+        except FileNotFoundError:
+            pass
+        return self._new_progress()
+    
+    def _save_checkpoint(self):
+        write_file_atomic(self.checkpoint_file, json_bytes(self.progress))
+    
+    def _stop_requested(self) -> bool:
+        if self._stop_event.is_set():
+            return True
+        if self.stop_file.exists():
+            self.stop_file.unlink(missing_ok=True)
+            return True
+        return False
+    
+    def _reencrypt_line(self, line: bytes) -> bytes:
+        record = json.loads(line)
+        reencrypted = self.manager.reencrypt_message(record['encrypted'])
+        key_id, version = envelope_key(text_to_envelope(reencrypted or record['encrypted']))
+        self.progress['key_versions'].setdefault(key_id or '', version)
+        if reencrypted is None:
+            return line
+        record['encrypted'] = reencrypted
+        self.progress['reencrypted'] += 1
+        return json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+    
+    def run(self):
+        if self._lock is not None:
+            return self._run()
+        self._lock = self._lock_target()
+        self.stop_file.unlink(missing_ok=True)
+        try:
+            return self._run()
+        finally:
+            self._unlock_target()
+    
+    def _run(self):
+        self.manager.reload_keys_if_changed(force=True)
+        progress = self.progress = self._load_checkpoint()
+        if progress['done']:
+            return progress
+        started = time.monotonic()
+        processed_at_start = progress['processed']
+        mode = 'r+b' if self.target.exists() else 'wb'
+        with open(self.source, 'rb') as source, open(self.target, mode) as target:
+            source.seek(progress['source_offset'])
+            target.truncate(progress['target_offset'])
+            target.seek(progress['target_offset'])
+            while not self._stop_requested():
+                batch = list(itertools.islice(iter(source.readline, b''), self.batch_size))
+                if not batch:
+                    progress['done'] = True
+                    self._save_checkpoint()
+                    break
+                output = []
+                for line in batch:
+                    if not line.strip():
+                        continue
+                    if not line.endswith(b'\n'):
+                        line += b'\n'
+                    try:
+                        output.append(self._reencrypt_line(line))
+                    except Exception:
+                        progress['failed'] += 1
+                        output.append(line)
+                    progress['processed'] += 1
+                self.manager.reload_keys_if_changed(force=True)
+                if not self._versions_current(progress['key_versions']):
+                    progress = self.progress = self._new_progress()
+                    processed_at_start = 0
+                    source.seek(0)
+                    target.seek(0)
+                    target.truncate(0)
+                    self._save_checkpoint()
+                    continue
+                target.write(b''.join(output))
+                target.flush()
+                os.fsync(target.fileno())
+                progress['source_offset'] = source.tell()
+                progress['target_offset'] = target.tell()
+                self._save_checkpoint()
+                if self.max_rate:
+                    ahead = (progress['processed'] - processed_at_start) / self.max_rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        self._stop_event.wait(ahead)
+        return progress
+    
+    def _run_in_background(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._unlock_target()
+    
+    def start(self):
+        self._lock = self._lock_target()
+        self.stop_file.unlink(missing_ok=True)
+        self._stop_event.clear()
+        self.error = None
+        self._thread = threading.Thread(target=self._run_in_background, name='reencryption', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = REENCRYPT_STOP_TIMEOUT):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            return
+        self.stop_file.touch()
+        deadline = time.monotonic() + timeout
+        while self.target_locked():
+            if time.monotonic() >= deadline:
+                raise ValueError("Перешифрование не остановилось за отведенное время")
+            time.sleep(0.05)
+        self.progress = self._load_checkpoint()
+    
+    def status(self) -> dict:
+        return {**self.progress, 'target': str(self.target), 'running': self.running, 'error': self.error}
 
-        @keyframes gradientBG {
-            0% { background-position: 0% 50%; }
-            50% { background-position: 100% 50%; }
-            100% { background-position: 0% 50%; }
-        }
+class LazyCryptManager:
+    
+    def __init__(self, factory=CryptManager):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+    
+    def load(self) -> CryptManager:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+                instance = self._instance
+        return instance
+    
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
 
-        .container {
-            max-width: 1600px;
-            width: 100%;
-            margin: 0 auto;
-            display: flex;
-            flex-direction: column;
-            gap: 30px;
-        }
+crypt_manager = LazyCryptManager()
 
-        .header {
-            text-align: center;
-            padding: 20px 0;
-            margin-bottom: 10px;
-            animation: fadeIn 0.8s ease-out;
-        }
+class AsyncCryptManager:
+    
+    def __init__(self, manager: CryptManager, max_workers: int = ASYNC_MAX_WORKERS,
+                 inline_threshold: int = ASYNC_INLINE_THRESHOLD):
+        self.manager = manager
+        self.max_workers = max_workers
+        self.inline_threshold = inline_threshold
+        self._executor = None
+        self._slots = None
+    
+    async def _offload(self, func, *args):
+        import asyncio
+        
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='crypt')
+            self._slots = asyncio.Semaphore(self.max_workers * 2)
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+    
+    def _inline(self, size: int, key_ids=()) -> bool:
+        if size > self.inline_threshold:
+            return False
+        key_ids = {key_id for key_id in key_ids if key_id}
+        return not key_ids or (self.manager.loaded and self.manager.tenant_keys.cached(key_ids))
+    
+    async def _call(self, size: int, func, *args, key_ids=()):
+        if self._inline(size, key_ids):
+            return func(*args)
+        return await self._offload(func, *args)
+    
+    async def encrypt_message(self, message: str, key_id: str = None, compress: bool = None) -> str:
+        return await self._call(len(message), self.manager.encrypt_message, message, key_id, compress, key_ids=(key_id,))
+    
+    async def decrypt_message(self, encrypted_message: str) -> str:
+        return await self._call(len(encrypted_message), self.manager.decrypt_message, encrypted_message,
+                                key_ids=(message_key_id(encrypted_message),))
+    
+    async def encrypt_many(self, messages: list, key_id: str = None, compress: bool = None) -> list:
+        size = sum(len(message) for message in messages if isinstance(message, str))
+        return await self._call(size, self.manager.encrypt_many, messages, key_id, compress, key_ids=(key_id,))
+    
+    async def decrypt_many(self, encrypted_messages: list) -> list:
+        size = sum(len(message) for message in encrypted_messages if isinstance(message, str))
+        return await self._call(size, self.manager.decrypt_many, encrypted_messages,
+                                key_ids=map(message_key_id, encrypted_messages))
+    
+    async def reload_keys_if_changed(self) -> bool:
+        if self.manager.loaded and not self.manager.key_check_due():
+            return False
+        return await self._offload(self.manager.reload_keys_if_changed)
+    
+    async def export_keys(self, master: bool = True, user: bool = True) -> str:
+        return await self._offload(self.manager.export_keys, master, user)
+    
+    async def import_keys(self, key_data: dict):
+        return await self._offload(self.manager.import_keys, key_data)
+    
+    async def rotate_master_key(self) -> int:
+        return await self._offload(self.manager.rotate_master_key)
+    
+    async def delete_master_key(self):
+        return await self._offload(self.manager.delete_master_key)
+    
+    async def delete_user_key(self):
+        return await self._offload(self.manager.delete_user_key)
+    
+    async def delete_both_keys(self):
+        return await self._offload(self.manager.delete_both_keys)
+    
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
-        .logo {
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            gap: 15px;
-            margin-bottom: 15px;
-        }
+async_crypt_manager = AsyncCryptManager(crypt_manager)
 
-        .logo-icon {
-            background: linear-gradient(135deg, var(--accent-encrypt), var(--accent-decrypt));
-            width: 60px;
-            height: 60px;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 28px;
-            box-shadow: var(--shadow);
-        }
+STYLE_CSS = """
+:root {
+    --primary-bg: linear-gradient(135deg, #0a0a2a, #1a1a5f, #0d0d33);
+    --card-bg: rgba(255, 255, 255, 0.08);
+    --card-border: rgba(255, 255, 255, 0.15);
+    --text-primary: #ffffff;
+    --text-secondary: rgba(255, 255, 255, 0.7);
+    --accent-encrypt: #2a5ee0;
+    --accent-decrypt: #4287f5;
+    --accent-hover: #3a75f0;
+    --success: #10b981;
+    --error: #ef4444;
+    --shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
+}
 
-        .header h1 {
-            font-size: 2.8rem;
-            font-weight: 800;
-            background: linear-gradient(to right, var(--accent-encrypt), var(--accent-decrypt));
-            -webkit-background-clip: text;
-            background-clip: text;
-            color: transparent;
-            margin-bottom: 10px;
-        }
+* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+    font-family: 'Segoe UI', system-ui, -apple-system, sans-serif;
+}
 
-        .header p {
-            color: var(--text-secondary);
-            font-size: 1.1rem;
-            max-width: 600px;
-            margin: 0 auto;
-            line-height: 1.7;
-        }
+body {
+    background: var(--primary-bg);
+    color: var(--text-primary);
+    line-height: 1.6;
+    min-height: 100vh;
+    padding: 20px;
+    overflow-x: hidden;
+    background-size: 400% 400%;
+    animation: gradientBG 15s ease infinite;
+}
 
-        .key-management {
-            display: flex;
-            justify-content: center;
-            gap: 15px;
-            flex-wrap: wrap;
-            animation: slideUp 0.6s ease-out;
-        }
+@keyframes gradientBG {
+    0% { background-position: 0% 50%; }
+    50% { background-position: 100% 50%; }
+    100% { background-position: 0% 50%; }
+}
 
-        .crypto-grid {
-            display: grid;
-            grid-template-columns: repeat(2, minmax(450px, 1fr));
-            gap: 25px;
-            max-width: 1250px;
-            margin: 0 auto;
-            width: 100%;
-        }
+.container {
+    max-width: 1600px;
+    width: 100%;
+    margin: 0 auto;
+    display: flex;
+    flex-direction: column;
+    gap: 30px;
+}
 
-        @media (max-width: 1100px) {
-            .crypto-grid {
-                grid-template-columns: 1fr;
-                max-width: 800px;
-            }
-        }
+.header {
+    text-align: center;
+    padding: 20px 0;
+    margin-bottom: 10px;
+    animation: fadeIn 0.8s ease-out;
+}
 
-        .crypto-section {
-            background: var(--card-bg);
-            border-radius: 16px;
-            padding: 25px;
-            backdrop-filter: blur(12px);
-            border: 1px solid var(--card-border);
-            box-shadow: var(--shadow);
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-            animation: fadeIn 0.8s ease-out;
-        }
+.logo {
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    gap: 15px;
+    margin-bottom: 15px;
+}
 
-        .crypto-section:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 12px 40px rgba(0, 0, 0, 0.4);
-        }
+.logo-icon {
+    background: linear-gradient(135deg, var(--accent-encrypt), var(--accent-decrypt));
+    width: 60px;
+    height: 60px;
+    border-radius: 50%;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    font-size: 28px;
+    box-shadow: var(--shadow);
+}
 
-        .crypto-section.encrypt { 
-            border-top: 4px solid var(--accent-encrypt);
-        }
+.header h1 {
+    font-size: 2.8rem;
+    font-weight: 800;
+    background: linear-gradient(to right, var(--accent-encrypt), var(--accent-decrypt));
+    -webkit-background-clip: text;
+    background-clip: text;
+    color: transparent;
+    margin-bottom: 10px;
+}
 
-        .crypto-section.decrypt { 
-            border-top: 4px solid var(--accent-decrypt);
-        }
+.header p {
+    color: var(--text-secondary);
+    font-size: 1.1rem;
+    max-width: 600px;
+    margin: 0 auto;
+    line-height: 1.7;
+}
 
-        .crypto-section h3 {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            margin-bottom: 20px;
-            font-size: 1.4rem;
-            font-weight: 600;
-            color: var(--text-primary);
-        }
+.key-management {
+    display: flex;
+    justify-content: center;
+    gap: 15px;
+    flex-wrap: wrap;
+    animation: slideUp 0.6s ease-out;
+}
 
-        .section-icon {
-            width: 36px;
-            height: 36px;
-            border-radius: 10px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 16px;
-        }
+.crypto-grid {
+    display: grid;
+    grid-template-columns: repeat(2, minmax(450px, 1fr));
+    gap: 25px;
+    max-width: 1250px;
+    margin: 0 auto;
+    width: 100%;
+}
 
-        .encrypt .section-icon {
-            background: rgba(42, 94, 224, 0.2);
-            color: var(--accent-encrypt);
-        }
+@media (max-width: 1100px) {
+    .crypto-grid {
+        grid-template-columns: 1fr;
+        max-width: 800px;
+    }
+}
 
-        .decrypt .section-icon {
-            background: rgba(66, 135, 245, 0.2);
-            color: var(--accent-decrypt);
-        }
+.crypto-section {
+    background: var(--card-bg);
+    border-radius: 16px;
+    padding: 25px;
+    backdrop-filter: blur(12px);
+    border: 1px solid var(--card-border);
+    box-shadow: var(--shadow);
+    transition: transform 0.3s ease, box-shadow 0.3s ease;
+    animation: fadeIn 0.8s ease-out;
+}
 
-        .form-group {
-            margin-bottom: 20px;
-        }
+.crypto-section:hover {
+    transform: translateY(-5px);
+    box-shadow: 0 12px 40px rgba(0, 0, 0, 0.4);
+}
 
-        label {
-            display: block;
-            margin-bottom: 8px;
-            color: var(--text-secondary);
-            font-weight: 500;
-            font-size: 0.9rem;
-        }
+.crypto-section.encrypt { 
+    border-top: 4px solid var(--accent-encrypt);
+}
 
-        textarea {
-            width: 100%;
-            min-height: 150px;
-            padding: 15px;
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: 12px;
-            background: rgba(0, 0, 0, 0.15);
-            color: var(--text-primary);
-            font-family: 'Roboto Mono', monospace;
-            font-size: 15px;
-            resize: vertical;
-            transition: all 0.3s ease;
-        }
+.crypto-section.decrypt { 
+    border-top: 4px solid var(--accent-decrypt);
+}
 
-        textarea:focus {
-            outline: none;
-            border-color: rgba(66, 135, 245, 0.4);
-            box-shadow: 0 0 0 3px rgba(66, 135, 245, 0.2);
-        }
+.crypto-section h3 {
+    display: flex;
+    align-items: center;
+    gap: 10px;
+    margin-bottom: 20px;
+    font-size: 1.4rem;
+    font-weight: 600;
+    color: var(--text-primary);
+}
 
-        .btn-group {
-            display: flex;
-            flex-wrap: wrap;
-            gap: 10px;
-            margin-top: 15px;
-        }
+.section-icon {
+    width: 36px;
+    height: 36px;
+    border-radius: 10px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    font-size: 16px;
+}
 
-        .btn {
-            padding: 12px 20px;
-            border: none;
-            border-radius: 10px;
-            font-size: 14px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            min-width: 120px;
-            justify-content: center;
-        }
+.encrypt .section-icon {
+    background: rgba(42, 94, 224, 0.2);
+    color: var(--accent-encrypt);
+}
 
-        .btn:hover {
-            transform: translateY(-2px);
-        }
+.decrypt .section-icon {
+    background: rgba(66, 135, 245, 0.2);
+    color: var(--accent-decrypt);
+}
 
-        .btn:active {
-            transform: translateY(1px);
-        }
+.form-group {
+    margin-bottom: 20px;
+}
 
-        .btn-encrypt {
-            background: var(--accent-encrypt);
-            color: white;
-        }
+label {
+    display: block;
+    margin-bottom: 8px;
+    color: var(--text-secondary);
+    font-weight: 500;
+    font-size: 0.9rem;
+}
 
-        .btn-encrypt:hover {
-            background: var(--accent-hover);
-            box-shadow: 0 4px 15px rgba(42, 94, 224, 0.4);
-        }
+textarea {
+    width: 100%;
+    min-height: 150px;
+    padding: 15px;
+    border: 1px solid rgba(255, 255, 255, 0.1);
+    border-radius: 12px;
+    background: rgba(0, 0, 0, 0.15);
+    color: var(--text-primary);
+    font-family: 'Roboto Mono', monospace;
+    font-size: 15px;
+    resize: vertical;
+    transition: all 0.3s ease;
+}
 
-        .btn-decrypt {
-            background: var(--accent-decrypt);
-            color: white;
-        }
+textarea:focus {
+    outline: none;
+    border-color: rgba(66, 135, 245, 0.4);
+    box-shadow: 0 0 0 3px rgba(66, 135, 245, 0.2);
+}
 
-        .btn-decrypt:hover {
-            background: var(--accent-hover);
-            box-shadow: 0 4px 15px rgba(66, 135, 245, 0.4);
-        }
+.btn-group {
+    display: flex;
+    flex-wrap: wrap;
+    gap: 10px;
+    margin-top: 15px;
+}
 
-        .btn-key {
-            background: rgba(255, 255, 255, 0.1);
-            color: var(--text-primary);
-            border: 1px solid rgba(255, 255, 255, 0.15);
-        }
+.btn {
+    padding: 12px 20px;
+    border: none;
+    border-radius: 10px;
+    font-size: 14px;
+    font-weight: 600;
+    cursor: pointer;
+    transition: all 0.3s ease;
+    display: flex;
+    align-items: center;
+    gap: 8px;
+    min-width: 120px;
+    justify-content: center;
+}
 
-        .btn-key:hover {
-            background: rgba(255, 255, 255, 0.2);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);
-        }
+.btn:hover {
+    transform: translateY(-2px);
+}
 
-        .btn-icon {
-            background: rgba(255, 255, 255, 0.1);
-            color: var(--text-primary);
-            border: 1px solid rgba(255, 255, 255, 0.15);
-            min-width: auto;
-            padding: 12px 15px;
-        }
+.btn:active {
+    transform: translateY(1px);
+}
 
-        .btn-icon:hover {
-            background: rgba(255, 255, 255, 0.2);
-        }
+.btn-encrypt {
+    background: var(--accent-encrypt);
+    color: white;
+}
 
-        .status {
-            text-align: center;
-            padding: 15px;
-            border-radius: 12px;
-            opacity: 0;
-            transition: opacity 0.3s ease;
-            margin-top: 20px;
-            backdrop-filter: blur(10px);
-        }
+.btn-encrypt:hover {
+    background: var(--accent-hover);
+    box-shadow: 0 4px 15px rgba(42, 94, 224, 0.4);
+}
 
-        .status.show {
-            opacity: 1;
-        }
+.btn-decrypt {
+    background: var(--accent-decrypt);
+    color: white;
+}
 
-        .status.success {
-            background: rgba(16, 185, 129, 0.15);
-            color: #10b981;
-            border: 1px solid rgba(16, 185, 129, 0.3);
-        }
+.btn-decrypt:hover {
+    background: var(--accent-hover);
+    box-shadow: 0 4px 15px rgba(66, 135, 245, 0.4);
+}
 
-        .status.error {
-            background: rgba(239, 68, 68, 0.15);
-            color: #ff0000;
-            border: 1px solid rgba(239, 68, 68, 0.3);
-        }
+.btn-key {
+    background: rgba(255, 255, 255, 0.1);
+    color: var(--text-primary);
+    border: 1px solid rgba(255, 255, 255, 0.15);
+}
 
-        .file-input {
-            display: none;
-        }
+.btn-key:hover {
+    background: rgba(255, 255, 255, 0.2);
+    box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);
+}
 
-        .info-section {
-            background: var(--card-bg);
-            border-radius: 16px;
-            padding: 25px;
-            backdrop-filter: blur(12px);
-            border: 1px solid var(--card-border);
-            margin-top: 10px;
-            animation: fadeIn 0.8s ease-out;
-            max-width: 1250px;
-            margin: 0 auto;
-            width: 100%;
-        }
+.btn-icon {
+    background: rgba(255, 255, 255, 0.1);
+    color: var(--text-primary);
+    border: 1px solid rgba(255, 255, 255, 0.15);
+    min-width: auto;
+    padding: 12px 15px;
+}
 
-        .info-section h3 {
-            color: var(--text-primary);
-            margin-bottom: 15px;
-            font-size: 1.3rem;
-            display: flex;
-            align-items: center;
-            gap: 10px;
-        }
+.btn-icon:hover {
+    background: rgba(255, 255, 255, 0.2);
+}
 
-        .features {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 20px;
-            margin-top: 15px;
-        }
+.status {
+    text-align: center;
+    padding: 15px;
+    border-radius: 12px;
+    opacity: 0;
+    transition: opacity 0.3s ease;
+    margin-top: 20px;
+    backdrop-filter: blur(10px);
+}
 
-        .feature {
-            display: flex;
-            gap: 12px;
-            align-items: flex-start;
-        }
+.status.show {
+    opacity: 1;
+}
 
-        .feature i {
-            background: rgba(66, 135, 245, 0.15);
-            color: var(--accent-decrypt);
-            width: 36px;
-            height: 36px;
-            border-radius: 10px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 16px;
-            flex-shrink: 0;
-        }
+.status.success {
+    background: rgba(16, 185, 129, 0.15);
+    color: #10b981;
+    border: 1px solid rgba(16, 185, 129, 0.3);
+}
 
-        .feature div h4 {
-            color: var(--text-primary);
-            margin-bottom: 5px;
-            font-size: 1rem;
-        }
+.status.error {
+    background: rgba(239, 68, 68, 0.15);
+    color: #ff0000;
+    border: 1px solid rgba(239, 68, 68, 0.3);
+}
 
-        .feature div p {
-            color: var(--text-secondary);
-            font-size: 0.9rem;
-            line-height: 1.6;
-        }
+.file-input {
+    display: none;
+}
 
-        @keyframes fadeIn {
-            from { opacity: 0; transform: translateY(20px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
+.info-section {
+    background: var(--card-bg);
+    border-radius: 16px;
+    padding: 25px;
+    backdrop-filter: blur(12px);
+    border: 1px solid var(--card-border);
+    margin-top: 10px;
+    animation: fadeIn 0.8s ease-out;
+    max-width: 1250px;
+    margin: 0 auto;
+    width: 100%;
+}
 
-        @keyframes slideUp {
-            from { opacity: 0; transform: translateY(30px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
+.info-section h3 {
+    color: var(--text-primary);
+    margin-bottom: 15px;
+    font-size: 1.3rem;
+    display: flex;
+    align-items: center;
+    gap: 10px;
+}
 
-        @media (max-width: 768px) {
-            .crypto-grid {
-                grid-template-columns: 1fr;
-                max-width: 100%;
-            }
-            
-            .container {
-                padding: 10px;
-            }
-            
-            .header h1 {
-                font-size: 2.2rem;
-            }
-            
-            .btn {
-                min-width: 100px;
-                padding: 10px 15px;
-                font-size: 13px;
-            }
-            
-            .btn-icon {
-                padding: 10px;
-            }
-            
-            .key-management {
-                gap: 10px;
-            }
-            
-            .logo-icon {
-                width: 50px;
-                height: 50px;
-                font-size: 24px;
-            }
-        }
+.features {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+    gap: 20px;
+    margin-top: 15px;
+}
 
-        @media (max-width: 480px) {
-            .btn-group {
-                justify-content: center;
-            }
-            
-            .btn {
-                flex-grow: 1;
-            }
-            
-            .header h1 {
-                font-size: 1.8rem;
-            }
-            
-            .header p {
-                font-size: 0.95rem;
-            }
-            
-            .crypto-section {
-                padding: 20px;
-            }
-            
-            .features {
-                grid-template-columns: 1fr;
-            }
-        }
+.feature {
+    display: flex;
+    gap: 12px;
+    align-items: flex-start;
+}
 
-        .modal {
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.8);
-            backdrop-filter: blur(10px);
-            z-index: 1000;
-            animation: fadeIn 0.3s ease;
-        }
+.feature i {
+    background: rgba(66, 135, 245, 0.15);
+    color: var(--accent-decrypt);
+    width: 36px;
+    height: 36px;
+    border-radius: 10px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    font-size: 16px;
+    flex-shrink: 0;
+}
 
-        .modal-content {
-            position: absolute;
-            top: 50%;
-            left: 50%;
-            transform: translate(-50%, -50%);
-            background: linear-gradient(135deg, #141432, #1d1d5a);
-            padding: 30px;
-            border-radius: 16px;
-            border: 1px solid rgba(66, 135, 245, 0.3);
-            max-width: 450px;
-            width: 90%;
-            text-align: center;
-            animation: modalAppear 0.4s cubic-bezier(0.175, 0.885, 0.32, 1.275);
-            box-shadow: 0 15px 50px rgba(0, 0, 0, 0.5);
-        }
+.feature div h4 {
+    color: var(--text-primary);
+    margin-bottom: 5px;
+    font-size: 1rem;
+}
 
-        @keyframes modalAppear {
-            0% { opacity: 0; transform: translate(-50%, -45%) scale(0.95); }
-            100% { opacity: 1; transform: translate(-50%, -50%) scale(1); }
-        }
+.feature div p {
+    color: var(--text-secondary);
+    font-size: 0.9rem;
+    line-height: 1.6;
+}
 
-        .modal-title {
-            font-size: 1.6rem;
-            margin-bottom: 15px;
-            color: var(--text-primary);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            gap: 12px;
-        }
+@keyframes fadeIn {
+    from { opacity: 0; transform: translateY(20px); }
+    to { opacity: 1; transform: translateY(0); }
+}
 
-        .modal-text {
-            color: var(--text-secondary);
-            margin-bottom: 25px;
-            line-height: 1.6;
-            font-size: 1rem;
-        }
+@keyframes slideUp {
+    from { opacity: 0; transform: translateY(30px); }
+    to { opacity: 1; transform: translateY(0); }
+}
 
-        .modal-buttons {
-            display: flex;
-            gap: 15px;
-            justify-content: center;
-            flex-wrap: wrap;
-        }
+@media (max-width: 768px) {
+    .crypto-grid {
+        grid-template-columns: 1fr;
+        max-width: 100%;
+    }
 
-        .modal-btn {
-            padding: 12px 25px;
-            border: none;
-            border-radius: 10px;
-            font-size: 14px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            background: linear-gradient(135deg, var(--accent-encrypt), var(--accent-decrypt));
-            color: white;
-            box-shadow: 0 4px 15px rgba(42, 94, 224, 0.3);
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }
+    .container {
+        padding: 10px;
+    }
 
-        .modal-btn:hover {
-            transform: translateY(-3px);
-            box-shadow: 0 6px 20px rgba(42, 94, 224, 0.4);
-        }
+    .header h1 {
+        font-size: 2.2rem;
+    }
 
-        .modal-btn:active {
-            transform: translateY(1px);
-        }
+    .btn {
+        min-width: 100px;
+        padding: 10px 15px;
+        font-size: 13px;
+    }
 
-        .modal-btn-cancel {
-            background: rgba(255, 255, 255, 0.1);
-            color: var(--text-primary);
-            border: 1px solid rgba(255, 255, 255, 0.2);
-            box-shadow: none;
-        }
+    .btn-icon {
+        padding: 10px;
+    }
 
-        .modal-btn-cancel:hover {
-            background: rgba(255, 255, 255, 0.2);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);
-        }
+    .key-management {
+        gap: 10px;
+    }
 
-        /* Уведомления */
-        #notifications {
-            position: fixed;
-            top: 20px;
-            left: 20px;
-            z-index: 2000;
-            display: flex;
-            flex-direction: column;
-            gap: 10px;
-            max-width: 400px;
-            width: calc(100% - 40px);
-            pointer-events: none;
-        }
+    .logo-icon {
+        width: 50px;
+        height: 50px;
+        font-size: 24px;
+    }
+}
 
-        .notification {
-            padding: 16px 20px;
-            border-radius: 12px;
-            font-size: 0.95rem;
-            font-weight: 500;
-            display: flex;
-            align-items: center;
-            gap: 12px;
-            background: linear-gradient(135deg, rgba(20, 20, 50, 0.95), rgba(29, 29, 90, 0.95));
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-            backdrop-filter: blur(10px);
-            transform: translateX(-120%);
-            animation: slideIn 0.5s cubic-bezier(0.68, -0.55, 0.265, 1.55) forwards;
-            pointer-events: all;
-        }
+@media (max-width: 480px) {
+    .btn-group {
+        justify-content: center;
+    }
+
+    .btn {
+        flex-grow: 1;
+    }
+
+    .header h1 {
+        font-size: 1.8rem;
+    }
+
+    .header p {
+        font-size: 0.95rem;
+    }
+
+    .crypto-section {
+        padding: 20px;
+    }
+
+    .features {
+        grid-template-columns: 1fr;
+    }
+}
+
+.modal {
+    display: none;
+    position: fixed;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    background: rgba(0, 0, 0, 0.8);
+    backdrop-filter: blur(10px);
+    z-index: 1000;
+    animation: fadeIn 0.3s ease;
+}
+
+.modal-content {
+    position: absolute;
+    top: 50%;
+    left: 50%;
+    transform: translate(-50%, -50%);
+    background: linear-gradient(135deg, #141432, #1d1d5a);
+    padding: 30px;
+    border-radius: 16px;
+    border: 1px solid rgba(66, 135, 245, 0.3);
+    max-width: 450px;
+    width: 90%;
+    text-align: center;
+    animation: modalAppear 0.4s cubic-bezier(0.175, 0.885, 0.32, 1.275);
+    box-shadow: 0 15px 50px rgba(0, 0, 0, 0.5);
+}
+
+@keyframes modalAppear {
+    0% { opacity: 0; transform: translate(-50%, -45%) scale(0.95); }
+    100% { opacity: 1; transform: translate(-50%, -50%) scale(1); }
+}
+
+.modal-title {
+    font-size: 1.6rem;
+    margin-bottom: 15px;
+    color: var(--text-primary);
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    gap: 12px;
+}
+
+.modal-text {
+    color: var(--text-secondary);
+    margin-bottom: 25px;
+    line-height: 1.6;
+    font-size: 1rem;
+}
+
+.modal-buttons {
+    display: flex;
+    gap: 15px;
+    justify-content: center;
+    flex-wrap: wrap;
+}
+
+.modal-btn {
+    padding: 12px 25px;
+    border: none;
+    border-radius: 10px;
+    font-size: 14px;
+    font-weight: 600;
+    cursor: pointer;
+    transition: all 0.3s ease;
+    background: linear-gradient(135deg, var(--accent-encrypt), var(--accent-decrypt));
+    color: white;
+    box-shadow: 0 4px 15px rgba(42, 94, 224, 0.3);
+    display: flex;
+    align-items: center;
+    gap: 8px;
+}
+
+.modal-btn:hover {
+    transform: translateY(-3px);
+    box-shadow: 0 6px 20px rgba(42, 94, 224, 0.4);
+}
+
+.modal-btn:active {
+    transform: translateY(1px);
+}
+
+.modal-btn-cancel {
+    background: rgba(255, 255, 255, 0.1);
+    color: var(--text-primary);
+    border: 1px solid rgba(255, 255, 255, 0.2);
+    box-shadow: none;
+}
+
+.modal-btn-cancel:hover {
+    background: rgba(255, 255, 255, 0.2);
+    box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);
+}
+
+/* Уведомления */
+#notifications {
+    position: fixed;
+    top: 20px;
+    left: 20px;
+    z-index: 2000;
+    display: flex;
+    flex-direction: column;
+    gap: 10px;
+    max-width: 400px;
+    width: calc(100% - 40px);
+    pointer-events: none;
+}
+
+.notification {
+    padding: 16px 20px;
+    border-radius: 12px;
+    font-size: 0.95rem;
+    font-weight: 500;
+    display: flex;
+    align-items: center;
+    gap: 12px;
+    background: linear-gradient(135deg, rgba(20, 20, 50, 0.95), rgba(29, 29, 90, 0.95));
+    border: 1px solid rgba(255, 255, 255, 0.1);
+    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
+    backdrop-filter: blur(10px);
+    transform: translateX(-120%);
+    animation: slideIn 0.5s cubic-bezier(0.68, -0.55, 0.265, 1.55) forwards;
+    pointer-events: all;
+}
+
+.notification.success {
+    border-left: 4px solid var(--success);
+}
 
-        .notification.success {
-            border-left: 4px solid var(--success);
+.notification.error {
+    border-left: 4px solid var(--error);
+}
+
+.notification i {
+    font-size: 1.2rem;
+}
+
+.notification.success i {
+    color: var(--success);
+}
+
+.notification.error i {
+    color: var(--error);
+}
+
+@keyframes slideIn {
+    0% {
+        transform: translateX(-120%);
+        opacity: 0;
+    }
+    100% {
+        transform: translateX(0);
+        opacity: 1;
+    }
+}
+
+@keyframes slideOut {
+    0% {
+        transform: translateX(0);
+        opacity: 1;
+    }
+    100% {
+        transform: translateX(-120%);
+        opacity: 0;
+    }
+}
+
+.notification.slide-out {
+    animation: slideOut 0.5s cubic-bezier(0.68, -0.55, 0.265, 1.55) forwards;
+}
+"""
+
+SCRIPT_JS = """
+function showNotification(message, type = 'info') {
+    const notifications = document.getElementById('notifications');
+    const notification = document.createElement('div');
+    notification.className = `notification ${type}`;
+
+    const icon = type === 'success' ? 'check-circle' : 
+                type === 'error' ? 'exclamation-circle' : 
+                'info-circle';
+
+    notification.innerHTML = `
+        <i class="fas fa-${icon}"></i>
+        <span>${message}</span>
+    `;
+
+    notifications.appendChild(notification);
+
+    setTimeout(() => {
+        notification.classList.add('slide-out');
+        setTimeout(() => {
+            notifications.removeChild(notification);
+        }, 500);
+    }, 3000);
+}
+
+function showStatus(message, isError = false) {
+    showNotification(message, isError ? 'error' : 'success');
+}
+
+async function encryptText() {
+    const plaintext = document.getElementById('plaintext').value;
+    if (!plaintext.trim()) {
+        showStatus('Введите текст для шифрования', true);
+        return;
+    }
+
+    const encryptBtn = document.querySelector('.btn-encrypt');
+    const originalHtml = encryptBtn.innerHTML;
+    encryptBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Шифрование...';
+    encryptBtn.disabled = true;
+
+    try {
+        const response = await fetch('/encrypt', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                message: plaintext
+            })
+        });
+
+        const result = await response.json();
+
+        if (!result.success) {
+            throw new Error(result.error || 'Ошибка шифрования');
         }
 
-        .notification.error {
-            border-left: 4px solid var(--error);
+        document.getElementById('encrypted_result').value = result.encrypted;
+        showStatus('Текст успешно зашифрован!');
+    } catch (error) {
+        showStatus('Ошибка при шифровании: ' + error.message, true);
+    } finally {
+        encryptBtn.innerHTML = originalHtml;
+        encryptBtn.disabled = false;
+    }
+}
+
+async function decryptText() {
+    const ciphertext = document.getElementById('ciphertext').value;
+    if (!ciphertext.trim()) {
+        showStatus('Введите зашифрованный текст', true);
+        return;
+    }
+
+    const decryptBtn = document.querySelector('.btn-decrypt');
+    const originalHtml = decryptBtn.innerHTML;
+    decryptBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Дешифрование...';
+    decryptBtn.disabled = true;
+
+    try {
+        const response = await fetch('/decrypt', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                encrypted: ciphertext
+            })
+        });
+
+        const result = await response.json();
+
+        if (!result.success) {
+            throw new Error(result.error || 'Ошибка дешифрования');
         }
 
-        .notification i {
-            font-size: 1.2rem;
+        document.getElementById('decrypted_result').value = result.decrypted;
+        showStatus('Текст успешно расшифрован!');
+    } catch (error) {
+        showStatus('Ошибка при дешифровании: ' + error.message, true);
+    } finally {
+        decryptBtn.innerHTML = originalHtml;
+        decryptBtn.disabled = false;
+    }
+}
+
+function showExportModal() {
+    document.getElementById('exportModal').style.display = 'block';
+}
+
+function closeExportModal() {
+    document.getElementById('exportModal').style.display = 'none';
+}
+
+async function exportMasterKey() {
+    closeExportModal();
+    try {
+        showStatus('Экспорт мастер-ключа...');
+        const response = await fetch('/export_master_key');
+        if (!response.ok) throw new Error('Ошибка экспорта');
+        const blob = await response.blob();
+        const url = URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = 'master_key.json';
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        URL.revokeObjectURL(url);
+        showStatus('Мастер-ключ экспортирован!');
+    } catch (error) {
+        showStatus('Ошибка: ' + error.message, true);
+    }
+}
+
+async function exportUserKey() {
+    closeExportModal();
+    try {
+        showStatus('Экспорт пользовательского ключа...');
+        const response = await fetch('/export_user_key');
+        if (!response.ok) throw new Error('Ошибка экспорта');
+        const blob = await response.blob();
+        const url = URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = 'user_key.json';
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        URL.revokeObjectURL(url);
+        showStatus('Пользовательский ключ экспортирован!');
+    } catch (error) {
+        showStatus('Ошибка: ' + error.message, true);
+    }
+}
+
+async function exportBothKeys() {
+    closeExportModal();
+    try {
+        showStatus('Экспорт обоих ключей...');
+        const response = await fetch('/export_both_keys');
+        if (!response.ok) throw new Error('Ошибка экспорта');
+        const blob = await response.blob();
+        const url = URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = 'keys.json';
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        URL.revokeObjectURL(url);
+        showStatus('Оба ключа экспортированы!');
+    } catch (error) {
+        showStatus('Ошибка: ' + error.message, true);
+    }
+}
+
+async function importKeys(input) {
+    const file = input.files[0];
+    if (!file) return;
+
+    try {
+        showStatus('Импорт ключей...');
+        const fileContent = await file.text();
+
+        const response = await fetch('/import_keys', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ key_data: fileContent })
+        });
+
+        const result = await response.json();
+
+        if (!result.success) {
+            throw new Error(result.error);
         }
 
-        .notification.success i {
-            color: var(--success);
+        showStatus('Ключи успешно импортированы!');
+    } catch (error) {
+        showStatus('Ошибка при импорте: ' + error.message, true);
+    } finally {
+        input.value = '';
+    }
+}
+
+function showDeleteModal() {
+    document.getElementById('deleteModal').style.display = 'block';
+}
+
+function closeDeleteModal() {
+    document.getElementById('deleteModal').style.display = 'none';
+}
+
+async function deleteMasterKey() {
+    closeDeleteModal();
+    try {
+        showStatus('Удаление мастер-ключа...');
+        const response = await fetch('/delete_master_key', { method: 'POST' });
+        const result = await response.json();
+        if (!result.success) throw new Error(result.error);
+        clearAllFields();
+        showStatus('Мастер-ключ удален, оба ключа перегенерированы!');
+    } catch (error) {
+        showStatus('Ошибка: ' + error.message, true);
+    }
+}
+
+async function deleteUserKey() {
+    closeDeleteModal();
+    try {
+        showStatus('Удаление пользовательского ключа...');
+        const response = await fetch('/delete_user_key', { method: 'POST' });
+        const result = await response.json();
+        if (!result.success) throw new Error(result.error);
+        clearAllFields();
+        showStatus('Пользовательский ключ удален и перегенерирован!');
+    } catch (error) {
+        showStatus('Ошибка: ' + error.message, true);
+    }
+}
+
+async function deleteBothKeys() {
+    closeDeleteModal();
+    try {
+        showStatus('Удаление обоих ключей...');
+        const response = await fetch('/delete_both_keys', { method: 'POST' });
+        const result = await response.json();
+        if (!result.success) throw new Error(result.error);
+        clearAllFields();
+        showStatus('Оба ключа удалены и перегенерированы!');
+    } catch (error) {
+        showStatus('Ошибка: ' + error.message, true);
+    }
+}
+
+function clearAllFields() {
+    document.getElementById('plaintext').value = '';
+    document.getElementById('encrypted_result').value = '';
+    document.getElementById('ciphertext').value = '';
+    document.getElementById('decrypted_result').value = '';
+}
+
+window.onclick = function(event) {
+    const exportModal = document.getElementById('exportModal');
+    const deleteModal = document.getElementById('deleteModal');
+    if (event.target === exportModal) closeExportModal();
+    if (event.target === deleteModal) closeDeleteModal();
+}
+
+document.addEventListener('keydown', function(e) {
+    if (e.key === 'Escape') {
+        closeExportModal();
+        closeDeleteModal();
+    }
+});
+
+document.addEventListener('keydown', function(e) {
+    if (e.ctrlKey) {
+        if (e.key === 'e') {
+            e.preventDefault();
+            encryptText();
+        } else if (e.key === 'd') {
+            e.preventDefault();
+            decryptText();
         }
+    }
+});
+
+async function copyToClipboard(elementId) {
+    const element = document.getElementById(elementId);
+    if (!element.value.trim()) {
+        showStatus('Поле пустое, нечего копировать', true);
+        return;
+    }
+
+    try {
+        await navigator.clipboard.writeText(element.value);
+
+        const copyBtn = document.querySelector(`[onclick="copyToClipboard('${elementId}')"]`);
+        const originalHtml = copyBtn.innerHTML;
+        copyBtn.innerHTML = '<i class="fas fa-check"></i>';
 
-        .notification.error i {
-            color: var(--error);
+        setTimeout(() => {
+            copyBtn.innerHTML = originalHtml;
+        }, 2000);
+
+        showStatus('Скопировано в буфер обмена!');
+    } catch (error) {
+        showStatus('Ошибка при копировании: ' + error.message, true);
+    }
+}
+
+async function pasteFromClipboard(elementId) {
+    try {
+        const text = await navigator.clipboard.readText();
+        if (!text) {
+            throw new Error('Буфер обмена пуст');
         }
+        document.getElementById(elementId).value = text;
+        showStatus('Текст вставлен из буфера обмена!');
+    } catch (error) {
+        showStatus('Ошибка при вставке: ' + error.message, true);
+    }
+}
 
-        @keyframes slideIn {
-            0% {
-                transform: translateX(-120%);
-                opacity: 0;
-            }
-            100% {
-                transform: translateX(0);
-                opacity: 1;
+function downloadText(elementId, filename) {
+    const text = document.getElementById(elementId).value;
+    if (!text.trim()) {
+        showStatus('Поле пустое, нечего скачивать', true);
+        return;
+    }
+
+    try {
+        const blob = new Blob([text], { type: 'text/plain;charset=utf-8' });
+        const url = URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = filename;
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        URL.revokeObjectURL(url);
+
+        showStatus('Файл успешно скачан!');
+    } catch (error) {
+        showStatus('Ошибка при скачивании: ' + error.message, true);
+    }
+}
+
+async function uploadText(input, elementId) {
+    const file = input.files[0];
+    if (!file) return;
+
+    try {
+        const reader = new FileReader();
+
+        reader.onload = function(e) {
+            try {
+                const text = e.target.result;
+                document.getElementById(elementId).value = text;
+                showStatus('Текст успешно загружен из файла!');
+            } catch (error) {
+                showStatus('Ошибка при чтении файла: ' + error.message, true);
             }
-        }
+        };
+
+        reader.onerror = function() {
+            showStatus('Ошибка при чтении файла', true);
+        };
 
-        @keyframes slideOut {
-            0% {
-                transform: translateX(0);
-                opacity: 1;
-            }
-            100% {
-                transform: translateX(-120%);
-                opacity: 0;
-            }
-        }
+        reader.readAsText(file, 'utf-8');
+    } catch (error) {
+        showStatus('Ошибка при загрузке файла: ' + error.message, true);
+    } finally {
+        input.value = '';
+    }
+}
+"""
 
-        .notification.slide-out {
-            animation: slideOut 0.5s cubic-bezier(0.68, -0.55, 0.265, 1.55) forwards;
-        }
-    </style>
+HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="ru">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Crypt | Современное криптографическое приложение</title>
+    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
+    <link rel="stylesheet" href="{{ style_url }}">
 </head>
 <body>
     <div class="container">
@@ -1001,404 +3945,159 @@ HTML_TEMPLATE = """
         </div>
     </div>
 
-    <script>
-        function showNotification(message, type = 'info') {
-            const notifications = document.getElementById('notifications');
-            const notification = document.createElement('div');
-            notification.className = `notification ${type}`;
-            
-            const icon = type === 'success' ? 'check-circle' : 
-                        type === 'error' ? 'exclamation-circle' : 
-                        'info-circle';
-            
-            notification.innerHTML = `
-                <i class="fas fa-${icon}"></i>
-                <span>${message}</span>
-            `;
-            
-            notifications.appendChild(notification);
-            
-            setTimeout(() => {
-                notification.classList.add('slide-out');
-                setTimeout(() => {
-                    notifications.removeChild(notification);
-                }, 500);
-            }, 3000);
-        }
-
-        function showStatus(message, isError = false) {
-            showNotification(message, isError ? 'error' : 'success');
-        }
-
-        async function encryptText() {
-            const plaintext = document.getElementById('plaintext').value;
-            if (!plaintext.trim()) {
-                showStatus('Введите текст для шифрования', true);
-                return;
-            }
-            
-            const encryptBtn = document.querySelector('.btn-encrypt');
-            const originalHtml = encryptBtn.innerHTML;
-            encryptBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Шифрование...';
-            encryptBtn.disabled = true;
-            
-            try {
-                const response = await fetch('/encrypt', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        message: plaintext
-                    })
-                });
-                
-                const result = await response.json();
-                
-                if (!result.success) {
-                    throw new Error(result.error || 'Ошибка шифрования');
-                }
-                
-                document.getElementById('encrypted_result').value = result.encrypted;
-                showStatus('Текст успешно зашифрован!');
-            } catch (error) {
-                showStatus('Ошибка при шифровании: ' + error.message, true);
-            } finally {
-                encryptBtn.innerHTML = originalHtml;
-                encryptBtn.disabled = false;
-            }
-        }
-
-        async function decryptText() {
-            const ciphertext = document.getElementById('ciphertext').value;
-            if (!ciphertext.trim()) {
-                showStatus('Введите зашифрованный текст', true);
-                return;
-            }
-            
-            const decryptBtn = document.querySelector('.btn-decrypt');
-            const originalHtml = decryptBtn.innerHTML;
-            decryptBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Дешифрование...';
-            decryptBtn.disabled = true;
-            
-            try {
-                const response = await fetch('/decrypt', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        encrypted: ciphertext
-                    })
-                });
-                
-                const result = await response.json();
-                
-                if (!result.success) {
-                    throw new Error(result.error || 'Ошибка дешифрования');
-                }
-                
-                document.getElementById('decrypted_result').value = result.decrypted;
-                showStatus('Текст успешно расшифрован!');
-            } catch (error) {
-                showStatus('Ошибка при дешифровании: ' + error.message, true);
-            } finally {
-                decryptBtn.innerHTML = originalHtml;
-                decryptBtn.disabled = false;
-            }
-        }
-
-        function showExportModal() {
-            document.getElementById('exportModal').style.display = 'block';
-        }
-
-        function closeExportModal() {
-            document.getElementById('exportModal').style.display = 'none';
-        }
-
-        async function exportMasterKey() {
-            closeExportModal();
-            try {
-                showStatus('Экспорт мастер-ключа...');
-                const response = await fetch('/export_master_key');
-                if (!response.ok) throw new Error('Ошибка экспорта');
-                const blob = await response.blob();
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = 'master_key.json';
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                URL.revokeObjectURL(url);
-                showStatus('Мастер-ключ экспортирован!');
-            } catch (error) {
-                showStatus('Ошибка: ' + error.message, true);
-            }
-        }
-
-        async function exportUserKey() {
-            closeExportModal();
-            try {
-                showStatus('Экспорт пользовательского ключа...');
-                const response = await fetch('/export_user_key');
-                if (!response.ok) throw new Error('Ошибка экспорта');
-                const blob = await response.blob();
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = 'user_key.json';
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                URL.revokeObjectURL(url);
-                showStatus('Пользовательский ключ экспортирован!');
-            } catch (error) {
-                showStatus('Ошибка: ' + error.message, true);
-            }
-        }
-
-        async function exportBothKeys() {
-            closeExportModal();
-            try {
-                showStatus('Экспорт обоих ключей...');
-                const response = await fetch('/export_both_keys');
-                if (!response.ok) throw new Error('Ошибка экспорта');
-                const blob = await response.blob();
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = 'keys.json';
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                URL.revokeObjectURL(url);
-                showStatus('Оба ключа экспортированы!');
-            } catch (error) {
-                showStatus('Ошибка: ' + error.message, true);
-            }
-        }
+    <script src="{{ script_url }}"></script>
+</body>
+</html>
+"""
 
-        async function importKeys(input) {
-            const file = input.files[0];
-            if (!file) return;
-            
-            try {
-                showStatus('Импорт ключей...');
-                const fileContent = await file.text();
-                
-                const response = await fetch('/import_keys', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({ key_data: fileContent })
-                });
-                
-                const result = await response.json();
-                
-                if (!result.success) {
-                    throw new Error(result.error);
-                }
-                
-                showStatus('Ключи успешно импортированы!');
-            } catch (error) {
-                showStatus('Ошибка при импорте: ' + error.message, true);
-            } finally {
-                input.value = '';
-            }
-        }
+@dataclass(frozen=True)
+class StaticAsset:
+    body: bytes
+    content_type: str
+    etag: str
+    encodings: dict
 
-        function showDeleteModal() {
-            document.getElementById('deleteModal').style.display = 'block';
-        }
+def build_asset(text: str, content_type: str) -> StaticAsset:
+    body = text.encode('utf-8')
+    encodings = {'gzip': gzip.compress(body, 9)}
+    try:
+        import brotli
+        encodings['br'] = brotli.compress(body, quality=11)
+    except ImportError:
+        pass
+    return StaticAsset(body, content_type, hashlib.sha256(body).hexdigest()[:20], encodings)
 
-        function closeDeleteModal() {
-            document.getElementById('deleteModal').style.display = 'none';
-        }
+def asset_variant(asset: StaticAsset, cache_control: str, accept_encoding: str, if_none_match: str) -> tuple:
+    encoding = parse_accept_header(accept_encoding).best_match(list(asset.encodings))
+    etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+    headers = {
+        'ETag': quote_etag(etag),
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding',
+    }
+    if parse_etags(if_none_match).contains(etag):
+        return 304, headers, b''
+    headers['Content-Type'] = asset.content_type
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        return 200, headers, asset.encodings[encoding]
+    return 200, headers, asset.body
 
-        async function deleteMasterKey() {
-            closeDeleteModal();
-            try {
-                showStatus('Удаление мастер-ключа...');
-                const response = await fetch('/delete_master_key', { method: 'POST' });
-                const result = await response.json();
-                if (!result.success) throw new Error(result.error);
-                clearAllFields();
-                showStatus('Мастер-ключ удален, оба ключа перегенерированы!');
-            } catch (error) {
-                showStatus('Ошибка: ' + error.message, true);
-            }
-        }
+def asset_response(asset: StaticAsset, cache_control: str) -> Response:
+    status, headers, body = asset_variant(
+        asset,
+        cache_control,
+        request.headers.get('Accept-Encoding'),
+        request.headers.get('If-None-Match')
+    )
+    return Response(body, status=status, headers=headers)
 
-        async function deleteUserKey() {
-            closeDeleteModal();
-            try {
-                showStatus('Удаление пользовательского ключа...');
-                const response = await fetch('/delete_user_key', { method: 'POST' });
-                const result = await response.json();
-                if (!result.success) throw new Error(result.error);
-                clearAllFields();
-                showStatus('Пользовательский ключ удален и перегенерирован!');
-            } catch (error) {
-                showStatus('Ошибка: ' + error.message, true);
-            }
-        }
+@functools.lru_cache(maxsize=None)
+def static_assets() -> dict:
+    return {
+        'crypt.css': build_asset(STYLE_CSS, 'text/css; charset=utf-8'),
+        'crypt.js': build_asset(SCRIPT_JS, 'application/javascript; charset=utf-8'),
+    }
 
-        async function deleteBothKeys() {
-            closeDeleteModal();
-            try {
-                showStatus('Удаление обоих ключей...');
-                const response = await fetch('/delete_both_keys', { method: 'POST' });
-                const result = await response.json();
-                if (!result.success) throw new Error(result.error);
-                clearAllFields();
-                showStatus('Оба ключа удалены и перегенерированы!');
-            } catch (error) {
-                showStatus('Ошибка: ' + error.message, true);
-            }
-        }
+@functools.lru_cache(maxsize=None)
+def index_page() -> StaticAsset:
+    assets = static_assets()
+    return build_asset(
+        app.jinja_env.from_string(HTML_TEMPLATE).render(
+            style_url=f"/assets/crypt.css?v={assets['crypt.css'].etag}",
+            script_url=f"/assets/crypt.js?v={assets['crypt.js'].etag}"
+        ),
+        'text/html; charset=utf-8'
+    )
 
-        function clearAllFields() {
-            document.getElementById('plaintext').value = '';
-            document.getElementById('encrypted_result').value = '';
-            document.getElementById('ciphertext').value = '';
-            document.getElementById('decrypted_result').value = '';
-        }
+def preload():
+    crypt_manager.load()
+    index_page()
 
-        window.onclick = function(event) {
-            const exportModal = document.getElementById('exportModal');
-            const deleteModal = document.getElementById('deleteModal');
-            if (event.target === exportModal) closeExportModal();
-            if (event.target === deleteModal) closeDeleteModal();
-        }
+def route_label() -> str:
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
 
-        document.addEventListener('keydown', function(e) {
-            if (e.key === 'Escape') {
-                closeExportModal();
-                closeDeleteModal();
-            }
-        });
+def error_response(e: Exception):
+    if metrics.enabled:
+        metrics.record_route_error(route_label(), e)
+    if isinstance(e, RequestEntityTooLarge):
+        return jsonify({'success': False, 'error': e.description}), e.code
+    return jsonify({'success': False, 'error': str(e)})
 
-        document.addEventListener('keydown', function(e) {
-            if (e.ctrlKey) {
-                if (e.key === 'e') {
-                    e.preventDefault();
-                    encryptText();
-                } else if (e.key === 'd') {
-                    e.preventDefault();
-                    decryptText();
-                }
-            }
-        });
+@app.before_request
+def prepare_request():
+    if metrics.enabled:
+        request._get_current_object().environ['crypt.request_started'] = time.perf_counter()
+    endpoint = request.endpoint
+    if endpoint is not None and endpoint not in KEYLESS_ENDPOINTS:
+        crypt_manager.reload_keys_if_changed()
+    if profiler.enabled:
+        g.profile = profiler.start_request()
 
-        async function copyToClipboard(elementId) {
-            const element = document.getElementById(elementId);
-            if (!element.value.trim()) {
-                showStatus('Поле пустое, нечего копировать', true);
-                return;
-            }
-            
-            try {
-                await navigator.clipboard.writeText(element.value);
-                
-                const copyBtn = document.querySelector(`[onclick="copyToClipboard('${elementId}')"]`);
-                const originalHtml = copyBtn.innerHTML;
-                copyBtn.innerHTML = '<i class="fas fa-check"></i>';
-                
-                setTimeout(() => {
-                    copyBtn.innerHTML = originalHtml;
-                }, 2000);
-                
-                showStatus('Скопировано в буфер обмена!');
-            } catch (error) {
-                showStatus('Ошибка при копировании: ' + error.message, true);
-            }
-        }
+@app.teardown_request
+def finish_request_profile(error=None):
+    profile = g.pop('profile', None) if profiler.enabled else None
+    if profile is not None:
+        profiler.finish_request(profile)
 
-        async function pasteFromClipboard(elementId) {
-            try {
-                const text = await navigator.clipboard.readText();
-                if (!text) {
-                    throw new Error('Буфер обмена пуст');
-                }
-                document.getElementById(elementId).value = text;
-                showStatus('Текст вставлен из буфера обмена!');
-            } catch (error) {
-                showStatus('Ошибка при вставке: ' + error.message, true);
-            }
-        }
+@app.after_request
+def record_request_metrics(response):
+    if not metrics.enabled:
+        return response
+    current = request._get_current_object()
+    environ = current.environ
+    started = environ.get('crypt.request_started')
+    if started is not None:
+        rule = current.url_rule
+        length = environ.get('CONTENT_LENGTH', '')
+        body = response.response
+        metrics.observe_request(
+            rule.rule if rule is not None else 'unmatched',
+            environ['REQUEST_METHOD'],
+            response.status_code,
+            time.perf_counter() - started,
+            int(length) if length.isdigit() else 0,
+            sum(map(len, body)) if isinstance(body, list) else response.content_length or 0
+        )
+    return response
 
-        function downloadText(elementId, filename) {
-            const text = document.getElementById(elementId).value;
-            if (!text.trim()) {
-                showStatus('Поле пустое, нечего скачивать', true);
-                return;
-            }
-            
-            try {
-                const blob = new Blob([text], { type: 'text/plain;charset=utf-8' });
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = filename;
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                URL.revokeObjectURL(url);
-                
-                showStatus('Файл успешно скачан!');
-            } catch (error) {
-                showStatus('Ошибка при скачивании: ' + error.message, true);
-            }
-        }
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
-        async function uploadText(input, elementId) {
-            const file = input.files[0];
-            if (!file) return;
-            
-            try {
-                const reader = new FileReader();
-                
-                reader.onload = function(e) {
-                    try {
-                        const text = e.target.result;
-                        document.getElementById(elementId).value = text;
-                        showStatus('Текст успешно загружен из файла!');
-                    } catch (error) {
-                        showStatus('Ошибка при чтении файла: ' + error.message, true);
-                    }
-                };
-                
-                reader.onerror = function() {
-                    showStatus('Ошибка при чтении файла', true);
-                };
-                
-                reader.readAsText(file, 'utf-8');
-            } catch (error) {
-                showStatus('Ошибка при загрузке файла: ' + error.message, true);
-            } finally {
-                input.value = '';
-            }
-        }
-    </script>
-</body>
-</html>
-"""
+@app.route('/debug/profile', methods=['GET', 'POST'])
+def debug_profile():
+    if not profiler.enabled:
+        abort(404)
+    try:
+        report = profiler.report(request.args.get('sort', 'cumulative'), request.args.get('limit', PROFILE_TOP, type=int))
+        if request.method == 'POST' or request.args.get('reset'):
+            profiler.reset()
+        return jsonify({'success': True, 'profile': report})
+    except Exception as e:
+        return error_response(e)
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return asset_response(index_page(), PAGE_CACHE_CONTROL)
+
+@app.route('/assets/<name>')
+def static_asset(name):
+    asset = static_assets().get(name)
+    if asset is None:
+        abort(404)
+    return asset_response(asset, ASSET_CACHE_CONTROL)
 
 @app.route('/encrypt', methods=['POST'])
 def encrypt():
     try:
         data = request.json
         message = data.get('message', '')
-        encrypted = crypt_manager.encrypt_message(message)
+        encrypted = crypt_manager.encrypt_message(message, data.get('key_id'), data.get('compress'))
         return jsonify({'success': True, 'encrypted': encrypted})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
 
 @app.route('/decrypt', methods=['POST'])
 def decrypt():
@@ -1408,15 +4107,294 @@ def decrypt():
         decrypted = crypt_manager.decrypt_message(encrypted)
         return jsonify({'success': True, 'decrypted': decrypted})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
+
+@app.route('/encrypt_batch', methods=['POST'])
+def encrypt_batch():
+    try:
+        data = request.json
+        messages = data.get('messages', [])
+        if not isinstance(messages, list):
+            raise ValueError("Поле messages должно быть массивом")
+        if len(messages) > MAX_BATCH_SIZE:
+            raise ValueError(f"Слишком много сообщений в пакете (максимум {MAX_BATCH_SIZE})")
+        return jsonify({'success': True, 'results': crypt_manager.encrypt_many(messages, data.get('key_id'), data.get('compress'))})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/decrypt_batch', methods=['POST'])
+def decrypt_batch():
+    try:
+        data = request.json
+        encrypted = data.get('encrypted', [])
+        if not isinstance(encrypted, list):
+            raise ValueError("Поле encrypted должно быть массивом")
+        if len(encrypted) > MAX_BATCH_SIZE:
+            raise ValueError(f"Слишком много сообщений в пакете (максимум {MAX_BATCH_SIZE})")
+        return jsonify({'success': True, 'results': crypt_manager.decrypt_many(encrypted)})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/tenant_keys')
+def tenant_keys():
+    try:
+        return jsonify({'success': True, 'keys': crypt_manager.tenant_keys.list_keys()})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/create_tenant_key', methods=['POST'])
+def create_tenant_key():
+    try:
+        data = request.json
+        if 'key_ids' in data:
+            return jsonify({'success': True, 'keys': crypt_manager.tenant_keys.create_keys(data['key_ids'])})
+        return jsonify({'success': True, 'key': crypt_manager.tenant_keys.create_key(data.get('key_id'))})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/delete_tenant_key', methods=['POST'])
+def delete_tenant_key():
+    try:
+        data = request.json
+        crypt_manager.tenant_keys.delete_key(data.get('key_id'))
+        return jsonify({'success': True, 'message': 'Ключ удален'})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/rotate_user_key', methods=['POST'])
+def rotate_user_key():
+    try:
+        version = crypt_manager.rotate_user_key()
+        return jsonify({'success': True, 'version': version, 'message': f'Пользовательский ключ обновлен до версии {version}'})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/rotate_master_key', methods=['POST'])
+def rotate_master_key():
+    try:
+        count = crypt_manager.rotate_master_key()
+        return jsonify({'success': True, 'rewrapped': count, 'message': f'Мастер-ключ заменен, перешифровано ключей: {count}'})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/rotate_tenant_key', methods=['POST'])
+def rotate_tenant_key():
+    try:
+        data = request.json
+        version = crypt_manager.tenant_keys.rotate_key(data.get('key_id'))
+        return jsonify({'success': True, 'version': version, 'message': f'Ключ обновлен до версии {version}'})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/start_reencryption', methods=['POST'])
+def start_reencryption():
+    try:
+        data = request.json
+        status = crypt_manager.start_reencryption(
+            data.get('source', ''),
+            data.get('target', ''),
+            int(data.get('batch_size', REENCRYPT_BATCH_SIZE)),
+            data.get('max_rate')
+        )
+        return jsonify({'success': True, 'status': status})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/reencryption_status')
+def reencryption_status():
+    try:
+        return jsonify({'success': True, 'status': crypt_manager.reencryption_status()})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/stop_reencryption', methods=['POST'])
+def stop_reencryption():
+    try:
+        return jsonify({'success': True, 'status': crypt_manager.stop_reencryption()})
+    except Exception as e:
+        return error_response(e)
+
+def unbounded_input_stream():
+    return get_input_stream(request.environ, max_content_length=None)
+
+def count_streamed_bytes(route: str, pieces):
+    total = 0
+    try:
+        for piece in pieces:
+            total += len(piece)
+            yield piece
+    finally:
+        metrics.add_bytes_out(route, total)
+
+def stream_response(pieces, mimetype: str = 'application/octet-stream', headers: dict = None):
+    first = next(pieces, b'')
+    body = itertools.chain((first,), pieces)
+    if metrics.enabled:
+        body = count_streamed_bytes(route_label(), body)
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers=headers
+    )
+
+binary_buffers = threading.local()
+
+def binary_buffer(name: str, size: int) -> bytearray:
+    buffer = getattr(binary_buffers, name, None)
+    if buffer is None or len(buffer) < size:
+        buffer = bytearray(max(size, 2 * len(buffer or b'')))
+        setattr(binary_buffers, name, buffer)
+    return buffer
+
+@app.teardown_request
+def release_binary_buffers(error=None):
+    for name in ('input', 'output'):
+        buffer = getattr(binary_buffers, name, None)
+        if buffer is not None and len(buffer) > BINARY_BUFFER_KEEP:
+            setattr(binary_buffers, name, None)
+
+def read_binary_request() -> memoryview:
+    length = request.content_length
+    if length is None:
+        if 'chunked' in request.headers.get('Transfer-Encoding', '').lower():
+            raise ValueError("Не указан размер тела запроса (Content-Length)")
+        length = 0
+    limit = app.config['MAX_CONTENT_LENGTH']
+    if limit is not None and length > limit:
+        raise RequestEntityTooLarge("Слишком большой запрос")
+    view = memoryview(binary_buffer('input', length))[:length]
+    if read_full(request.stream, view) != length:
+        raise ValueError("Тело запроса обрезано")
+    return view
+
+def binary_response(body) -> Response:
+    return Response(
+        [body],
+        mimetype='application/octet-stream',
+        headers={'Content-Length': str(len(body))}
+    )
+
+@app.route('/encrypt_binary', methods=['POST'])
+def encrypt_binary():
+    try:
+        data = read_binary_request()
+        key_id = request.args.get('key_id')
+        compress = request.args.get('compress', type=lambda value: value == '1')
+        if key_id or compress or (compress is None and crypt_manager.compression):
+            return binary_response(crypt_manager.encrypt_bytes(data, key_id=key_id or None, compress=compress))
+        output = binary_buffer('output', len(data) + ENVELOPE_HEADER_SIZE + 2 * ENVELOPE_TAG_SIZE + 16)
+        size = crypt_manager.encrypt_bytes_into(data, output)
+        return binary_response(memoryview(output)[:size])
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/decrypt_binary', methods=['POST'])
+def decrypt_binary():
+    try:
+        envelope = read_binary_request()
+        if envelope_key(envelope)[0] is not None or envelope_codec(envelope):
+            return binary_response(crypt_manager.decrypt_bytes(envelope))
+        output = binary_buffer('output', len(envelope) + 16)
+        size = crypt_manager.decrypt_bytes_into(envelope, output)
+        return binary_response(memoryview(output)[:size])
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/encrypt_stream', methods=['POST'])
+def encrypt_stream():
+    try:
+        chunk_size = request.args.get('chunk_size', STREAM_CHUNK_SIZE, type=int)
+        return stream_response(crypt_manager.iter_encrypt_stream(unbounded_input_stream(), chunk_size))
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/decrypt_stream', methods=['POST'])
+def decrypt_stream():
+    try:
+        return stream_response(crypt_manager.iter_decrypt_stream(unbounded_input_stream()))
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/encrypt_ndjson', methods=['POST'])
+def encrypt_ndjson():
+    try:
+        compress = request.args.get('compress', type=lambda value: value == '1')
+        records = crypt_manager.iter_encrypt_ndjson(unbounded_input_stream(), request.args.get('key_id') or None, compress)
+        return stream_response(records, 'application/x-ndjson')
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/decrypt_ndjson', methods=['POST'])
+def decrypt_ndjson():
+    try:
+        return stream_response(crypt_manager.iter_decrypt_ndjson(unbounded_input_stream()), 'application/x-ndjson')
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/encrypt_container/<name>', methods=['POST'])
+def encrypt_container(name):
+    try:
+        path = crypt_manager.store_container(name, request.get_data())
+        return jsonify({'success': True, 'name': path.name})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/put_blob/<name>', methods=['POST', 'PUT'])
+def put_blob(name):
+    try:
+        compress = request.args.get('compress', type=lambda value: value == '1')
+        return jsonify({'success': True, 'blob': crypt_manager.blobs.put(name, unbounded_input_stream(), compress)})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/get_blob/<name>')
+def get_blob(name):
+    try:
+        return stream_response(crypt_manager.blobs.iter_blob(name))
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/blobs')
+def list_blobs():
+    try:
+        return jsonify({'success': True, 'blobs': crypt_manager.blobs.list_blobs()})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/delete_blob/<name>', methods=['POST', 'DELETE'])
+def delete_blob(name):
+    try:
+        crypt_manager.blobs.delete(name)
+        return jsonify({'success': True, 'message': 'Объект удален'})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/decrypt_range/<name>')
+def decrypt_range(name):
+    try:
+        with open(crypt_manager.container_path(name), 'rb') as f:
+            _, total, _, _ = crypt_manager.container_info(f)
+            if request.range is not None:
+                byte_range = request.range.range_for_length(total)
+                if byte_range is None:
+                    return Response(status=416, headers={'Content-Range': f'bytes */{total}'})
+                start, stop = byte_range
+                data = crypt_manager.decrypt_range(f, start, stop - start)
+                return Response(data, status=206, mimetype='application/octet-stream', headers={
+                    'Accept-Ranges': 'bytes',
+                    'Content-Range': f'bytes {start}-{stop - 1}/{total}'
+                })
+            offset = request.args.get('offset', 0, type=int)
+            length = request.args.get('length', total, type=int)
+            data = crypt_manager.decrypt_range(f, offset, length)
+            return Response(data, mimetype='application/octet-stream', headers={'Accept-Ranges': 'bytes'})
+    except Exception as e:
+        return error_response(e)
 
 @app.route('/export_master_key')
 def export_master_key():
     try:
-        with open(crypt_manager.master_key_file, 'r', encoding='utf-8') as f:
-            master_key_data = json.load(f)
-        export_data = {'master_key': master_key_data['master_key']};
-        key_data = json.dumps(export_data, indent=2, ensure_ascii=False)
+        key_data = crypt_manager.export_keys(user=False)
         return send_file(
             io.BytesIO(key_data.encode('utf-8')),
             as_attachment=True,
@@ -1424,15 +4402,12 @@ def export_master_key():
             mimetype='application/json'
         )
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
 
 @app.route('/export_user_key')
 def export_user_key():
     try:
-        with open(crypt_manager.user_keys_file, 'r', encoding='utf-8') as f:
-            user_key_data = json.load(f)
-        export_data = {'user_key': user_key_data['user_key']};
-        key_data = json.dumps(export_data, indent=2, ensure_ascii=False)
+        key_data = crypt_manager.export_keys(master=False)
         return send_file(
             io.BytesIO(key_data.encode('utf-8')),
             as_attachment=True,
@@ -1440,20 +4415,12 @@ def export_user_key():
             mimetype='application/json'
         )
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
 
 @app.route('/export_both_keys')
 def export_both_keys():
     try:
-        with open(crypt_manager.master_key_file, 'r', encoding='utf-8') as f:
-            master_key_data = json.load(f)
-        with open(crypt_manager.user_keys_file, 'r', encoding='utf-8') as f:
-            user_key_data = json.load(f)
-        export_data = {
-            'master_key': master_key_data['master_key'],
-            'user_key': user_key_data['user_key']
-        };
-        key_data = json.dumps(export_data, indent=2, ensure_ascii=False)
+        key_data = crypt_manager.export_keys()
         return send_file(
             io.BytesIO(key_data.encode('utf-8')),
             as_attachment=True,
@@ -1461,34 +4428,44 @@ def export_both_keys():
             mimetype='application/json'
         )
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
 
 @app.route('/import_keys', methods=['POST'])
 def import_keys():
     try:
         data = request.json
         key_data = json.loads(data.get('key_data', ''))
-        
-        if 'master_key' in key_data:
-            with open(crypt_manager.master_key_file, 'w', encoding='utf-8') as f:
-                json.dump({'master_key': key_data['master_key']}, f, indent=2, ensure_ascii=False)
-            crypt_manager.load_master_key()
-            if crypt_manager.master_key is None:
-                raise ValueError("Ошибка загрузки мастер-ключа")
-        
-        if 'user_key' in key_data:
-            with open(crypt_manager.user_keys_file, 'w', encoding='utf-8') as f:
-                json.dump({'user_key': key_data['user_key']}, f, indent=2, ensure_ascii=False)
-            crypt_manager.load_user_key()
-            if crypt_manager.user_key is None:
-                raise ValueError("Ошибка загрузки пользовательского ключа")
-        
-        if 'master_key' not in key_data and 'user_key' not in key_data:
-            raise ValueError("Неверный формат файла ключей")
-        
+        crypt_manager.import_keys(key_data)
         return jsonify({'success': True, 'message': 'Ключи импортированы'})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
+
+@app.route('/export_key_archive')
+def export_key_archive():
+    try:
+        return stream_response(
+            coalesce_chunks(crypt_manager.iter_key_archive(), KEY_ARCHIVE_FLUSH_SIZE),
+            'application/x-ndjson',
+            {'Content-Disposition': 'attachment; filename=keys.ndjson'}
+        )
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/import_key_archive', methods=['POST'])
+def import_key_archive():
+    try:
+        batch_size = request.args.get('batch_size', KEY_ARCHIVE_BATCH_SIZE, type=int)
+        result = crypt_manager.import_key_archive(unbounded_input_stream(), batch_size)
+        return jsonify({'success': True, 'result': result, 'message': 'Архив ключей импортирован'})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/key_archive_status')
+def key_archive_status():
+    try:
+        return jsonify({'success': True, 'status': crypt_manager.key_archive_status()})
+    except Exception as e:
+        return error_response(e)
 
 @app.route('/delete_master_key', methods=['POST'])
 def delete_master_key():
@@ -1496,7 +4473,7 @@ def delete_master_key():
         crypt_manager.delete_master_key()
         return jsonify({'success': True, 'message': 'Мастер-ключ удален, оба ключа перегенерированы'})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
 
 @app.route('/delete_user_key', methods=['POST'])
 def delete_user_key():
@@ -1504,7 +4481,7 @@ def delete_user_key():
         crypt_manager.delete_user_key()
         return jsonify({'success': True, 'message': 'Пользовательский ключ удален и перегенерирован'})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
 
 @app.route('/delete_both_keys', methods=['POST'])
 def delete_both_keys():
@@ -1512,22 +4489,331 @@ def delete_both_keys():
         crypt_manager.delete_both_keys()
         return jsonify({'success': True, 'message': 'Ключи удалены и перегенерированы'})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return error_response(e)
+
+class AsgiError(Exception):
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def json_result(data: dict, status: int = 200) -> tuple:
+    return status, {'Content-Type': 'application/json'}, json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+def attachment_result(key_data: str, filename: str) -> tuple:
+    return 200, {
+        'Content-Type': 'application/json',
+        'Content-Disposition': f'attachment; filename={filename}',
+    }, key_data.encode('utf-8')
+
+async def read_asgi_body(receive, headers: dict) -> bytes:
+    limit = ASGI_MAX_BODY
+    length = headers.get('content-length', '')
+    if length.isdigit() and int(length) > limit:
+        raise AsgiError(413, "Слишком большой запрос")
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise AsgiError(499, "Клиент закрыл соединение")
+        body += message.get('body', b'')
+        if len(body) > limit:
+            raise AsgiError(413, "Слишком большой запрос")
+        if not message.get('more_body'):
+            return bytes(body)
+
+async def asgi_encrypt(request: dict) -> tuple:
+    data = json.loads(request['body'])
+    encrypted = await async_crypt_manager.encrypt_message(data.get('message', ''), data.get('key_id'), data.get('compress'))
+    return json_result({'success': True, 'encrypted': encrypted})
+
+async def asgi_decrypt(request: dict) -> tuple:
+    encrypted = json.loads(request['body']).get('encrypted', '')
+    return json_result({'success': True, 'decrypted': await async_crypt_manager.decrypt_message(encrypted)})
+
+async def asgi_batch(request: dict, field: str, process, *args) -> tuple:
+    items = json.loads(request['body']).get(field, [])
+    if not isinstance(items, list):
+        raise ValueError(f"Поле {field} должно быть массивом")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"Слишком много сообщений в пакете (максимум {MAX_BATCH_SIZE})")
+    return json_result({'success': True, 'results': await process(items, *args)})
+
+async def asgi_encrypt_batch(request: dict) -> tuple:
+    data = json.loads(request['body'])
+    return await asgi_batch(request, 'messages', async_crypt_manager.encrypt_many, data.get('key_id'), data.get('compress'))
+
+async def asgi_decrypt_batch(request: dict) -> tuple:
+    return await asgi_batch(request, 'encrypted', async_crypt_manager.decrypt_many)
+
+async def asgi_export_master_key(request: dict) -> tuple:
+    return attachment_result(await async_crypt_manager.export_keys(user=False), 'master_key.json')
+
+async def asgi_export_user_key(request: dict) -> tuple:
+    return attachment_result(await async_crypt_manager.export_keys(master=False), 'user_key.json')
+
+async def asgi_export_both_keys(request: dict) -> tuple:
+    return attachment_result(await async_crypt_manager.export_keys(), 'keys.json')
+
+async def asgi_import_keys(request: dict) -> tuple:
+    key_data = json.loads(json.loads(request['body']).get('key_data', ''))
+    await async_crypt_manager.import_keys(key_data)
+    return json_result({'success': True, 'message': 'Ключи импортированы'})
+
+async def asgi_metrics(request: dict) -> tuple:
+    return 200, {'Content-Type': METRICS_CONTENT_TYPE}, metrics.render().encode('utf-8')
+
+async def asgi_debug_profile(request: dict) -> tuple:
+    if not profiler.enabled:
+        raise AsgiError(404, "Не найдено")
+    args = request['args']
+    limit = args.get('limit', '')
+    report = profiler.report(args.get('sort', 'cumulative'), int(limit) if limit.isdigit() else PROFILE_TOP)
+    if request['method'] == 'POST' or args.get('reset'):
+        profiler.reset()
+    return json_result({'success': True, 'profile': report})
+
+async def asgi_rotate_master_key(request: dict) -> tuple:
+    count = await async_crypt_manager.rotate_master_key()
+    return json_result({'success': True, 'rewrapped': count, 'message': f'Мастер-ключ заменен, перешифровано ключей: {count}'})
+
+async def asgi_delete_master_key(request: dict) -> tuple:
+    await async_crypt_manager.delete_master_key()
+    return json_result({'success': True, 'message': 'Мастер-ключ удален, оба ключа перегенерированы'})
+
+async def asgi_delete_user_key(request: dict) -> tuple:
+    await async_crypt_manager.delete_user_key()
+    return json_result({'success': True, 'message': 'Пользовательский ключ удален и перегенерирован'})
+
+async def asgi_delete_both_keys(request: dict) -> tuple:
+    await async_crypt_manager.delete_both_keys()
+    return json_result({'success': True, 'message': 'Ключи удалены и перегенерированы'})
+
+ASGI_ROUTES = {
+    ('POST', '/encrypt'): asgi_encrypt,
+    ('POST', '/decrypt'): asgi_decrypt,
+    ('POST', '/encrypt_batch'): asgi_encrypt_batch,
+    ('POST', '/decrypt_batch'): asgi_decrypt_batch,
+    ('GET', '/export_master_key'): asgi_export_master_key,
+    ('GET', '/export_user_key'): asgi_export_user_key,
+    ('GET', '/export_both_keys'): asgi_export_both_keys,
+    ('POST', '/import_keys'): asgi_import_keys,
+    ('POST', '/rotate_master_key'): asgi_rotate_master_key,
+    ('GET', '/metrics'): asgi_metrics,
+    ('GET', '/debug/profile'): asgi_debug_profile,
+    ('POST', '/debug/profile'): asgi_debug_profile,
+    ('POST', '/delete_master_key'): asgi_delete_master_key,
+    ('POST', '/delete_user_key'): asgi_delete_user_key,
+    ('POST', '/delete_both_keys'): asgi_delete_both_keys,
+}
+ASGI_KEYLESS_HANDLERS = frozenset({asgi_metrics, asgi_debug_profile})
+
+def asgi_static(method: str, path: str, headers: dict) -> tuple:
+    if method not in ('GET', 'HEAD'):
+        return None
+    if path == '/':
+        asset, cache_control = index_page(), PAGE_CACHE_CONTROL
+    elif path.startswith('/assets/') and path[len('/assets/'):] in static_assets():
+        asset, cache_control = static_assets()[path[len('/assets/'):]], ASSET_CACHE_CONTROL
+    else:
+        return None
+    return asset_variant(asset, cache_control, headers.get('accept-encoding'), headers.get('if-none-match'))
+
+async def asgi_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if os.environ.get('CRYPT_PRELOAD'):
+                preload()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            async_crypt_manager.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def asgi_app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await asgi_lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    started = time.perf_counter()
+    method, path = scope['method'], scope['path']
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    route = path if (method, path) in ASGI_ROUTES or path == '/' else 'unmatched'
+    bytes_in = 0
+    try:
+        result = asgi_static(method, path, headers)
+        if result is None:
+            handler = ASGI_ROUTES.get((method, path))
+            if handler is None:
+                raise AsgiError(404, "Не найдено")
+            if handler not in ASGI_KEYLESS_HANDLERS:
+                await async_crypt_manager.reload_keys_if_changed()
+            request = {
+                'method': method,
+                'headers': headers,
+                'args': dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'))),
+                'body': await read_asgi_body(receive, headers),
+            }
+            bytes_in = len(request['body'])
+            try:
+                result = await handler(request)
+            except AsgiError:
+                raise
+            except Exception as e:
+                metrics.record_route_error(route, e)
+                result = json_result({'success': False, 'error': str(e)})
+        elif path != '/':
+            route = '/assets/<name>'
+    except AsgiError as e:
+        result = json_result({'success': False, 'error': str(e)}, e.status)
+    status, response_headers, body = result
+    response_headers = dict(response_headers, **{'Content-Length': str(len(body))})
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': b'' if method == 'HEAD' else body})
+    if metrics.enabled:
+        metrics.observe_request(route, method, status, time.perf_counter() - started, bytes_in, len(body))
+
+def run_asgi_server(args):
+    import uvicorn
+    
+    if args.preload:
+        os.environ['CRYPT_PRELOAD'] = '1'
+    host, port = args.bind.rsplit(':', 1)
+    uvicorn.run(
+        f'{Path(__file__).stem}:asgi_app',
+        app_dir=str(Path(__file__).resolve().parent),
+        host=host,
+        port=int(port),
+        workers=args.workers,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        lifespan='on'
+    )
+
+def run_file_command(args):
+    try:
+        if args.command == 'encrypt-file':
+            size = crypt_manager.encrypt_file(args.input, args.output, args.chunk_size, args.workers)
+            print(f"✅ Файл зашифрован: {args.output} ({size} байт)")
+        elif args.command == 'decrypt-file':
+            size = crypt_manager.decrypt_file(args.input, args.output, args.workers)
+            print(f"✅ Файл расшифрован: {args.output} ({size} байт)")
+        elif args.command == 'export-keys':
+            with open(args.output, 'wb') as f:
+                size = crypt_manager.export_key_archive(f)
+            print(f"✅ Архив ключей сохранен: {args.output} ({size} байт)")
+        elif args.command == 'import-keys':
+            with open(args.input, 'rb') as f:
+                result = crypt_manager.import_key_archive(f, args.batch_size)
+            print(f"✅ Архив ключей загружен: записей {result['records']}, ключей арендаторов {result['tenants']}")
+        else:
+            job = ReencryptionJob(crypt_manager, Path(args.input), Path(args.output), args.batch_size, args.max_rate)
+            progress = job.run()
+            print(f"✅ Записей обработано: {progress['processed']}, перешифровано: {progress['reencrypted']}, ошибок: {progress['failed']}")
+        return 0
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+def run_production_server(args):
+    from gunicorn.app.base import BaseApplication
+    
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'keepalive': args.keep_alive,
+        'backlog': args.backlog,
+        'post_fork': lambda server, worker: crypt_manager.loaded and crypt_manager.reload_keys_if_changed(force=True),
+    }
+    
+    class CryptApplication(BaseApplication):
+        def load_config(self):
+            for name, value in options.items():
+                self.cfg.set(name, value)
+        
+        def load(self):
+            return app
+    
+    if args.preload:
+        preload()
+    CryptApplication().run()
 
 def main():
+    parser = argparse.ArgumentParser(description="Crypt - Криптографическое приложение")
+    parser.add_argument('--serve', action='store_true', help="Запустить production-сервер (gunicorn) вместо сервера разработки")
+    parser.add_argument('--asgi', action='store_true', help="Запустить асинхронный ASGI-сервер (uvicorn)")
+    parser.add_argument('--bind', default=SERVE_BIND, help="Адрес и порт сервера")
+    parser.add_argument('--workers', type=int, default=None, help="Число процессов-обработчиков или потоков для команд с файлами")
+    parser.add_argument('--threads', type=int, default=SERVE_THREADS, help="Число потоков в каждом процессе")
+    parser.add_argument('--keep-alive', type=int, default=SERVE_KEEP_ALIVE, help="Таймаут keep-alive в секундах")
+    parser.add_argument('--backlog', type=int, default=SERVE_BACKLOG, help="Размер очереди входящих соединений")
+    parser.add_argument('--profile', choices=PROFILE_MODES, default=None, help="Включить профилирование: таймеры, cProfile или tracemalloc")
+    parser.add_argument('--preload', action='store_true', help="Загрузить ключи и страницу до запуска процессов-обработчиков")
+    subparsers = parser.add_subparsers(dest='command')
+    encrypt_parser = subparsers.add_parser('encrypt-file', help="Зашифровать файл в контейнер")
+    encrypt_parser.add_argument('input', help="Исходный файл")
+    encrypt_parser.add_argument('output', help="Файл контейнера")
+    encrypt_parser.add_argument('--chunk-size', type=int, default=CONTAINER_CHUNK_SIZE, help="Размер блока в байтах")
+    encrypt_parser.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Число потоков шифрования")
+    decrypt_parser = subparsers.add_parser('decrypt-file', help="Расшифровать контейнер в файл")
+    decrypt_parser.add_argument('input', help="Файл контейнера")
+    decrypt_parser.add_argument('output', help="Расшифрованный файл")
+    decrypt_parser.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Число потоков дешифрования")
+    reencrypt_parser = subparsers.add_parser('reencrypt', help="Перешифровать записи NDJSON текущей версией ключа")
+    reencrypt_parser.add_argument('input', help="Исходный файл записей")
+    reencrypt_parser.add_argument('output', help="Файл перешифрованных записей")
+    reencrypt_parser.add_argument('--batch-size', type=int, default=REENCRYPT_BATCH_SIZE, help="Число записей в пакете")
+    reencrypt_parser.add_argument('--max-rate', type=float, default=None, help="Максимум записей в секунду")
+    export_archive_parser = subparsers.add_parser('export-keys', help="Выгрузить все ключи в потоковый архив")
+    export_archive_parser.add_argument('output', help="Файл архива ключей")
+    import_archive_parser = subparsers.add_parser('import-keys', help="Загрузить ключи из потокового архива")
+    import_archive_parser.add_argument('input', help="Файл архива ключей")
+    import_archive_parser.add_argument('--batch-size', type=int, default=KEY_ARCHIVE_BATCH_SIZE, help="Число записей в транзакции")
+    args = parser.parse_args()
+    if args.profile:
+        os.environ['CRYPT_PROFILE'] = args.profile
+        profiler.configure_from_env()
+    if args.command:
+        raise SystemExit(run_file_command(args))
+    args.workers = args.workers or SERVE_WORKERS
+    
     print("="*60)
     print("🔐 Crypt - Криптографическое приложение")
     print("="*60)
     print("Статус: Инициализация...")
     try:
         print("✅ Cryptography library найдена")
-        print("✅ Ключи инициализированы")
+        if args.asgi or args.serve:
+            print("✅ Ключи загружаются " + ("до запуска обработчиков" if args.preload else "при первом запросе"))
+        else:
+            preload()
+            print("✅ Ключи инициализированы")
         print("✅ Веб-сервер готов к запуску")
         print("="*60)
-        print("🌐 Приложение доступно по адресу: http://localhost:5000")
-        print("📝 Для остановки нажмите Ctrl+C")
-        print("="*60)
-        app.run(host='127.0.0.1', port=5000, debug=False)
+        if args.asgi:
+            print(f"🌐 Приложение доступно по адресу: http://{args.bind}")
+            print(f"⚙️  ASGI, процессов: {args.workers}")
+            print("📝 Для остановки нажмите Ctrl+C")
+            print("="*60)
+            run_asgi_server(args)
+        elif args.serve:
+            print(f"🌐 Приложение доступно по адресу: http://{args.bind}")
+            print(f"⚙️  Процессов: {args.workers}, потоков: {args.threads}")
+            print("📝 Для остановки нажмите Ctrl+C")
+            print("="*60)
+            run_production_server(args)
+        else:
+            print("🌐 Приложение доступно по адресу: http://localhost:5000")
+            print("📝 Для остановки нажмите Ctrl+C")
+            print("="*60)
+            app.run(host='127.0.0.1', port=5000, debug=False)
     except ImportError as e:
         print(f"❌ Ошибка: Не найдена библиотека: {e}")
         print("💡 Установите зависимости по инстркции https://alexelsukov.ru/documentation/crypt")
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.chdir(tempfile.mkdtemp(prefix="crypt-bench-"))
+
+import Crypt
+
+SIZES = (16, 64, 256, 1024)
+ITERATIONS = 20000
+
+
+def per_call_us(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func(*args)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def encrypt_uncached(manager, message):
+    aead = Crypt.AESGCM(manager.user_key)
+    nonce = os.urandom(Crypt.ENVELOPE_NONCE_SIZE)
+    header = Crypt.ENVELOPE_HEADER
+    return Crypt.envelope_to_text(Crypt.seal_tag_first(aead, nonce, message.encode('utf-8'), header, header))
+
+
+def decrypt_uncached(manager, encrypted):
+    aead = Crypt.AESGCM(manager.user_key)
+    envelope = memoryview(Crypt.text_to_envelope(encrypted))
+    return Crypt.open_tag_first(aead, envelope[1:], Crypt.ENVELOPE_HEADER).decode('utf-8')
+
+
+def main():
+    manager = Crypt.crypt_manager
+    print(f"{'size':>6} {'op':>8} {'uncached, us':>14} {'cached, us':>12} {'speedup':>8}")
+    for size in SIZES:
+        message = 'x' * size
+        encrypted = manager.encrypt_message(message)
+        for op, uncached, cached, arg in (
+            ('encrypt', encrypt_uncached, Crypt.CryptManager.encrypt_message, message),
+            ('decrypt', decrypt_uncached, Crypt.CryptManager.decrypt_message, encrypted),
+        ):
+            slow = per_call_us(uncached, manager, arg)
+            fast = per_call_us(cached, manager, arg)
+            print(f"{size:>6} {op:>8} {slow:>14.2f} {fast:>12.2f} {slow / fast:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
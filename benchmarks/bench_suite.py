@@ -0,0 +1,348 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.chdir(tempfile.mkdtemp(prefix="crypt-suite-"))
+
+import Crypt
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+MESSAGE_SIZES = (16, 256, 4 * 1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024)
+QUICK_MESSAGE_SIZES = (16, 4 * 1024, 1024 * 1024)
+ROUTE_SIZES = (16, 4 * 1024)
+BINARY_ROUTE_SIZES = (16, 4 * 1024, 1024 * 1024)
+COMPRESSED_SIZES = (4 * 1024, 64 * 1024, 1024 * 1024)
+MIN_TIME = 0.5
+MIN_ITERATIONS = 5
+LOAD_CLIENTS = 8
+LOAD_DURATION = 3.0
+TOLERANCE = 0.20
+P99_TOLERANCE = 1.0
+METRICS_OVERHEAD_LIMIT = 1.0
+METRICS_AB_DURATION = 5.0
+METRICS_WARMUP = 200
+
+
+def size_label(size: int) -> str:
+    for unit, factor in (("M", 1024 * 1024), ("K", 1024)):
+        if size >= factor:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(name: str, latencies_ns: list, elapsed: float, payload: int, alloc_peak: int) -> dict:
+    ordered = sorted(latencies_ns)
+    ops = len(ordered) / elapsed
+    return {
+        'name': name,
+        'iterations': len(ordered),
+        'ops_per_sec': ops,
+        'mb_per_sec': ops * payload / 1e6 if payload else None,
+        'p50_us': percentile(ordered, 0.50) / 1e3,
+        'p99_us': percentile(ordered, 0.99) / 1e3,
+        'alloc_peak_bytes': alloc_peak,
+    }
+
+
+def allocation_peak(func) -> int:
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak - baseline
+
+
+def measure(name: str, func, payload: int = 0, min_time: float = MIN_TIME) -> dict:
+    func()
+    latencies = []
+    clock = time.perf_counter_ns
+    start = clock()
+    deadline = start + int(min_time * 1e9)
+    while True:
+        before = clock()
+        func()
+        after = clock()
+        latencies.append(after - before)
+        if after >= deadline and len(latencies) >= MIN_ITERATIONS:
+            break
+    return summarize(name, latencies, (after - start) / 1e9, payload, allocation_peak(func))
+
+
+def log_lines(size: int) -> str:
+    lines = []
+    total = 0
+    while total < size:
+        line = json.dumps({'seq': len(lines), 'level': 'INFO', 'path': '/api/items', 'status': 200}) + "\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)[:size]
+
+
+def crypto_cases(sizes: tuple) -> list:
+    manager = Crypt.crypt_manager
+    cases = []
+    for size in sizes:
+        message = "x" * size
+        encrypted = manager.encrypt_message(message)
+        cases.append((f"message.encrypt.{size_label(size)}", lambda m=message: manager.encrypt_message(m), size))
+        cases.append((f"message.decrypt.{size_label(size)}", lambda e=encrypted: manager.decrypt_message(e), size))
+    for size in COMPRESSED_SIZES:
+        message = log_lines(size)
+        encrypted = manager.encrypt_message(message, compress=True)
+        cases.append((f"message.encrypt_compressed.{size_label(size)}",
+                      lambda m=message: manager.encrypt_message(m, compress=True), size))
+        cases.append((f"message.decrypt_compressed.{size_label(size)}",
+                      lambda e=encrypted: manager.decrypt_message(e), size))
+    data_key = os.urandom(32)
+    wrapped = manager.encrypt_with_master_key(data_key)
+    cases.append(("key.wrap", lambda: manager.encrypt_with_master_key(data_key), 32))
+    cases.append(("key.unwrap", lambda: manager.decrypt_with_master_key(wrapped), 32))
+    return cases
+
+
+def route_cases() -> list:
+    client = Crypt.app.test_client()
+    cases = []
+    for size in ROUTE_SIZES:
+        message = "x" * size
+        encrypted = Crypt.crypt_manager.encrypt_message(message)
+        cases.append((f"route.encrypt.{size_label(size)}",
+                      lambda m=message: client.post('/encrypt', json={'message': m}), size))
+        cases.append((f"route.decrypt.{size_label(size)}",
+                      lambda e=encrypted: client.post('/decrypt', json={'encrypted': e}), size))
+    for size in BINARY_ROUTE_SIZES:
+        data = os.urandom(size)
+        envelope = Crypt.crypt_manager.encrypt_bytes(data)
+        cases.append((f"route.encrypt_binary.{size_label(size)}",
+                      lambda d=data: client.post('/encrypt_binary', data=d).close(), size))
+        cases.append((f"route.decrypt_binary.{size_label(size)}",
+                      lambda e=envelope: client.post('/decrypt_binary', data=e).close(), size))
+    messages = ["x" * 64] * 100
+    cases.append(("route.encrypt_batch.100x64B",
+                  lambda: client.post('/encrypt_batch', json={'messages': messages}), 6400))
+    records = "".join(json.dumps({'id': i, 'message': message}) + "\n" for i, message in enumerate(messages)).encode()
+    cases.append(("route.encrypt_ndjson.100x64B",
+                  lambda: client.post('/encrypt_ndjson', data=records).get_data(), 6400))
+    cases.append(("route.index", lambda: client.get('/'), 0))
+    return cases
+
+
+def metrics_overhead(min_time: float, duration: float) -> dict:
+    server = make_server('127.0.0.1', 0, Crypt.app, threaded=True, request_handler=KeepAliveRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=30)
+    body = json.dumps({'message': "x" * 16})
+    headers = {'Content-Type': 'application/json'}
+
+    def request():
+        connection.request('POST', '/encrypt', body, headers)
+        connection.getresponse().read()
+
+    latencies = {True: [], False: []}
+    try:
+        for _ in range(METRICS_WARMUP):
+            request()
+        deadline = time.perf_counter() + duration
+        pairs = 0
+        while time.perf_counter() < deadline:
+            for enabled in ((True, False) if pairs % 2 else (False, True)):
+                Crypt.metrics.enabled = enabled
+                before = time.perf_counter_ns()
+                request()
+                latencies[enabled].append(time.perf_counter_ns() - before)
+            pairs += 1
+    finally:
+        Crypt.metrics.enabled = True
+        connection.close()
+        server.shutdown()
+
+    def hook():
+        started = time.perf_counter()
+        Crypt.metrics.observe_request('/encrypt', 'POST', 200, time.perf_counter() - started, 30, 60)
+
+    hook_us = measure("metrics.observe_request", hook, 0, min_time)['p50_us']
+    enabled = statistics.median(latencies[True]) / 1e3
+    disabled = statistics.median(latencies[False]) / 1e3
+    return {
+        'pairs': pairs,
+        'route_p50_us_enabled': enabled,
+        'route_p50_us_disabled': disabled,
+        'ab_overhead_pct': (enabled - disabled) / disabled * 100,
+        'hook_us': hook_us,
+        'hook_overhead_pct': hook_us / disabled * 100,
+    }
+
+
+def run_load(url: str, clients: int, duration: float, size: int = 256) -> dict:
+    host, port = url.split("//", 1)[-1].rstrip("/").rsplit(":", 1)
+    body = json.dumps({'message': "x" * size})
+    headers = {'Content-Type': 'application/json'}
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def client():
+        connection = http.client.HTTPConnection(host, int(port), timeout=30)
+        local = []
+        try:
+            while time.perf_counter() < deadline:
+                before = time.perf_counter_ns()
+                connection.request('POST', '/encrypt', body, headers)
+                response = connection.getresponse()
+                result = json.loads(response.read())
+                local.append(time.perf_counter_ns() - before)
+                if not result.get('success'):
+                    errors.append(result.get('error'))
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            connection.close()
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if not latencies:
+        raise RuntimeError(f"load test completed no requests: {errors[:1]}")
+    result = summarize(f"load.encrypt.{size_label(size)}.c{clients}", latencies,
+                       time.perf_counter() - start, size, None)
+    result['errors'] = len(errors)
+    return result
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args):
+        pass
+
+
+class KeepAliveRequestHandler(QuietRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+
+def local_load(clients: int, duration: float) -> dict:
+    server = make_server('127.0.0.1', 0, Crypt.app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        return run_load(f"http://127.0.0.1:{server.server_port}", clients, duration)
+    finally:
+        server.shutdown()
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        if result['ops_per_sec'] < before['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{result['name']}: ops/s {before['ops_per_sec']:.1f} -> {result['ops_per_sec']:.1f}")
+        if result['p99_us'] > before['p99_us'] * (1 + P99_TOLERANCE):
+            regressions.append(f"{result['name']}: p99 {before['p99_us']:.1f} us -> {result['p99_us']:.1f} us")
+        if before.get('alloc_peak_bytes') and result.get('alloc_peak_bytes') and \
+                result['alloc_peak_bytes'] > before['alloc_peak_bytes'] * (1 + tolerance):
+            regressions.append(f"{result['name']}: alloc peak {before['alloc_peak_bytes']} -> {result['alloc_peak_bytes']} B")
+    return regressions
+
+
+def print_table(results: list):
+    print(f"{'case':<32} {'ops/s':>12} {'MB/s':>10} {'p50 us':>10} {'p99 us':>10} {'alloc B':>10}", file=sys.stderr)
+    for result in results:
+        mb = f"{result['mb_per_sec']:.1f}" if result['mb_per_sec'] is not None else "-"
+        alloc = result['alloc_peak_bytes'] if result['alloc_peak_bytes'] is not None else "-"
+        print(f"{result['name']:<32} {result['ops_per_sec']:>12.1f} {mb:>10} "
+              f"{result['p50_us']:>10.1f} {result['p99_us']:>10.1f} {alloc:>10}", file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Crypt benchmark suite")
+    parser.add_argument('--layers', default='crypto,routes,metrics,load',
+                        help="comma-separated: crypto, routes, metrics, load")
+    parser.add_argument('--quick', action='store_true', help="fewer sizes and shorter runs")
+    parser.add_argument('--min-time', type=float, default=MIN_TIME, help="seconds per case")
+    parser.add_argument('--clients', type=int, default=LOAD_CLIENTS, help="concurrent clients for the load layer")
+    parser.add_argument('--duration', type=float, default=LOAD_DURATION, help="seconds of load")
+    parser.add_argument('--url', help="run the load layer against an already running server")
+    parser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    parser.add_argument('--baseline', default=str(BASELINE_FILE), help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    layers = set(args.layers.split(','))
+    min_time = min(args.min_time, 0.2) if args.quick else args.min_time
+    cases = []
+    if 'crypto' in layers:
+        cases += crypto_cases(QUICK_MESSAGE_SIZES if args.quick else MESSAGE_SIZES)
+    if 'routes' in layers:
+        cases += route_cases()
+    results = [measure(name, func, payload, min_time) for name, func, payload in cases]
+    checks = {}
+    if 'metrics' in layers:
+        checks['metrics_overhead'] = metrics_overhead(max(min_time, 0.5), METRICS_AB_DURATION)
+    if 'load' in layers:
+        duration = min(args.duration, 1.0) if args.quick else args.duration
+        results.append(run_load(args.url, args.clients, duration) if args.url else local_load(args.clients, duration))
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'timestamp': int(time.time()),
+        'results': results,
+        'checks': checks,
+    }
+    print_table(results)
+    failures = []
+    overhead = checks.get('metrics_overhead')
+    if overhead:
+        print(f"metrics overhead: A/B {overhead['ab_overhead_pct']:+.2f}% of /encrypt p50 over HTTP "
+              f"({overhead['pairs']} pairs), hook {overhead['hook_us']:.2f} us", file=sys.stderr)
+        if overhead['ab_overhead_pct'] > METRICS_OVERHEAD_LIMIT:
+            failures.append(f"metrics overhead {overhead['ab_overhead_pct']:+.2f}% > {METRICS_OVERHEAD_LIMIT}%")
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding='utf-8')
+    else:
+        print(text)
+
+    baseline_file = Path(args.baseline)
+    if args.save_baseline:
+        baseline_file.write_text(text + "\n", encoding='utf-8')
+        print(f"baseline saved to {baseline_file}", file=sys.stderr)
+    elif baseline_file.exists():
+        failures += compare(results, json.loads(baseline_file.read_text(encoding='utf-8')), args.tolerance)
+    else:
+        failures.append(f"no baseline at {baseline_file}; run with --save-baseline and commit it")
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
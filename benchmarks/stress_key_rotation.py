@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.chdir(tempfile.mkdtemp(prefix="crypt-stress-"))
+
+import Crypt
+
+DURATION = float(os.environ.get('STRESS_DURATION', 5))
+WORKERS = 8
+ROTATION_INTERVAL = 0.005
+
+
+def main():
+    manager = Crypt.crypt_manager
+    published_keys = [manager.user_key]
+    ciphertexts = []
+    failures = []
+    stop = threading.Event()
+    
+    def hammer(worker):
+        count = 0
+        while not stop.is_set():
+            message = f"{worker}:{count}"
+            first = len(published_keys) - 1
+            encrypted = manager.encrypt_message(message)
+            last = len(published_keys) + 1
+            if encrypted.startswith("Ошибка"):
+                failures.append(encrypted)
+                continue
+            ciphertexts.append((message, encrypted, first, last))
+            manager.decrypt_message(encrypted)
+            count += 1
+    
+    def rotate():
+        rotations = 0
+        while not stop.is_set():
+            if rotations % 5 == 4:
+                manager.delete_master_key()
+            else:
+                manager.delete_user_key()
+            published_keys.append(manager.user_key)
+            rotations += 1
+            time.sleep(ROTATION_INTERVAL)
+        print(f"rotations: {rotations}")
+    
+    threads = [threading.Thread(target=hammer, args=(i,)) for i in range(WORKERS)]
+    threads.append(threading.Thread(target=rotate))
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    aeads = [Crypt.AESGCM(key) for key in published_keys]
+    for message, encrypted, first, last in ciphertexts:
+        envelope = memoryview(Crypt.text_to_envelope(encrypted))
+        matches = 0
+        for aead in aeads[first:last]:
+            try:
+                plaintext = Crypt.open_tag_first(aead, envelope[1:], Crypt.ENVELOPE_HEADER)
+            except ValueError:
+                continue
+            matches += plaintext.decode('utf-8') == message
+        if matches != 1:
+            failures.append(f"{message}: расшифровано {matches} ключами")
+    
+    print(f"ciphertexts: {len(ciphertexts)}, keys: {len(published_keys)}, failures: {len(failures)}")
+    for failure in failures[:10]:
+        print(f"  {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
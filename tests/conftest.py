@@ -0,0 +1,9 @@
+import pytest
+
+import Crypt
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return Crypt.CryptManager()
@@ -0,0 +1,68 @@
+import io
+import os
+
+import pytest
+
+import Crypt
+
+CHUNK_SIZE = 4096
+
+
+@pytest.fixture
+def container(manager):
+    data = os.urandom(CHUNK_SIZE * 5 + 123)
+    return data, bytes(manager.encrypt_chunked(data, CHUNK_SIZE))
+
+
+def test_round_trip(manager, container):
+    data, encrypted = container
+    assert len(encrypted) == Crypt.container_size(len(data), CHUNK_SIZE)
+    assert Crypt.parse_container_header(encrypted)[:3] == (CHUNK_SIZE, len(data), 6)
+    assert manager.decrypt_chunked(encrypted) == data
+
+
+def test_empty_round_trip(manager):
+    assert manager.decrypt_chunked(manager.encrypt_chunked(b'', CHUNK_SIZE)) == b''
+
+
+@pytest.mark.parametrize('offset, length', [
+    (0, 10),
+    (CHUNK_SIZE - 5, 10),
+    (CHUNK_SIZE * 2, CHUNK_SIZE * 2 + 1),
+    (CHUNK_SIZE * 5, 1000),
+    (CHUNK_SIZE * 5 + 123, 10),
+])
+def test_decrypt_range(manager, container, offset, length):
+    data, encrypted = container
+    assert manager.decrypt_range(io.BytesIO(encrypted), offset, length) == data[offset:offset + length]
+
+
+def test_decrypt_range_after_rotation(manager, container):
+    data, encrypted = container
+    manager.rotate_user_key()
+    assert manager.decrypt_range(io.BytesIO(encrypted), CHUNK_SIZE, 10) == data[CHUNK_SIZE:CHUNK_SIZE + 10]
+
+
+def test_tampered_chunk_is_rejected(manager, container):
+    data, encrypted = container
+    tampered = bytearray(encrypted)
+    tampered[-1] ^= 0x01
+    with pytest.raises(ValueError):
+        manager.decrypt_chunked(tampered)
+    with pytest.raises(ValueError):
+        manager.decrypt_range(io.BytesIO(bytes(tampered)), CHUNK_SIZE * 5, 10)
+    assert manager.decrypt_range(io.BytesIO(bytes(tampered)), 0, 10) == data[:10]
+
+
+def test_truncated_container_is_rejected(manager, container):
+    _, encrypted = container
+    with pytest.raises(ValueError):
+        manager.decrypt_chunked(encrypted[:-1])
+    with pytest.raises(ValueError):
+        manager.decrypt_range(io.BytesIO(encrypted[:-1]), CHUNK_SIZE * 5, 10)
+
+
+def test_negative_range_is_rejected(manager, container):
+    _, encrypted = container
+    with pytest.raises(ValueError):
+        manager.decrypt_range(io.BytesIO(encrypted), -1, 10)
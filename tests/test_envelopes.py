@@ -0,0 +1,79 @@
+import base64
+import json
+import os
+
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import Crypt
+
+
+def flip(data: bytes, position: int) -> bytes:
+    data = bytearray(data)
+    data[position] ^= 0x01
+    return bytes(data)
+
+
+def test_v1_round_trip(manager):
+    envelope = manager.encrypt_bytes(b'hello')
+    assert envelope[0] == Crypt.ENVELOPE_VERSION
+    assert manager.decrypt_bytes(envelope) == b'hello'
+
+
+def test_v2_round_trip_with_tenant_key(manager):
+    manager.tenant_keys.create_key('tenant')
+    envelope = manager.encrypt_bytes(b'hello', key_id='tenant')
+    assert envelope[0] == Crypt.ENVELOPE_VERSION_KEY_ID
+    assert Crypt.envelope_key(envelope) == ('tenant', 1)
+    assert manager.decrypt_bytes(envelope) == b'hello'
+
+
+def test_v2_round_trip_after_rotation(manager):
+    old = manager.encrypt_bytes(b'old')
+    manager.rotate_user_key()
+    new = manager.encrypt_bytes(b'new')
+    assert Crypt.envelope_key(new) == (None, 2)
+    assert manager.decrypt_bytes(old) == b'old'
+    assert manager.decrypt_bytes(new) == b'new'
+
+
+def test_message_round_trip(manager):
+    encrypted = manager.encrypt_message('привет')
+    assert manager.decrypt_message(encrypted) == 'привет'
+
+
+def test_legacy_json_message(manager):
+    nonce = os.urandom(12)
+    sealed = AESGCM(manager.user_keys[1]).encrypt(nonce, 'привет'.encode('utf-8'), None)
+    message = base64.b64encode(json.dumps({
+        'nonce': base64.b64encode(nonce).decode(),
+        'ciphertext': base64.b64encode(sealed[:-16]).decode(),
+        'tag': base64.b64encode(sealed[-16:]).decode()
+    }).encode()).decode()
+    assert message.startswith(Crypt.LEGACY_ENVELOPE_PREFIX)
+    assert manager.decrypt_message(message) == 'привет'
+    assert manager.decrypt_bytes(Crypt.text_to_envelope(manager.reencrypt_message(message))) == 'привет'.encode('utf-8')
+
+
+@pytest.mark.parametrize('position', [0, 1, Crypt.ENVELOPE_HEADER_SIZE - 1, -1])
+def test_v1_tamper_is_rejected(manager, position):
+    envelope = manager.encrypt_bytes(b'hello')
+    with pytest.raises(ValueError):
+        manager.decrypt_bytes(flip(envelope, position))
+
+
+def test_v2_header_tamper_is_rejected(manager):
+    manager.tenant_keys.create_key('tenant')
+    manager.tenant_keys.rotate_key('tenant')
+    envelope = manager.encrypt_bytes(b'hello', key_id='tenant')
+    version_offset = 3 + len('tenant')
+    with pytest.raises(ValueError):
+        manager.decrypt_bytes(flip(envelope, version_offset + Crypt.ENVELOPE_KEY_VERSION.size - 1))
+    with pytest.raises(ValueError):
+        manager.decrypt_bytes(flip(envelope, -1))
+
+
+def test_truncated_envelope_is_rejected(manager):
+    envelope = manager.encrypt_bytes(b'hello')
+    with pytest.raises(ValueError):
+        manager.decrypt_bytes(envelope[:Crypt.ENVELOPE_HEADER_SIZE - 1])
@@ -0,0 +1,67 @@
+import io
+import json
+
+import pytest
+
+import Crypt
+
+TENANTS = [f'tenant{i}' for i in range(12)]
+
+
+@pytest.fixture
+def archive(manager):
+    manager.rotate_user_key()
+    manager.tenant_keys.create_keys(TENANTS)
+    manager.tenant_keys.rotate_key('tenant0')
+    messages = {key_id: manager.encrypt_message(key_id, key_id) for key_id in TENANTS}
+    messages[None] = manager.encrypt_message('user')
+    output = io.BytesIO()
+    manager.export_key_archive(output)
+    return output.getvalue(), messages
+
+
+@pytest.fixture
+def target(tmp_path, monkeypatch):
+    directory = tmp_path / 'target'
+    directory.mkdir()
+    monkeypatch.chdir(directory)
+    return Crypt.CryptManager()
+
+
+def assert_restored(manager, messages):
+    for key_id, encrypted in messages.items():
+        assert manager.decrypt_message(encrypted) == (key_id or 'user')
+
+
+def test_round_trip(archive, target):
+    data, messages = archive
+    result = target.import_key_archive(io.BytesIO(data), batch_size=5)
+    assert result['tenants'] == len(TENANTS)
+    assert result['user_key_versions'] == 2
+    assert target.key_archive_status() == {'in_progress': False}
+    assert_restored(target, messages)
+
+
+def test_tampered_record_breaks_mac_chain(archive, target):
+    data, messages = archive
+    lines = data.splitlines(keepends=True)
+    record = json.loads(lines[-2])
+    record['created'] += 1
+    lines[-2] = Crypt.json_line(record)
+    with pytest.raises(ValueError, match='Контрольная сумма'):
+        target.import_key_archive(io.BytesIO(b''.join(lines)))
+    assert target.key_archive_status() == {'in_progress': False}
+    assert target.tenant_keys.list_keys() == []
+    assert target.decrypt_message(messages[None]).startswith('Ошибка')
+
+
+def test_truncated_import_resumes(archive, target):
+    data, messages = archive
+    lines = data.splitlines(keepends=True)
+    with pytest.raises(ValueError, match='обрезан'):
+        target.import_key_archive(io.BytesIO(b''.join(lines[:10])), batch_size=3)
+    status = target.key_archive_status()
+    assert status['in_progress'] and 0 < status['records'] < len(lines) - 2
+    target.import_key_archive(io.BytesIO(data), batch_size=3)
+    assert target.key_archive_status() == {'in_progress': False}
+    assert_restored(target, messages)
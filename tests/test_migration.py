@@ -0,0 +1,48 @@
+import json
+
+import Crypt
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+
+def test_json_keys_are_migrated_to_sqlite(manager, tmp_path, monkeypatch):
+    manager.rotate_user_key()
+    manager.tenant_keys.create_key('legacy')
+    manager.tenant_keys.create_key('current')
+    manager.tenant_keys.rotate_key('current')
+    messages = {
+        None: manager.encrypt_message('user'),
+        'legacy': manager.encrypt_message('legacy', 'legacy'),
+        'current': manager.encrypt_message('current', 'current')
+    }
+    db = manager.key_db
+    wrapped = {
+        key_id: dict(db.execute("SELECT version, wrapped_key FROM tenant_key_versions WHERE key_id = ?", (key_id,)))
+        for key_id in ('legacy', 'current')
+    }
+    keys = tmp_path / 'legacy' / 'keys'
+    write_json(keys / 'master_key.json', {'master_key': db.get_meta('master_key')})
+    write_json(keys / 'user_keys.json', Crypt.user_key_data(manager.read_user_key_records()))
+    write_json(keys / 'tenants' / 'le' / 'legacy.json', {'key_id': 'legacy', 'wrapped_key': wrapped['legacy'][1]})
+    write_json(keys / 'tenants' / 'cu' / 'current.json', {
+        'key_id': 'current',
+        'version': 2,
+        'wrapped_keys': {str(version): value for version, value in wrapped['current'].items()},
+        'created': 1
+    })
+    monkeypatch.chdir(keys.parent)
+    migrated = Crypt.CryptManager()
+    assert sorted(migrated.user_keys) == [1, 2]
+    assert [key['key_id'] for key in migrated.tenant_keys.list_keys()] == ['current', 'legacy']
+    for key_id, encrypted in messages.items():
+        assert migrated.decrypt_message(encrypted) == (key_id or 'user')
+    assert sorted(path.name for path in keys.iterdir() if not path.name.startswith('keys.db')) == [
+        'master_key.json.migrated', 'tenants.migrated', 'user_keys.json.migrated'
+    ]
+    generation = migrated.keys_signature()
+    restarted = Crypt.CryptManager()
+    assert restarted.keys_signature() == generation
+    assert restarted.decrypt_message(messages['current']) == 'current'
@@ -0,0 +1,39 @@
+import io
+
+from werkzeug.wsgi import LimitedStream
+
+import Crypt
+
+LIMIT = 16
+
+
+def lines(data: bytes, limit: int = LIMIT) -> list:
+    return list(Crypt.iter_ndjson_lines(io.BytesIO(data), limit))
+
+
+def test_line_of_exactly_limit_bytes_is_accepted():
+    record = b'x' * LIMIT + b'\n'
+    assert lines(record + b'{}\n') == [record, b'{}\n']
+
+
+def test_line_one_byte_over_limit_is_rejected():
+    assert lines(b'x' * (LIMIT + 1) + b'\n{}\n') == [None, b'{}\n']
+
+
+def test_last_line_without_newline_at_limit_is_accepted():
+    assert lines(b'{}\n' + b'x' * LIMIT) == [b'{}\n', b'x' * LIMIT]
+
+
+def test_last_line_without_newline_over_limit_is_rejected():
+    assert lines(b'x' * (LIMIT + 1)) == [None]
+
+
+def test_long_line_is_skipped_to_its_end():
+    assert lines(b'x' * (5 * LIMIT) + b'\n\n{}\n') == [None, b'{}\n']
+
+
+def test_raw_request_stream_is_buffered():
+    data = b'x' * LIMIT + b'\n' + b'y' * (LIMIT + 1) + b'\n{}\n'
+    stream = LimitedStream(io.BytesIO(data), len(data))
+    assert list(Crypt.iter_ndjson_lines(stream, LIMIT)) == [b'x' * LIMIT + b'\n', None, b'{}\n']
+    assert not stream.closed
@@ -0,0 +1,49 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RUNS = int(os.environ.get("STARTUP_RUNS", "5"))
+TOTAL_BUDGET_MS = float(os.environ.get("STARTUP_TOTAL_BUDGET_MS", "400"))
+OWN_BUDGET_MS = float(os.environ.get("STARTUP_OWN_BUDGET_MS", "60"))
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import flask, werkzeug.http, cryptography.hazmat.primitives.ciphers.aead
+dependencies = time.perf_counter()
+import Crypt
+imported = time.perf_counter()
+print(json.dumps({'own_ms': (imported - dependencies) * 1000, 'total_ms': (imported - start) * 1000}))
+"""
+
+CHECK = """
+import os, sys
+sys.path.insert(0, sys.argv[1])
+import Crypt
+print(int(os.path.exists('keys')), int('asyncio' in sys.modules))
+"""
+
+
+def run_probe(script: str, directory: Path) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", script, str(ROOT)],
+        cwd=directory, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_import_has_no_side_effects(tmp_path):
+    assert run_probe(CHECK, tmp_path) == "0 0"
+
+
+def test_import_stays_within_budget(tmp_path):
+    samples = [json.loads(run_probe(PROBE, tmp_path)) for _ in range(RUNS)]
+    own = statistics.median(sample['own_ms'] for sample in samples)
+    total = statistics.median(sample['total_ms'] for sample in samples)
+    assert own <= OWN_BUDGET_MS, f"Crypt import {own:.1f} ms > {OWN_BUDGET_MS} ms"
+    assert total <= TOTAL_BUDGET_MS, f"total import {total:.1f} ms > {TOTAL_BUDGET_MS} ms"
@@ -0,0 +1,70 @@
+import io
+import os
+
+import pytest
+
+import Crypt
+
+CHUNK_SIZE = 1024
+
+
+@pytest.fixture
+def stream(manager):
+    data = os.urandom(CHUNK_SIZE * 4 + 100)
+    return data, b''.join(manager.iter_encrypt_stream(io.BytesIO(data), CHUNK_SIZE))
+
+
+def chunks(encrypted: bytes) -> tuple:
+    header, body = encrypted[:Crypt.STREAM_HEADER.size], encrypted[Crypt.STREAM_HEADER.size:]
+    size = CHUNK_SIZE + Crypt.ENVELOPE_TAG_SIZE
+    return header, [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def decrypt(manager, encrypted: bytes) -> bytes:
+    return b''.join(manager.iter_decrypt_stream(io.BytesIO(encrypted)))
+
+
+def test_round_trip(manager, stream):
+    data, encrypted = stream
+    assert decrypt(manager, encrypted) == data
+
+
+@pytest.mark.parametrize('size', [0, 1, CHUNK_SIZE, CHUNK_SIZE * 2])
+def test_round_trip_at_chunk_boundaries(manager, size):
+    data = os.urandom(size)
+    assert decrypt(manager, b''.join(manager.iter_encrypt_stream(io.BytesIO(data), CHUNK_SIZE))) == data
+
+
+def test_round_trip_after_rotation(manager, stream):
+    data, encrypted = stream
+    manager.rotate_user_key()
+    assert decrypt(manager, encrypted) == data
+
+
+def test_truncated_at_chunk_boundary_is_rejected(manager, stream):
+    _, encrypted = stream
+    header, parts = chunks(encrypted)
+    with pytest.raises(ValueError):
+        decrypt(manager, header + b''.join(parts[:-1]))
+
+
+def test_truncated_inside_chunk_is_rejected(manager, stream):
+    _, encrypted = stream
+    with pytest.raises(ValueError):
+        decrypt(manager, encrypted[:-10])
+
+
+def test_reordered_chunks_are_rejected(manager, stream):
+    _, encrypted = stream
+    header, parts = chunks(encrypted)
+    parts[1], parts[2] = parts[2], parts[1]
+    with pytest.raises(ValueError):
+        decrypt(manager, header + b''.join(parts))
+
+
+def test_header_tamper_is_rejected(manager, stream):
+    _, encrypted = stream
+    tampered = bytearray(encrypted)
+    tampered[Crypt.STREAM_HEADER.size - 1] ^= 0x01
+    with pytest.raises(ValueError):
+        decrypt(manager, bytes(tampered))